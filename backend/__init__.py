@@ -1,5 +1,4 @@
-# This will make sure the app is always imported when
-# Django starts so that shared_task will use this app.
-from .celery_app import app as celery_app
-
-__all__ = ('celery_app',)
+# The Celery app (backend/celery_app.py) is not imported here, so web processes
+# that never queue a task skip loading Celery. backend.api.tasks imports it
+# before defining its shared tasks, and workers start with
+# `celery -A backend.celery_app worker`.
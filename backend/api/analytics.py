@@ -0,0 +1,133 @@
+"""
+Pipeline analytics per user.
+
+The database aggregates the leads (get_pipeline_analytics, see
+scripts/pipeline_analytics.sql), so only a few rows per status and per
+source/month leave it; totals and conversion rates are derived from those
+here. Results are cached per user under a key that includes the user's
+leads data version - every lead mutation bumps it, so a cached result never
+outlives a change.
+"""
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import data_version
+from .supabase_client import SupabaseService, LEAD_STATUSES
+
+WON = 'Closed win'
+LOST = 'Closed lost'
+OPEN_STATUSES = [status for status in LEAD_STATUSES if status not in (WON, LOST)]
+# Stages a deal passes on its way to a win, in order
+FUNNEL = OPEN_STATUSES + [WON]
+
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 60
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def _month_start(months):
+    """First day of the month `months - 1` months ago (naive UTC, like created_at)"""
+    now = datetime.now(timezone.utc)
+    year, month = now.year, now.month - (months - 1)
+    while month <= 0:
+        month += 12
+        year -= 1
+    return datetime(year, month, 1)
+
+
+def build_pipeline_analytics(aggregates, months):
+    """
+    Derive the analytics response from the RPC aggregates.
+
+    Conversion rates use the current snapshot: a lead in a later stage has
+    passed the earlier ones. Lost leads are left out of the funnel (the stage
+    they were lost at is not recorded) and only count towards the win rate.
+    """
+    by_status = {row['status']: row for row in aggregates.get('by_status') or []}
+
+    def stat(status, field):
+        return (by_status.get(status) or {}).get(field) or 0
+
+    status_rows = [{
+        'status': status,
+        'count': stat(status, 'count'),
+        'total_value': stat(status, 'total_value'),
+        'average_value': stat(status, 'average_value')
+    } for status in LEAD_STATUSES]
+
+    reached = []
+    running = 0
+    for status in reversed(FUNNEL):
+        running += stat(status, 'count')
+        reached.insert(0, running)
+    conversion = [{
+        'from': FUNNEL[i],
+        'to': FUNNEL[i + 1],
+        'rate': _rate(reached[i + 1], reached[i])
+    } for i in range(len(FUNNEL) - 1)]
+
+    by_source = {}
+    for row in aggregates.get('by_source_month') or []:
+        source = by_source.setdefault(row['source'], {'source': row['source'], 'count': 0, 'total_value': 0, 'won_value': 0})
+        source['count'] += row['count']
+        source['total_value'] += row['total_value']
+        source['won_value'] += row['won_value']
+    for source in by_source.values():
+        source['total_value'] = round(source['total_value'], 2)
+        source['won_value'] = round(source['won_value'], 2)
+
+    won, lost = stat(WON, 'count'), stat(LOST, 'count')
+    return {
+        'totals': {
+            'leads': sum(row['count'] for row in status_rows),
+            'pipeline_value': round(sum(stat(status, 'total_value') for status in OPEN_STATUSES), 2),
+            'won_value': stat(WON, 'total_value'),
+            'lost_value': stat(LOST, 'total_value'),
+        },
+        'by_status': status_rows,
+        'conversion': conversion,
+        'win_rate': _rate(won, won + lost),
+        'months': months,
+        'by_source': sorted(by_source.values(), key=lambda source: source['total_value'], reverse=True),
+        'by_source_month': aggregates.get('by_source_month') or [],
+    }
+
+
+def get_pipeline_analytics(user_id, months=DEFAULT_MONTHS):
+    """
+    Pipeline totals, conversion rates and value by source for a user.
+
+    Args:
+        user_id (str): Owner of the leads
+        months (int): Months covered by the source breakdown (1..MAX_MONTHS)
+
+    Returns:
+        Dict: Analytics (see build_pipeline_analytics), or None if Supabase failed
+    """
+    months = max(1, min(int(months), MAX_MONTHS))
+    version = data_version.get_data_version(data_version.LEADS, user_id)
+    key = f"pipeline_analytics:{user_id}:{version}:{months}"
+    if version:
+        try:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            print(f"Error reading analytics cache: {e}")
+
+    aggregates = SupabaseService.get_pipeline_aggregates(user_id, since=_month_start(months))
+    if aggregates is None:
+        return None
+    analytics = build_pipeline_analytics(aggregates, months)
+
+    if version:
+        try:
+            cache.set(key, analytics, getattr(settings, 'ANALYTICS_CACHE_TTL', 600))
+        except Exception as e:
+            print(f"Error caching analytics: {e}")
+    return analytics
@@ -0,0 +1,183 @@
+"""
+Deadlines, bounded retries, hedging and cancellation for upstream calls.
+
+call_with_policy() runs a blocking call on a small worker pool and waits for
+it in short slices, so the caller can enforce an overall deadline, fire a
+hedged duplicate when the first attempt is slower than the recent p95, and
+give up as soon as nobody is waiting for the answer any more (the client
+stopped polling). Abandoned attempts finish in the background and are
+discarded; their own timeout bounds how long they keep a pool thread.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Global variable to hold the worker pool, created lazily
+_executor = None
+_executor_lock = threading.Lock()
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+POLL_KEY_TIMEOUT = 300
+
+
+class CallCancelled(Exception):
+    """Nobody is waiting for the result any more"""
+
+
+class DeadlineExceeded(Exception):
+    """The overall deadline ran out before a call succeeded"""
+
+
+class Deadline:
+    """Absolute deadline shared by all calls of one chat turn"""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CHAT_CALL_POOL_SIZE', 8),
+                    thread_name_prefix='upstream-call'
+                )
+    return _executor
+
+
+def is_retryable(exc):
+    """Timeouts, connection errors, 429 and 5xx responses are worth retrying"""
+    status_code = getattr(exc, 'status_code', None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    name = type(exc).__name__
+    return name in ('APITimeoutError', 'APIConnectionError', 'TimeoutException', 'ConnectError', 'ReadTimeout')
+
+
+def retry_delay(attempt, exc, base):
+    """Exponential backoff with jitter, honouring a Retry-After header when present"""
+    response = getattr(exc, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return base * (2 ** attempt) * (0.5 + random.random())
+
+
+def call_with_policy(fn, deadline, max_retries=2, backoff=0.5, hedge_after=None, should_cancel=None, poll_interval=0.25):
+    """
+    Run fn(timeout) with a deadline, bounded retries, optional hedging and cancellation.
+
+    Args:
+        fn (Callable[[float], Any]): The call; receives the seconds it may take
+        deadline (Deadline): Overall deadline for all attempts
+        max_retries (int): Retries after the first attempt for retryable errors
+        backoff (float): Base backoff in seconds
+        hedge_after (float): Fire one duplicate attempt if the first is still
+            running after this many seconds (None disables hedging)
+        should_cancel (Callable[[], bool]): Returns True when the result is no longer wanted
+        poll_interval (float): How often deadline and cancellation are checked
+
+    Returns:
+        Any: Result of the first successful attempt
+
+    Raises:
+        CallCancelled, DeadlineExceeded, or the last error of fn
+    """
+    attempt = 0
+    while True:
+        if should_cancel and should_cancel():
+            raise CallCancelled()
+        if deadline.expired():
+            raise DeadlineExceeded()
+        try:
+            return _run_attempt(fn, deadline, hedge_after, should_cancel, poll_interval)
+        except (CallCancelled, DeadlineExceeded):
+            raise
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_delay(attempt, e, backoff)
+            if delay >= deadline.remaining():
+                raise
+            print(f"🔁 Retrying upstream call in {delay:.2f}s after: {e}")
+            _sleep(delay, should_cancel, poll_interval)
+            attempt += 1
+
+
+def _sleep(seconds, should_cancel, poll_interval):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        if should_cancel and should_cancel():
+            raise CallCancelled()
+        time.sleep(min(poll_interval, max(end - time.monotonic(), 0)))
+
+
+def _run_attempt(fn, deadline, hedge_after, should_cancel, poll_interval):
+    executor = _get_executor()
+    started = time.monotonic()
+    pending = {executor.submit(fn, deadline.remaining())}
+    hedged = False
+    last_error = None
+
+    while True:
+        done, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            last_error = future.exception()
+        if not pending:
+            raise last_error
+
+        if should_cancel and should_cancel():
+            raise CallCancelled()
+        if deadline.expired():
+            raise DeadlineExceeded()
+        if hedge_after is not None and not hedged and time.monotonic() - started >= hedge_after:
+            print(f"🪁 Hedging upstream call after {hedge_after:.1f}s")
+            pending.add(executor.submit(fn, deadline.remaining()))
+            hedged = True
+
+
+# Client polling bookkeeping used to cancel work nobody waits for
+def _poll_key(task_id):
+    return f"task_{task_id}_polled"
+
+
+def mark_task_polled(task_id):
+    """Record that the client is still polling for a task"""
+    try:
+        cache.set(_poll_key(task_id), time.time(), POLL_KEY_TIMEOUT)
+    except Exception as e:
+        print(f"Error recording task poll: {e}")
+
+
+def task_abandoned_check(task_id):
+    """
+    Build a should_cancel callable for a task: True once the client has not
+    polled for CHAT_ABANDON_AFTER_SECONDS.
+    """
+    abandon_after = getattr(settings, 'CHAT_ABANDON_AFTER_SECONDS', 30)
+
+    def should_cancel():
+        try:
+            last_poll = cache.get(_poll_key(task_id))
+        except Exception:
+            return False
+        return last_poll is not None and time.time() - last_poll > abandon_after
+
+    return should_cancel
@@ -1,9 +1,91 @@
-from django.conf import settings
-from openai import OpenAI
 import json
+import math
 import re
-from typing import Dict, List, Optional, Any
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from django.conf import settings
 from .supabase_client import SupabaseService
+from .openai_client import get_openai_client, get_openai_connection_stats
+from .conversation_memory import ConversationMemory, count_tokens
+from .call_policy import Deadline, DeadlineExceeded, CallCancelled, call_with_policy
+from .analytics import get_pipeline_analytics
+from . import semantic_search
+from .duplicates import find_duplicates, parse_allow_duplicate
+from . import model_router
+
+
+# Currency parsing tables, compiled once at import time
+_CURRENCY_TOKEN_RE = re.compile(
+    r"(?P<number>-?\d(?:[\d.,]|\s(?=\d))*(?:e[+-]?\d+)?)"  # 1000, 1,000.50, 1.000,50, 1 000,50, 1.5e3
+    r"|(?P<word>[^\W\d_]+)"                    # currency/scale words
+    r"|(?P<other>\S)"                           # symbols and punctuation
+)
+_EUROPEAN_NUMBER_RE = re.compile(r'^\d{1,3}(\.\d{3})*,\d{2}$|^\d+,\d{1,2}$')
+_LEADING_NUMBER_RE = re.compile(r'-?\d+\.?\d*')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_SCALE_WORDS = {
+    'k': 1000,
+    'thousand': 1000,
+    'm': 1000000,
+    'million': 1000000,
+    'b': 1000000000,
+    'billion': 1000000000,
+}
+
+
+def _normalize_number(token: str) -> Optional[float]:
+    """Convert a single numeric token (US or European separators, optional exponent) to float."""
+    cleaned, _, exponent = _WHITESPACE_RE.sub('', token).partition('e')
+    scale = float(f"1e{exponent}") if exponent else 1.0
+
+    # European: 1.000,50 or 1000,5 -> drop dots, comma becomes the decimal point
+    # US: 1,000.50 -> commas are thousand separators
+    if _EUROPEAN_NUMBER_RE.match(cleaned.lstrip('-')):
+        cleaned = cleaned.replace('.', '').replace(',', '.')
+    else:
+        cleaned = cleaned.replace(',', '')
+
+    try:
+        number = float(cleaned)
+    except ValueError:
+        # Malformed grouping such as "1.000.000" - keep the leading number
+        match = _LEADING_NUMBER_RE.match(cleaned)
+        if not match:
+            return None
+        number = float(match.group())
+
+    number *= scale
+    # Exponents like 1e999 overflow to infinity
+    return number if math.isfinite(number) else None
+
+
+@lru_cache(maxsize=2048)
+def _parse_currency_text(text: str) -> Optional[float]:
+    """
+    Single pass over the tokens of a lower-cased currency string.
+
+    The first number wins; a scale word (k, m, million, ...) only applies when it
+    is a whole token, so words that merely contain those letters ("mixed", "gbp",
+    "rubles") no longer change the magnitude.
+    """
+    number = None
+    scale_multiplier = 1
+
+    for match in _CURRENCY_TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'number':
+            if number is None:
+                number = _normalize_number(match.group())
+        elif kind == 'word':
+            if scale_multiplier == 1:
+                scale_multiplier = _SCALE_WORDS.get(match.group(), 1)
+        # Currency symbols, currency words and punctuation carry no numeric meaning
+
+    if number is None:
+        return None
+    return number * scale_multiplier
 
 
 def parse_currency_value(value_str: str) -> Optional[float]:
@@ -15,6 +97,8 @@ def parse_currency_value(value_str: str) -> Optional[float]:
     - "$2500", "2500 USD", "2500 dollars"
     - "1000", "1,000.50", "1.000,50"
     - "£1500", "1500 GBP", "1500 pounds"
+    - "1.5k", "2M", "3 million"
+    - "1e3", "2.5E6" (scientific notation)
     
     Args:
         value_str (str): String containing currency value
@@ -22,61 +106,61 @@ def parse_currency_value(value_str: str) -> Optional[float]:
     Returns:
         Optional[float]: Parsed numeric value or None if parsing fails
     """
+    # Values that are already numeric (e.g. JSON numbers from the API) skip the tokenizer
+    if isinstance(value_str, (int, float)) and not isinstance(value_str, bool):
+        return float(value_str) if math.isfinite(value_str) else None
+    
     if not value_str:
         return None
     
-    # Convert to string and clean up
-    value_str = str(value_str).strip().lower()
-    
-    # Remove common currency symbols and words
-    currency_patterns = [
-        r'[€$£¥₹₽¢]',  # Currency symbols
-        r'\b(usd|eur|gbp|jpy|inr|rub|cents?|dollars?|euros?|pounds?|yen|rupees?|rubles?)\b',  # Currency words
-        r'\b(k|thousand|m|million|b|billion)\b'  # Scale words (we'll handle these separately)
-    ]
-    
-    # Extract scale multipliers before removing them
-    scale_multiplier = 1
-    if 'k' in value_str or 'thousand' in value_str:
-        scale_multiplier = 1000
-    elif 'm' in value_str or 'million' in value_str:
-        scale_multiplier = 1000000
-    elif 'b' in value_str or 'billion' in value_str:
-        scale_multiplier = 1000000000
-    
-    # Remove currency symbols and words
-    cleaned = value_str
-    for pattern in currency_patterns:
-        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
-    
-    # Remove extra whitespace
-    cleaned = re.sub(r'\s+', '', cleaned)
-    
-    # Handle different decimal separators (European vs US format)
-    # European: 1.000,50 or 1 000,50
-    # US: 1,000.50
+    return _parse_currency_text(str(value_str).strip().lower())
+
+
+def parse_currency_values(values: Iterable) -> List[Optional[float]]:
+    """
+    Parse a whole column of currency values at once (imports, bulk updates).
     
-    # Check if it looks like European format (comma as decimal separator)
-    if re.match(r'^\d{1,3}(\.\d{3})*,\d{2}$', cleaned) or re.match(r'^\d+,\d{1,2}$', cleaned):
-        # European format: replace dots with nothing, comma with dot
-        cleaned = cleaned.replace('.', '').replace(',', '.')
-    else:
-        # US format or simple number: remove commas (thousand separators)
-        cleaned = cleaned.replace(',', '')
+    Each distinct raw value is parsed only once, so columns with many repeated
+    entries cost one tokenizer pass per unique value.
     
-    # Try to convert to float
-    try:
-        numeric_value = float(cleaned)
-        return numeric_value * scale_multiplier
-    except (ValueError, TypeError):
-        # Try to extract just the numbers
-        numbers = re.findall(r'\d+\.?\d*', cleaned)
-        if numbers:
-            try:
-                return float(numbers[0]) * scale_multiplier
-            except (ValueError, TypeError):
-                pass
-        return None
+    Args:
+        values (Iterable): Raw values in any format accepted by parse_currency_value
+        
+    Returns:
+        List[Optional[float]]: Parsed values in the same order (None where parsing fails)
+    """
+    parsed: Dict[tuple, Optional[float]] = {}
+    results = []
+    for value in values:
+        # Key on type as well so 1, 1.0, True and "1" are parsed separately
+        key = (type(value), value if isinstance(value, (str, int, float)) else str(value))
+        if key not in parsed:
+            parsed[key] = parse_currency_value(value)
+        results.append(parsed[key])
+    return results
+
+
+def format_lead_index(leads: List[Dict], limit: int) -> str:
+    """
+    Compact one-line-per-lead index for the system prompt.
+
+    Only what the model needs to pick a lead (id, name, company, status,
+    value); full records come from search_leads and the other functions.
+
+    Args:
+        leads (List[Dict]): Available leads
+        limit (int): Most leads listed; the rest are only counted
+
+    Returns:
+        str: "id | name | company | status | value" lines
+    """
+    lines = []
+    for lead in leads[:limit]:
+        fields = (lead.get('id'), lead.get('name'), lead.get('company'), lead.get('status'), lead.get('value'))
+        lines.append(' | '.join('' if field is None else _WHITESPACE_RE.sub(' ', str(field)) for field in fields))
+    if len(leads) > limit:
+        lines.append(f"... {len(leads) - limit} more leads not listed; find them with search_leads")
+    return '\n'.join(lines) if lines else '(no leads yet)'
 
 
 class ChatService:
@@ -85,64 +169,99 @@ class ChatService:
     Manages conversation context, intent routing, and lead matching.
     """
     
+    # Function schemas are static: built and token-counted once per process
+    _functions = None
+    _functions_tokens = None
+    
     def __init__(self):
         """Initialize OpenAI client and conversation context."""
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = "gpt-4-1106-preview"  # GPT-4 Turbo with function calling
+        # Shared per process so keep-alive connections are reused across messages
+        self.client = get_openai_client()
+        # Large-tier model; simple turns are routed to the fast tier (see model_router)
+        self.model = model_router.get_model_tiers()[model_router.TIER_LARGE]['model']
+        self.memory = ConversationMemory(self.client)
     
-    def get_conversation_context(self, session_key: str) -> List[Dict]:
+    def create_completion(self, tier: str, deadline: Deadline = None, should_cancel=None, **kwargs):
         """
-        Retrieve conversation context from Django session.
+        Run a chat completion on the given model tier and record its latency and tokens.
+        
+        Each attempt is capped at CHAT_CALL_TIMEOUT_SECONDS and by the turn
+        deadline; 429/5xx and timeouts are retried with backoff, and when
+        CHAT_HEDGING is on a duplicate request is fired once the attempt runs
+        past the tier's recent p95 latency.
         
         Args:
-            session_key (str): Django session key
+            tier (str): model_router.TIER_FAST or model_router.TIER_LARGE
+            deadline (Deadline): Deadline of the whole chat turn
+            should_cancel (Callable[[], bool]): True once nobody waits for the answer
+            **kwargs: Arguments for chat.completions.create (without model)
             
         Returns:
-            List[Dict]: Conversation context messages
+            ChatCompletion: OpenAI response
         """
-        from django.contrib.sessions.models import Session
-        from django.contrib.sessions.backends.db import SessionStore
+        model = model_router.get_model_tiers()[tier]['model']
+        deadline = deadline or Deadline(getattr(settings, 'CHAT_TURN_DEADLINE_SECONDS', 60))
+        call_timeout = getattr(settings, 'CHAT_CALL_TIMEOUT_SECONDS', 30)
         
-        try:
-            session = SessionStore(session_key=session_key)
-            return session.get('chat_context', [])
-        except Exception:
-            return []
+        hedge_after = None
+        if getattr(settings, 'CHAT_HEDGING', False):
+            hedge_after = model_router.get_latency_p95(tier) or getattr(settings, 'CHAT_HEDGE_AFTER_SECONDS', 10)
+            hedge_after = max(hedge_after, getattr(settings, 'CHAT_HEDGE_MIN_SECONDS', 2))
+        
+        def call(remaining):
+            return self.client.chat.completions.create(
+                model=model, timeout=min(call_timeout, max(remaining, 0.1)), **kwargs
+            )
+        
+        started = time.monotonic()
+        response = call_with_policy(
+            call,
+            deadline,
+            max_retries=getattr(settings, 'CHAT_MAX_RETRIES', 2),
+            backoff=getattr(settings, 'CHAT_RETRY_BACKOFF_SECONDS', 0.5),
+            hedge_after=hedge_after,
+            should_cancel=should_cancel
+        )
+        model_router.record_usage(tier, time.monotonic() - started, getattr(response, 'usage', None))
+        return response
     
-    def update_conversation_context(self, session_key: str, message: Dict) -> None:
+    def get_conversation_context(self, session_key: str, conversation_id: str = None, current_message: str = None) -> List[Dict]:
         """
-        Update conversation context in Django session.
+        Retrieve token-budgeted conversation context (rolling summary + recent turns).
         
         Args:
-            session_key (str): Django session key
-            message (Dict): Message to add to context
+            session_key (str): Django session key (used when there is no conversation)
+            conversation_id (str): Conversation the context belongs to
+            current_message (str): Message being processed, excluded when rehydrating
+            
+        Returns:
+            List[Dict]: Conversation context messages
         """
-        from django.contrib.sessions.backends.db import SessionStore
+        return self.memory.build_context(session_key, conversation_id, current_message)
+    
+    def update_conversation_context(self, session_key: str, messages: List[Dict], conversation_id: str = None) -> None:
+        """
+        Add turns to the conversation memory.
         
-        try:
-            session = SessionStore(session_key=session_key)
-            context = session.get('chat_context', [])
-            context.append(message)
-            
-            # Keep only last 10 messages for context management
-            if len(context) > 10:
-                context = context[-10:]
-            
-            session['chat_context'] = context
-            session.save()
-        except Exception as e:
-            print(f"Error updating conversation context: {e}")
+        Args:
+            session_key (str): Django session key (used when there is no conversation)
+            messages (List[Dict]): Messages to add to context
+            conversation_id (str): Conversation the context belongs to
+        """
+        self.memory.append(session_key, messages, conversation_id)
     
-    def clear_conversation_context(self, session_key: str) -> None:
+    def clear_conversation_context(self, session_key: str, conversation_id: str = None) -> None:
         """
-        Clear conversation context and pending deletions from Django session.
+        Clear conversation memory and pending deletions from Django session.
         
         Args:
             session_key (str): Django session key
+            conversation_id (str): Conversation whose memory to clear as well
         """
         from django.contrib.sessions.backends.db import SessionStore
         
         try:
+            self.memory.clear(session_key, conversation_id)
             session = SessionStore(session_key=session_key)
             session['chat_context'] = []
             session['pending_deletions'] = {}
@@ -209,13 +328,30 @@ class ChatService:
             print(f"Error removing pending deletion: {e}")
     
     def get_openai_functions(self) -> List[Dict]:
+        """
+        Get the OpenAI function schemas, built once per process.
+        
+        Returns:
+            List[Dict]: Function definitions for OpenAI function calling (do not mutate)
+        """
+        if ChatService._functions is None:
+            ChatService._functions = self.build_openai_functions()
+        return ChatService._functions
+    
+    def get_openai_functions_tokens(self) -> int:
+        """Prompt tokens taken by the function schemas, counted once per process"""
+        if ChatService._functions_tokens is None:
+            ChatService._functions_tokens = count_tokens(json.dumps(self.get_openai_functions()))
+        return ChatService._functions_tokens
+    
+    def build_openai_functions(self) -> List[Dict]:
         """
         Define OpenAI function schemas for lead operations.
         
         Returns:
             List[Dict]: Function definitions for OpenAI function calling
         """
-        return [
+        functions = [
             {
                 "name": "search_leads",
                 "description": "Search for leads by name, company, email, or other lead data",
@@ -310,6 +446,10 @@ class ChatService:
                             "type": "string",
                             "enum": ["Interest", "Meeting booked", "Proposal sent", "Closed win", "Closed lost"],
                             "description": "Initial status (defaults to Interest)"
+                        },
+                        "allow_duplicate": {
+                            "type": "boolean",
+                            "description": "Create the lead even though it looks like a duplicate - only after the user confirmed they want a separate lead"
                         }
                     },
                     "required": ["name"]
@@ -329,6 +469,38 @@ class ChatService:
                     "required": ["lead_id"]
                 }
             },
+            {
+                "name": "get_pipeline_analytics",
+                "description": "Get pipeline totals, lead counts and values per status, conversion rates between statuses, win rate and lead value by source per month - use this for any totals or statistics instead of adding up leads",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "months": {
+                            "type": "integer",
+                            "description": "Months covered by the value-by-source breakdown (default 12)"
+                        }
+                    }
+                }
+            },
+            {
+                "name": "full_text_search",
+                "description": "Full-text search across all lead notes and past conversation messages - use this to find leads or discussions by what was written about them (e.g. 'who asked about pricing?'), not only by name",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Words to search for; supports \"quoted phrases\", OR and -excluded words"
+                        },
+                        "scope": {
+                            "type": "string",
+                            "enum": ["all", "leads", "messages"],
+                            "description": "Search leads, conversation messages or both (default all)"
+                        }
+                    },
+                    "required": ["query"]
+                }
+            },
             {
                 "name": "confirm_delete_lead",
                 "description": "Actually delete a lead after user has confirmed - only use this when user has explicitly confirmed deletion",
@@ -344,6 +516,26 @@ class ChatService:
                 }
             }
         ]
+        if semantic_search.is_enabled():
+            functions.insert(1, {
+                "name": "semantic_search_leads",
+                "description": "Find leads matching a description rather than an exact name, e.g. 'the fintech guy from the conference' - compares the description with each lead's name, company, email, source, status and notes",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Description of the lead(s) to find"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of leads to return (default 5)"
+                        }
+                    },
+                    "required": ["query"]
+                }
+            })
+        return functions
     
     def find_matching_leads(self, query: str, leads: List[Dict]) -> List[Dict]:
         """
@@ -413,23 +605,27 @@ class ChatService:
                     "message": f"Found {len(matching_leads)} matching leads"
                 }
             
+            elif function_name == "semantic_search_leads":
+                query = arguments.get("query", "")
+                limit = max(1, min(int(arguments.get("limit") or 5), 20))
+                matches = semantic_search.search_leads(user_id, [query], leads, k=limit)[0]
+                return {
+                    "success": True,
+                    "data": matches,  # Best first, each with a 0..1 similarity
+                    "message": f"Found {len(matches)} leads similar to '{query}'"
+                }
+            
             elif function_name == "update_lead_status":
                 lead_id = arguments.get("lead_id")
                 new_status = arguments.get("new_status")
                 
-                # Calculate new order (place at end of column)
-                same_status_leads = [l for l in leads if l.get('status') == new_status]
-                new_order = len(same_status_leads) + 1
-                
-                updated_lead = SupabaseService.update_lead(lead_id, {
-                    'status': new_status,
-                    'card_order': new_order
-                }, user_id=user_id)
+                # Place at end of column; both columns are renumbered atomically
+                moved = SupabaseService.move_lead(lead_id, new_status, user_id=user_id)
                 
-                if updated_lead:
+                if moved:
                     return {
                         "success": True,
-                        "data": updated_lead,
+                        "data": moved['lead'],
                         "message": f"Lead status updated to '{new_status}'"
                     }
                 else:
@@ -482,6 +678,23 @@ class ChatService:
                         }
                     arguments['value'] = parsed_value
                 
+                # Refuse likely duplicates until the user confirms
+                try:
+                    allow_duplicate = parse_allow_duplicate(arguments.pop('allow_duplicate', False))
+                except ValueError as e:
+                    return {"success": False, "message": str(e)}
+                if not allow_duplicate and getattr(settings, 'DUPLICATE_CHECK_ON_CREATE', True):
+                    matches = find_duplicates(arguments, leads)
+                    if matches:
+                        existing = ', '.join(
+                            f"'{match['lead'].get('name')}' ({', '.join(match['reasons'])})" for match in matches[:3]
+                        )
+                        return {
+                            "success": False,
+                            "data": matches,
+                            "message": f"Possible duplicate of {existing}. Ask the user whether to update the existing lead or create a new one anyway (allow_duplicate)."
+                        }
+                
                 # Set card order
                 same_status_leads = [l for l in leads if l.get('status') == arguments['status']]
                 arguments['card_order'] = len(same_status_leads) + 1
@@ -532,6 +745,36 @@ class ChatService:
                 print(f"DEBUG: Final result: {result}")
                 return result
             
+            elif function_name == "get_pipeline_analytics":
+                analytics = get_pipeline_analytics(user_id, months=arguments.get("months") or 12)
+                if analytics is None:
+                    return {
+                        "success": False,
+                        "message": "Failed to compute pipeline analytics"
+                    }
+                return {
+                    "success": True,
+                    "data": analytics,
+                    "message": f"Pipeline analytics for {analytics['totals']['leads']} leads"
+                }
+            
+            elif function_name == "full_text_search":
+                query = arguments.get("query", "")
+                scope = arguments.get("scope") or "all"
+                if scope not in ("all", "leads", "messages"):
+                    scope = "all"
+                page = SupabaseService.search_crm(user_id, query, scope=scope, limit=10)
+                if page is None:
+                    return {
+                        "success": False,
+                        "message": "Search failed"
+                    }
+                return {
+                    "success": True,
+                    "data": page['results'],  # Top 10 by rank
+                    "message": f"Found {len(page['results'])}{'+' if page['has_more'] else ''} matches for '{query}'"
+                }
+            
             elif function_name == "confirm_delete_lead":
                 lead_id = arguments.get("lead_id")
                 
@@ -579,7 +822,7 @@ class ChatService:
                 "message": f"Error executing {function_name}: {str(e)}"
             }
     
-    def process_message(self, message: str, session_key: str, leads: List[Dict], conversation_id: str = None, user_id: str = None) -> Dict:
+    def process_message(self, message: str, session_key: str, leads: List[Dict], conversation_id: str = None, user_id: str = None, should_cancel=None, on_function_call=None) -> Dict:
         """
         Process user message with OpenAI and execute any required functions.
         
@@ -587,17 +830,26 @@ class ChatService:
             message (str): User's message
             session_key (str): Django session key
             leads (List[Dict]): Available leads
+            should_cancel (Callable[[], bool]): True once the client stopped polling
+            on_function_call (Callable[[], None]): Called before a lead function runs
             
         Returns:
             Dict: AI response and function execution results
         """
+        # One deadline bounds every model call of this turn, retries included
+        deadline = Deadline(getattr(settings, 'CHAT_TURN_DEADLINE_SECONDS', 60))
         try:
-            # Get conversation context
-            context = self.get_conversation_context(session_key)
+            # Get conversation context (rolling summary + recent turns within the token budget)
+            context = self.get_conversation_context(session_key, conversation_id, current_message=message)
             
             # Get pending deletions for context
             pending_deletions = self.get_pending_deletions(session_key) if session_key else {}
             
+            semantic_search_line = (
+                '8. Find leads from a description ("the fintech guy from the conference") with semantic_search_leads\n'
+                if semantic_search.is_enabled() else ''
+            )
+            
             # Prepare system message
             system_message = {
                 "role": "system",
@@ -608,7 +860,11 @@ class ChatService:
 - Closed win
 - Closed lost
 
-Available leads: {json.dumps(leads, indent=2)}
+Lead index ({len(leads)} leads; id | name | company | status | value):
+{format_lead_index(leads, getattr(settings, 'CHAT_LEAD_INDEX_MAX_LEADS', 200))}
+
+Use search_leads for a lead's email, phone, notes or source, get_pipeline_analytics
+for totals and conversion rates, and full_text_search for what was written in notes.
 
 Pending deletions requiring confirmation: {json.dumps(pending_deletions, indent=2)}
 
@@ -618,7 +874,9 @@ You can:
 3. Update lead data (name, company, email, phone, value, notes, source)
 4. Create new leads with provided information
 5. Delete leads (requires confirmation - first call delete_lead, then user must confirm)
-
+6. Answer questions about totals, conversion rates and value by source with get_pipeline_analytics
+7. Find what was written in lead notes or earlier conversations with full_text_search
+{semantic_search_line}
 CURRENCY VALUE SUPPORT:
 - Accept any currency format: "500 euros", "$2500", "1000 USD", "€1500", "£2000", "1.5k", "2M", etc.
 - Automatically parse and convert to numeric values
@@ -642,11 +900,23 @@ Be formal but brief in responses. When referencing leads from conversation conte
             # Prepare messages for OpenAI
             messages = [system_message] + context + [{"role": "user", "content": message}]
             
+            # Route the turn: fast tier for simple requests, large tier for ambiguous multi-step ones
+            functions = self.get_openai_functions()
+            prompt_tokens = count_tokens(json.dumps(messages)) + self.get_openai_functions_tokens()
+            tier = model_router.choose_tier(
+                model_router.PURPOSE_ROUTE,
+                message=message,
+                prompt_tokens=prompt_tokens,
+                has_pending_deletions=bool(pending_deletions)
+            )
+            
             # Call OpenAI with function calling
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self.create_completion(
+                tier,
+                deadline=deadline,
+                should_cancel=should_cancel,
                 messages=messages,
-                functions=self.get_openai_functions(),
+                functions=functions,
                 function_call="auto",
                 temperature=0.1
             )
@@ -660,6 +930,8 @@ Be formal but brief in responses. When referencing leads from conversation conte
                 function_args = json.loads(response_message.function_call.arguments)
                 
                 # Execute the function
+                if on_function_call:
+                    on_function_call()
                 result = self.execute_function_call(function_name, function_args, leads, session_key, user_id)
                 function_results.append({
                     "function": function_name,
@@ -674,20 +946,31 @@ Be formal but brief in responses. When referencing leads from conversation conte
                     "content": json.dumps(result)
                 })
                 
-                # Get final response from AI
-                final_response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.1
-                )
-                
-                ai_message = final_response.choices[0].message.content
+                # Get final response from AI (rendering a result is always a simple turn)
+                # The function already ran, so if rendering fails fall back to its own message
+                try:
+                    final_response = self.create_completion(
+                        model_router.choose_tier(
+                            model_router.PURPOSE_RENDER,
+                            prompt_tokens=count_tokens(json.dumps(messages))
+                        ),
+                        deadline=deadline,
+                        should_cancel=should_cancel,
+                        messages=messages,
+                        temperature=0.1
+                    )
+                    ai_message = final_response.choices[0].message.content
+                except Exception as e:
+                    print(f"⚠️ Rendering the function result failed, using its message: {e}")
+                    ai_message = result.get('message') or "Done."
             else:
                 ai_message = response_message.content
             
             # Update conversation context
-            self.update_conversation_context(session_key, {"role": "user", "content": message})
-            self.update_conversation_context(session_key, {"role": "assistant", "content": ai_message})
+            self.update_conversation_context(session_key, [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": ai_message}
+            ], conversation_id)
             
             # Save AI response to database if conversation_id is provided
             if conversation_id:
@@ -695,7 +978,8 @@ Be formal but brief in responses. When referencing leads from conversation conte
                     conversation_id, 
                     ai_message, 
                     is_user=False, 
-                    function_results=function_results
+                    function_results=function_results,
+                    user_id=user_id
                 )
             
             return {
@@ -704,10 +988,41 @@ Be formal but brief in responses. When referencing leads from conversation conte
                 "status": "success"
             }
         
+        except CallCancelled:
+            print("🛑 Client stopped polling - chat turn cancelled")
+            return {
+                "ai_message": None,
+                "function_results": [],
+                "status": "cancelled"
+            }
+        
+        except DeadlineExceeded:
+            return {
+                "ai_message": "I'm sorry, the assistant is taking too long to respond right now. Please try again.",
+                "function_results": [],
+                "status": "error",
+                "error": "Chat turn deadline exceeded"
+            }
+        
         except Exception as e:
             return {
                 "ai_message": "I apologize, but I encountered an error processing your request. Please try again.",
                 "function_results": [],
                 "status": "error",
                 "error": str(e)
-            } 
\ No newline at end of file
+            }
+        
+        finally:
+            self.log_turn_stats()
+    
+    def log_turn_stats(self) -> None:
+        """Log this process's OpenAI connection reuse and model tier usage after a chat turn"""
+        try:
+            stats = get_openai_connection_stats()
+            print(
+                f"🔌 OpenAI connections: {stats['requests']} requests, {stats['reused']} reused, "
+                f"{stats['new_connections']} new, {stats['tls_handshakes']} TLS handshakes"
+            )
+            print(f"🤖 Model tiers: {model_router.format_model_tier_stats()}")
+        except Exception as e:
+            print(f"Error reading chat stats: {e}") 
\ No newline at end of file
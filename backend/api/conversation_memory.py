@@ -0,0 +1,296 @@
+"""
+Token-budgeted rolling memory for the chat assistant.
+
+Recent turns are kept verbatim as long as they fit the token budget; older
+turns are folded into a rolling summary by a background thread, so prompt
+size stays bounded without dropping history outright. Memory lives in the
+Django cache keyed by conversation and is rehydrated from the persisted
+messages table when missing, so it survives worker restarts and follows
+the conversation across devices.
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .supabase_client import SupabaseService
+
+MEMORY_TIMEOUT = 86400  # Same lifetime as the session cookie
+LOCK_TIMEOUT = 10
+SUMMARY_LOCK_TIMEOUT = 120
+MESSAGE_TOKEN_OVERHEAD = 4  # Role and separators per chat message
+
+# Global variable to hold the tiktoken encoding (False when unavailable)
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Uses tiktoken when installed; otherwise falls back to the usual
+    ~4 characters per token estimate.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: Dict) -> int:
+    """Count the tokens a chat message costs in the prompt"""
+    return count_tokens(message.get('content') or '') + MESSAGE_TOKEN_OVERHEAD
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to roughly max_tokens tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens]) + ' [...]'
+    return text[:max_tokens * 4] + ' [...]'
+
+
+class ConversationMemory:
+    """
+    Rolling conversation memory with a token budget.
+
+    State per conversation: {'summary': str, 'summary_seq': int,
+    'next_seq': int, 'messages': [{'seq', 'role', 'content'}]}.
+    """
+
+    def __init__(self, client, summary_model: str = None):
+        """
+        Args:
+            client: OpenAI client used for background summarization
+            summary_model (str): Model used to write the rolling summary
+        """
+        self.client = client
+        self.token_budget = getattr(settings, 'CHAT_MEMORY_TOKEN_BUDGET', 2000)
+        self.rehydrate_messages = getattr(settings, 'CHAT_MEMORY_REHYDRATE_MESSAGES', 20)
+        self.summary_model = summary_model or getattr(settings, 'CHAT_MEMORY_SUMMARY_MODEL', 'gpt-3.5-turbo')
+
+    # Storage helpers
+    @staticmethod
+    def memory_key(session_key: str, conversation_id: str = None) -> str:
+        """Key memory by conversation; legacy callers without one use the session"""
+        if conversation_id:
+            return f"chat_memory:conversation:{conversation_id}"
+        return f"chat_memory:session:{session_key}"
+
+    @staticmethod
+    def _empty_state() -> Dict:
+        return {'summary': '', 'summary_seq': 0, 'next_seq': 1, 'messages': []}
+
+    def _locked(self, key: str, update):
+        """Read-modify-write a memory state under a short cache lock"""
+        lock_key = f"{key}:lock"
+        acquired = False
+        for _ in range(50):
+            if cache.add(lock_key, 1, LOCK_TIMEOUT):
+                acquired = True
+                break
+            time.sleep(0.02)
+        try:
+            state = cache.get(key) or self._empty_state()
+            state = update(state)
+            cache.set(key, state, MEMORY_TIMEOUT)
+            return state
+        finally:
+            if acquired:
+                cache.delete(lock_key)
+
+    def _rehydrate(self, key: str, conversation_id: str, current_message: str = None) -> Dict:
+        """Rebuild memory from the newest persisted messages of a conversation"""
+        state = self._empty_state()
+        page = SupabaseService.get_conversation_messages_page(
+            conversation_id, self.rehydrate_messages, include_function_results=False
+        )
+        rows = page['messages'] if page else []
+        # The current user message is persisted before processing starts
+        if rows and current_message is not None and rows[-1].get('is_user') and rows[-1].get('content') == current_message:
+            rows = rows[:-1]
+        for row in rows:
+            state['messages'].append({
+                'seq': state['next_seq'],
+                'role': 'user' if row.get('is_user') else 'assistant',
+                'content': row.get('content') or ''
+            })
+            state['next_seq'] += 1
+        cache.add(key, state, MEMORY_TIMEOUT)
+        return cache.get(key) or state
+
+    def load(self, session_key: str, conversation_id: str = None, current_message: str = None) -> Dict:
+        """Get the memory state, rehydrating it from Supabase when the cache is empty"""
+        key = self.memory_key(session_key, conversation_id)
+        try:
+            state = cache.get(key)
+            if state is None and conversation_id:
+                state = self._rehydrate(key, conversation_id, current_message)
+            return state or self._empty_state()
+        except Exception as e:
+            print(f"Error loading conversation memory: {e}")
+            return self._empty_state()
+
+    # Prompt building
+    def build_context(self, session_key: str, conversation_id: str = None, current_message: str = None) -> List[Dict]:
+        """
+        Get the chat messages to send before the current user message.
+
+        Returns the rolling summary (as a system message) followed by the most
+        recent turns that fit the token budget, newest kept first.
+        """
+        state = self.load(session_key, conversation_id, current_message)
+        budget = self.token_budget
+        context = []
+
+        if state['summary']:
+            summary_message = {
+                "role": "system",
+                "content": f"Summary of the earlier conversation: {state['summary']}"
+            }
+            budget -= message_tokens(summary_message)
+            context.append(summary_message)
+
+        # A single oversized message may take at most half of the budget
+        per_message_cap = max(self.token_budget // 2, 1)
+        recent = []
+        for message in reversed(state['messages']):
+            content = truncate_to_tokens(message['content'], per_message_cap)
+            cost = count_tokens(content) + MESSAGE_TOKEN_OVERHEAD
+            if cost > budget:
+                break
+            budget -= cost
+            recent.append({"role": message['role'], "content": content})
+        recent.reverse()
+
+        return context + recent
+
+    # Updates
+    def append(self, session_key: str, messages: List[Dict], conversation_id: str = None) -> None:
+        """
+        Add turns to memory and, when the verbatim turns outgrow the budget,
+        schedule summarization of the oldest ones off the request path.
+        """
+        key = self.memory_key(session_key, conversation_id)
+
+        def add_messages(state):
+            for message in messages:
+                state['messages'].append({
+                    'seq': state['next_seq'],
+                    'role': message['role'],
+                    'content': message.get('content') or ''
+                })
+                state['next_seq'] += 1
+            return state
+
+        try:
+            state = self._locked(key, add_messages)
+            if sum(message_tokens(m) for m in state['messages']) > self.token_budget:
+                self.schedule_summarization(key)
+        except Exception as e:
+            print(f"Error updating conversation memory: {e}")
+
+    @staticmethod
+    def clear(session_key: str = None, conversation_id: str = None) -> None:
+        """Forget the memory of a conversation and/or of a session"""
+        keys = []
+        if conversation_id:
+            keys.append(ConversationMemory.memory_key(None, conversation_id))
+        if session_key:
+            keys.append(ConversationMemory.memory_key(session_key))
+        try:
+            cache.delete_many(keys)
+        except Exception as e:
+            print(f"Error clearing conversation memory: {e}")
+
+    # Summarization
+    def schedule_summarization(self, key: str) -> None:
+        """Fold the oldest turns into the summary in a background thread (one at a time per key)"""
+        if not cache.add(f"{key}:summarizing", 1, SUMMARY_LOCK_TIMEOUT):
+            return
+        thread = threading.Thread(target=self._summarize, args=(key,))
+        thread.daemon = True
+        thread.start()
+
+    def _select_for_summary(self, state: Dict) -> List[Dict]:
+        """Oldest turns to fold so the remaining ones use at most half of the budget"""
+        remaining = sum(message_tokens(m) for m in state['messages'])
+        selected = []
+        for message in state['messages'][:-1]:  # Always keep the latest turn verbatim
+            if remaining <= self.token_budget // 2:
+                break
+            selected.append(message)
+            remaining -= message_tokens(message)
+        return selected
+
+    def _summarize(self, key: str) -> None:
+        try:
+            state = cache.get(key)
+            if not state:
+                return
+            folded = self._select_for_summary(state)
+            if not folded:
+                return
+
+            summary = self.summarize(state['summary'], folded)
+            if summary is None:
+                return
+            last_seq = folded[-1]['seq']
+
+            def apply_summary(current):
+                # Turns may have been appended meanwhile; only drop what was folded
+                if current['summary_seq'] >= last_seq:
+                    return current
+                current['summary'] = summary
+                current['summary_seq'] = last_seq
+                current['messages'] = [m for m in current['messages'] if m['seq'] > last_seq]
+                return current
+
+            self._locked(key, apply_summary)
+        except Exception as e:
+            print(f"Error summarizing conversation memory: {e}")
+        finally:
+            cache.delete(f"{key}:summarizing")
+
+    def summarize(self, previous_summary: str, messages: List[Dict]) -> Optional[str]:
+        """
+        Ask the model to merge older turns into the rolling summary.
+
+        Returns:
+            Optional[str]: New summary, or None if the call failed
+        """
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        summary_budget = max(self.token_budget // 4, 64)
+        try:
+            response = self.client.chat.completions.create(
+                model=self.summary_model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You maintain the memory of a CRM assistant conversation. Merge the previous "
+                                   "summary and the new turns into one concise summary. Keep lead names, IDs, "
+                                   "statuses, values, pending confirmations and user preferences; drop small talk."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Previous summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+                    }
+                ],
+                max_tokens=summary_budget,
+                temperature=0
+            )
+            return (response.choices[0].message.content or '').strip()
+        except Exception as e:
+            print(f"Error generating conversation summary: {e}")
+            return None
@@ -0,0 +1,103 @@
+"""
+Per-owner data version tokens used for ETags / conditional GETs.
+
+Every SupabaseService mutation bumps the version of the scope it touches
+(e.g. the leads of a user or the messages of a conversation). Read endpoints
+derive their ETag from the current token, so an unchanged dataset can be
+answered with 304 Not Modified straight from the cache, without fetching
+anything from Supabase.
+
+Tokens only work when every process that mutates data bumps the same token,
+so they are disabled (get_data_version returns None: no ETags, no version-keyed
+caching) unless DATA_VERSIONS_ENABLED is set, which it is by default with the
+shared Redis cache. A per-process cache would otherwise hand out stale 304s
+after a write made by another gunicorn worker or the Celery worker.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Version scopes
+LEADS = 'leads'                  # owner: user_id
+CONVERSATIONS = 'conversations'  # owner: user_id
+MESSAGES = 'messages'            # owner: conversation_id
+
+# Tokens expire after a day; a missing token simply yields a new ETag
+DATA_VERSION_TIMEOUT = 86400
+
+
+def is_enabled():
+    return getattr(settings, 'DATA_VERSIONS_ENABLED', False)
+
+
+def _version_key(scope, owner_id):
+    return f"data_version:{scope}:{owner_id}"
+
+
+def get_data_version(scope, owner_id, create=True):
+    """
+    Get the current version token for a scope.
+
+    Call this *before* fetching the data the ETag describes, so a concurrent
+    write always leaves the response with an outdated (never a newer) token.
+
+    Args:
+        scope (str): One of LEADS, CONVERSATIONS, MESSAGES
+        owner_id (str): User or conversation ID owning the data
+        create (bool): Create a token when none exists yet
+
+    Returns:
+        Optional[str]: Version token, or None if missing and create is False
+        or versions are disabled
+    """
+    if not is_enabled():
+        return None
+    key = _version_key(scope, owner_id)
+    try:
+        version = cache.get(key)
+        if version is None and create:
+            version = uuid.uuid4().hex
+            # add() so concurrent first readers settle on a single token
+            if not cache.add(key, version, DATA_VERSION_TIMEOUT):
+                version = cache.get(key) or version
+        return version
+    except Exception as e:
+        print(f"Error reading data version: {e}")
+        return None
+
+
+def bump_data_version(scope, owner_id):
+    """
+    Invalidate all ETags of a scope after a mutation.
+
+    Args:
+        scope (str): One of LEADS, CONVERSATIONS, MESSAGES
+        owner_id (str): User or conversation ID owning the data
+    """
+    if not owner_id or not is_enabled():
+        return
+    try:
+        cache.set(_version_key(scope, owner_id), uuid.uuid4().hex, DATA_VERSION_TIMEOUT)
+    except Exception as e:
+        print(f"Error bumping data version: {e}")
+
+
+def build_etag(version, *parts):
+    """
+    Build a strong ETag from a version token and whatever else shapes the
+    representation (user, full path incl. query string, ...).
+    """
+    raw = ':'.join(str(part) for part in (version,) + parts)
+    return '"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def etag_matches(request, etag):
+    """Check whether the request's If-None-Match header matches the ETag."""
+    header = request.headers.get('If-None-Match')
+    if not header or not etag:
+        return False
+    # Weak comparison: compression middleware hands out W/ variants of our tags
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in candidates or etag.removeprefix('W/') in candidates
@@ -0,0 +1,338 @@
+"""
+Duplicate-lead detection without pairwise scans.
+
+Leads are only compared when they share a blocking key:
+  - the normalised email address (lowercase, +tags and Gmail dots removed)
+  - the last 9 digits of the phone number
+  - the email domain, for company domains (free-mail domains are skipped)
+  - a MinHash/LSH band over the character trigrams of the name (the company
+    for leads without one), so near-identical spellings ("Jon Smith" /
+    "John Smith") land in a shared bucket with high probability
+Candidate pairs are then confirmed by exact email/phone equality or by the
+Jaccard similarity of the name and company trigrams. A full scan
+(find_duplicate_clusters) is close to linear in the number of leads and
+groups matches into clusters. Checking one new lead (find_duplicates) is a
+single pass comparing it with each existing lead, which is linear already;
+normalised leads are cached, so repeated checks of a board stay cheap.
+
+Cluster scans are cached (get_duplicate_clusters) and warmed by the batch
+task tasks.scan_duplicate_leads, which schedule_duplicate_scan dispatches
+after bulk imports.
+"""
+import hashlib
+import random
+import re
+import threading
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import data_version
+from .supabase_client import SupabaseService
+
+# MinHash with 30 permutations in 10 bands of 3 rows: names with a trigram
+# Jaccard of 0.8 share a band >99% of the time, 0.6 ~91%, 0.2 ~8%
+NUM_PERMUTATIONS = 30
+BANDS = 10
+ROWS = NUM_PERMUTATIONS // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+# Weak keys (a shared domain) with more members than this are too common to be
+# worth comparing all pairs; strong keys and LSH bands are always compared
+MAX_BLOCK_SIZE = 50
+
+NAME_MATCH = 0.8          # Name trigram Jaccard that is a duplicate on its own
+NAME_AND_COMPANY = 0.6    # Lower name similarity when the company matches too
+COMPANY_MATCH = 0.7
+
+FREE_EMAIL_DOMAINS = frozenset([
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'live.com',
+    'icloud.com', 'me.com', 'aol.com', 'proton.me', 'protonmail.com', 'gmx.com', 'gmx.de',
+    'web.de', 'mail.com', 'yandex.ru', 'qq.com',
+])
+_COMPANY_SUFFIXES = frozenset([
+    'inc', 'incorporated', 'ltd', 'limited', 'llc', 'llp', 'plc', 'gmbh', 'ag', 'sa', 'sas',
+    'bv', 'nv', 'corp', 'corporation', 'co', 'company', 'group', 'the',
+])
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+_NON_DIGIT_RE = re.compile(r'\D+')
+
+SUMMARY_FIELDS = ('id', 'name', 'company', 'email', 'phone', 'status')
+
+
+def normalize_email(email):
+    email = (email or '').strip().lower()
+    if '@' not in email:
+        return ''
+    local, _, domain = email.rpartition('@')
+    local = local.split('+', 1)[0]
+    if domain in ('gmail.com', 'googlemail.com'):
+        local, domain = local.replace('.', ''), 'gmail.com'
+    return f'{local}@{domain}' if local and domain else ''
+
+
+def normalize_phone(phone):
+    """Last 9 digits, so +44 20 7946 0000 and 020 7946 0000 compare equal"""
+    digits = _NON_DIGIT_RE.sub('', str(phone or ''))
+    return digits[-9:] if len(digits) >= 7 else ''
+
+
+def normalize_name(value, drop_suffixes=False):
+    words = _NON_WORD_RE.sub(' ', str(value or '').lower()).split()
+    if drop_suffixes:
+        words = [word for word in words if word not in _COMPANY_SUFFIXES]
+    return ' '.join(words)
+
+
+@lru_cache(maxsize=8192)
+def _trigrams(text):
+    if not text:
+        return frozenset()
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@lru_cache(maxsize=8192)
+def _minhash_bands(text):
+    """LSH band keys of the MinHash signature over the text's trigrams"""
+    shingles = [zlib.crc32(shingle.encode('utf-8')) for shingle in _trigrams(text)]
+    if not shingles:
+        return ()
+    signature = [min((a * h + b) % _PRIME for h in shingles) for a, b in _PERMUTATIONS]
+    return tuple(('lsh', band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS))
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Profile:
+    """Normalised fields of one lead"""
+
+    __slots__ = ('email', 'phone', 'domain', 'name', 'company', 'name_trigrams', 'company_trigrams')
+
+    def __init__(self, name, company, email, phone):
+        self.email = normalize_email(email)
+        self.phone = normalize_phone(phone)
+        domain = self.email.rpartition('@')[2]
+        self.domain = domain if domain and domain not in FREE_EMAIL_DOMAINS else ''
+        self.name = normalize_name(name)
+        self.company = normalize_name(company, drop_suffixes=True)
+        self.name_trigrams = _trigrams(self.name)
+        self.company_trigrams = _trigrams(self.company)
+
+    def strong_keys(self):
+        """Keys shared only by likely duplicates: email, phone and the name's LSH bands"""
+        keys = list(_minhash_bands(self.name or self.company))
+        if self.email:
+            keys.append(('email', self.email))
+        if self.phone:
+            keys.append(('phone', self.phone))
+        return keys
+
+    def match(self, other):
+        """Reasons these two leads look like the same person, [] if they do not"""
+        reasons = []
+        if self.email and self.email == other.email:
+            reasons.append('email')
+        if self.phone and self.phone == other.phone:
+            reasons.append('phone')
+
+        name = _jaccard(self.name_trigrams, other.name_trigrams)
+        company = _jaccard(self.company_trigrams, other.company_trigrams)
+        same_company = company >= COMPANY_MATCH or (self.domain and self.domain == other.domain)
+        either_without_company = not self.company or not other.company
+        if name >= NAME_MATCH and (same_company or either_without_company):
+            reasons.append('name')
+        elif name >= NAME_AND_COMPANY and same_company:
+            reasons.append('name and company')
+        return reasons
+
+
+@lru_cache(maxsize=8192)
+def _cached_profile(name, company, email, phone):
+    return _Profile(name, company, email, phone)
+
+
+def profile(lead):
+    return _cached_profile(lead.get('name'), lead.get('company'), lead.get('email'), lead.get('phone'))
+
+
+def summarize(lead):
+    return {field: lead.get(field) for field in SUMMARY_FIELDS}
+
+
+def parse_allow_duplicate(value):
+    """
+    Strictly parse an allow_duplicate flag: a JSON boolean or "true"/"false"
+    (also 1/0). Anything else raises ValueError, so "false" never counts as yes.
+    """
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ('true', '1'):
+        return True
+    if text in ('false', '0', ''):
+        return False
+    raise ValueError(f"allow_duplicate must be true or false, got {value!r}")
+
+
+def find_duplicates(lead, leads, exclude_id=None):
+    """
+    Existing leads that look like duplicates of `lead` (e.g. one about to be created).
+
+    Args:
+        lead (Dict): Lead data (name, company, email, phone)
+        leads (List[Dict]): The user's existing leads
+        exclude_id (str): Lead to leave out, e.g. the lead itself when editing
+
+    Returns:
+        List[Dict]: {'lead': summary, 'reasons': [...]} per match
+    """
+    new = profile(lead)
+    if not (new.name or new.company or new.email or new.phone):
+        return []
+
+    matches = []
+    for existing in leads:
+        if not existing.get('id') or existing.get('id') == exclude_id:
+            continue
+        reasons = new.match(profile(existing))
+        if reasons:
+            matches.append({'lead': summarize(existing), 'reasons': reasons})
+    return matches
+
+
+def find_duplicate_clusters(leads):
+    """
+    Group a user's leads into clusters of likely duplicates.
+
+    Returns:
+        List[Dict]: {'leads': [summary, ...], 'reasons': [...]} for every cluster
+        of two or more leads, largest first
+    """
+    leads = [lead for lead in leads if lead.get('id')]
+    profiles = [profile(lead) for lead in leads]
+
+    blocks = {}
+    for position, lead_profile in enumerate(profiles):
+        for key in lead_profile.strong_keys():
+            blocks.setdefault(key, []).append(position)
+        if lead_profile.domain:
+            blocks.setdefault(('domain', lead_profile.domain), []).append(position)
+
+    parent = list(range(len(profiles)))
+
+    def root(position):
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    reasons = {}
+    compared = set()
+    for key, members in blocks.items():
+        if len(members) < 2 or (key[0] == 'domain' and len(members) > MAX_BLOCK_SIZE):
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                if (first, second) in compared:
+                    continue
+                compared.add((first, second))
+                pair_reasons = profiles[first].match(profiles[second])
+                if pair_reasons:
+                    a, b = root(first), root(second)
+                    merged = reasons.pop(a, set()) | reasons.pop(b, set()) | set(pair_reasons)
+                    parent[a] = b
+                    reasons[b] = merged
+
+    clusters = {}
+    for position in range(len(profiles)):
+        clusters.setdefault(root(position), []).append(position)
+
+    result = [{
+        'leads': [summarize(leads[position]) for position in members],
+        'reasons': sorted(reasons.get(cluster_root, ())),
+    } for cluster_root, members in clusters.items() if len(members) > 1]
+    result.sort(key=lambda cluster: len(cluster['leads']), reverse=True)
+    return result
+
+
+def _leads_fingerprint(leads):
+    """Digest of the fields a scan looks at, so unchanged leads map to the same key"""
+    digest = hashlib.sha1()
+    for lead in sorted(leads, key=lambda lead: str(lead.get('id'))):
+        digest.update(repr(tuple(lead.get(field) for field in SUMMARY_FIELDS)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_duplicate_clusters(user_id):
+    """
+    Duplicate clusters across a user's leads, cached for DUPLICATE_SCAN_CACHE_TTL.
+
+    The cache key is the user's leads data version when data versions are
+    enabled (a 304-style hit without reading the leads); otherwise the leads
+    are read and the key is a fingerprint of their contents, which still
+    skips the clustering for an unchanged board.
+
+    Args:
+        user_id (str): Owner of the leads
+
+    Returns:
+        List[Dict]: See find_duplicate_clusters
+    """
+    leads = None
+    version = data_version.get_data_version(data_version.LEADS, user_id)
+    if not version:
+        leads = SupabaseService.get_all_leads(user_id=user_id)
+        version = 'content-' + _leads_fingerprint(leads)
+
+    key = f"duplicate_leads:{user_id}:{version}"
+    try:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        print(f"Error reading duplicate cache: {e}")
+
+    if leads is None:
+        leads = SupabaseService.get_all_leads(user_id=user_id)
+    clusters = find_duplicate_clusters(leads)
+
+    try:
+        cache.set(key, clusters, getattr(settings, 'DUPLICATE_SCAN_CACHE_TTL', 3600))
+    except Exception as e:
+        print(f"Error caching duplicate clusters: {e}")
+    return clusters
+
+
+def schedule_duplicate_scan(user_id):
+    """
+    Warm the duplicate cache for a user in the background (after bulk imports).
+
+    Queued as the Celery task scan_duplicate_leads when DUPLICATE_SCAN_USE_CELERY
+    is on (its result is only visible to the web processes through the Redis
+    cache); otherwise, or when the broker is unreachable, the scan runs in a
+    background thread of this process.
+    """
+    if getattr(settings, 'DUPLICATE_SCAN_USE_CELERY', False):
+        try:
+            from .tasks import scan_duplicate_leads
+            scan_duplicate_leads.delay(user_id)
+            return
+        except Exception as e:
+            print(f"⚠️ Could not queue duplicate scan ({e}) - using threading...")
+
+    def scan():
+        try:
+            get_duplicate_clusters(user_id)
+        except Exception as e:
+            print(f"Error scanning duplicate leads: {e}")
+
+    threading.Thread(target=scan, daemon=True).start()
@@ -0,0 +1,119 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+A client that retries a POST (flaky mobile network, double tap) sends the
+same Idempotency-Key header. The first request runs the view and its
+response is stored in the Django cache (Redis when CACHE_REDIS_URL is set,
+so every process shares it); duplicates that arrive while it is still
+running get 409 with Retry-After straight away, without holding a worker,
+and later ones replay the stored response. Either way the view runs once:
+one user message, one chat turn, one lead.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IN_PROGRESS_TIMEOUT = 60  # Lock lifetime, should a worker die mid-request
+MAX_KEY_LENGTH = 255
+
+STATE_IN_PROGRESS = 'in_progress'
+STATE_DONE = 'done'
+
+
+def _record_key(request, idempotency_key):
+    """Keys are scoped per user and endpoint so clients cannot collide"""
+    user_id = request.session.get('user_id') or 'anonymous'
+    return f"idempotency:{user_id}:{request.method}:{request.path}:{idempotency_key}"
+
+
+def _fingerprint(request):
+    """Hash of the request payload, to reject a key reused for a different request"""
+    try:
+        payload = json.dumps(request.data, sort_keys=True, default=str)
+    except Exception:
+        payload = ''
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _replay(record):
+    response = Response(record['data'], status=record['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """
+    Decorator making unsafe requests with an Idempotency-Key header run once.
+
+    Apply below require_authentication so the key is scoped to the user.
+    Requests without the header, and safe methods, are passed through.
+    Responses with a 5xx status are not stored, so the client may retry them.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key or request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return view_func(request, *args, **kwargs)
+
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} is too long'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        record_key = _record_key(request, idempotency_key)
+        fingerprint = _fingerprint(request)
+
+        if not cache.add(record_key, {'state': STATE_IN_PROGRESS, 'fingerprint': fingerprint}, IN_PROGRESS_TIMEOUT):
+            return _handle_duplicate(record_key, fingerprint)
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            cache.delete(record_key)
+            raise
+
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            cache.delete(record_key)
+            return response
+
+        cache.set(record_key, {
+            'state': STATE_DONE,
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'data': response.data,
+        }, getattr(settings, 'IDEMPOTENCY_TTL_SECONDS', 86400))
+        return response
+
+    return wrapper
+
+
+def _handle_duplicate(record_key, fingerprint):
+    """Replay the stored response, or answer 409 while the original is still running"""
+    record = cache.get(record_key)
+    if record is None:
+        # The original failed and released the key; let the client retry
+        return Response(
+            {'error': 'The original request failed, please retry'},
+            status=status.HTTP_409_CONFLICT
+        )
+    if record['fingerprint'] != fingerprint:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record['state'] == STATE_DONE:
+        print(f"♻️ Replaying stored response for {record_key}")
+        return _replay(record)
+    response = Response(
+        {'error': 'The original request is still being processed'},
+        status=status.HTTP_409_CONFLICT
+    )
+    response['Retry-After'] = '1'
+    return response
@@ -0,0 +1,160 @@
+"""
+Password verification off the request threads, and login rate limiting.
+
+Verifying a PBKDF2 hash is deliberately expensive. Hashes run on a small
+dedicated pool (hashlib releases the GIL while hashing), so at most
+LOGIN_HASH_WORKERS of them burn CPU at once and a burst of logins queues
+there - or is turned away once the queue is full - instead of starving
+every other request. Attempts are counted per client IP and failures per
+email in the Django cache. Only with the Redis cache (CACHE_REDIS_URL) are the
+counts shared across processes; with the in-process default they hold per
+process, which is why gunicorn runs a single worker without it.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+
+# Global variables to hold the hashing pool and its backlog, created lazily
+_executor = None
+_executor_lock = threading.Lock()
+_backlog = None
+
+
+class LoginBusy(Exception):
+    """Too many password checks are queued; the client should retry shortly"""
+
+
+def _get_executor():
+    global _executor, _backlog
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'LOGIN_HASH_WORKERS', 1)
+                _backlog = threading.BoundedSemaphore(workers + getattr(settings, 'LOGIN_HASH_QUEUE', 4))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _executor
+
+
+def _run_hashing(fn, *args):
+    """Run fn on the hashing pool, waiting at most LOGIN_HASH_TIMEOUT seconds"""
+    executor = _get_executor()
+    if not _backlog.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except Exception:
+        _backlog.release()
+        raise
+    future.add_done_callback(lambda f: _backlog.release())
+    try:
+        return future.result(timeout=getattr(settings, 'LOGIN_HASH_TIMEOUT', 10))
+    except FutureTimeoutError:
+        raise LoginBusy()
+
+
+def verify_password(password, user_data, on_rehash=None):
+    """
+    Check a password against a users row on the hashing pool.
+
+    When the stored hash uses an outdated hasher or iteration count (see
+    PASSWORD_HASHERS / PASSWORD_PBKDF2_ITERATIONS), it is re-hashed with the
+    preferred one in the same pool task; on_rehash(new_hash) then runs on the
+    calling thread, so the database write never occupies a hashing worker.
+    Without a user row a dummy hash is computed, so unknown emails take as
+    long as wrong passwords.
+
+    Raises:
+        LoginBusy: The hashing queue is full or the check timed out
+    """
+    if not user_data or not user_data.get('password_hash'):
+        _run_hashing(make_password, password)
+        return False
+
+    def check():
+        upgraded = []
+        setter = (lambda raw: upgraded.append(make_password(raw))) if on_rehash else None
+        valid = check_password(password, user_data['password_hash'], setter=setter)
+        return valid, (upgraded[0] if upgraded else None)
+
+    valid, new_hash = _run_hashing(check)
+    if valid and new_hash:
+        try:
+            on_rehash(new_hash)
+        except Exception as e:
+            # The login still succeeds; the hash is upgraded on a later one
+            print(f"Error storing upgraded password hash: {e}")
+    return valid
+
+
+# Rate limiting
+def get_client_ip(request):
+    """
+    Client IP behind LOGIN_TRUSTED_PROXY_HOPS proxies.
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so only the rightmost entries are trustworthy: anything
+    further left may have been sent by the client itself. With N trusted hops
+    the client is the Nth entry from the right; with 0 the header is ignored.
+    """
+    hops = getattr(settings, 'LOGIN_TRUSTED_PROXY_HOPS', 1)
+    if hops > 0:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def _ip_key(ip):
+    return f"login_attempts:ip:{ip}"
+
+
+def _email_key(email):
+    return f"login_failures:email:{email.strip().lower()}"
+
+
+def _increment(key, window):
+    cache.add(key, 0, window)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, window)
+        return 1
+
+
+def check_login_rate(ip, email):
+    """
+    Count a login attempt and tell whether it may proceed.
+
+    Returns:
+        int: 0 if allowed, otherwise seconds the client should wait
+    """
+    window = getattr(settings, 'LOGIN_RATE_WINDOW_SECONDS', 300)
+    try:
+        if _increment(_ip_key(ip), window) > getattr(settings, 'LOGIN_RATE_LIMIT_PER_IP', 20):
+            return window
+        if (cache.get(_email_key(email)) or 0) >= getattr(settings, 'LOGIN_RATE_LIMIT_PER_EMAIL', 5):
+            return window
+    except Exception as e:
+        # Never lock everybody out because the cache is unavailable
+        print(f"Error checking login rate: {e}")
+    return 0
+
+
+def record_login_failure(email):
+    """Count a failed password for an email"""
+    try:
+        _increment(_email_key(email), getattr(settings, 'LOGIN_RATE_WINDOW_SECONDS', 300))
+    except Exception as e:
+        print(f"Error recording login failure: {e}")
+
+
+def reset_login_failures(email):
+    """Forget failures after a successful login"""
+    try:
+        cache.delete(_email_key(email))
+    except Exception as e:
+        print(f"Error resetting login failures: {e}")
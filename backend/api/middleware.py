@@ -1,34 +1,180 @@
-from django.http import HttpResponse
+import gzip
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+from .warmup import get_warmup_state, is_ready
+
+
+def compile_origin_matcher():
+    """
+    Build the allowed-origin check once from CORS_ALLOWED_ORIGINS (exact
+    origins) and CORS_ALLOWED_ORIGIN_REGEXES; results are memoised per origin.
+    """
+    exact = frozenset(getattr(settings, 'CORS_ALLOWED_ORIGINS', ()))
+    patterns = getattr(settings, 'CORS_ALLOWED_ORIGIN_REGEXES', ())
+    regex = re.compile('|'.join(f'(?:{p})' for p in patterns)) if patterns else None
+    seen = {}
+
+    def is_allowed(origin):
+        allowed = seen.get(origin)
+        if allowed is None:
+            allowed = origin in exact or bool(regex and regex.match(origin))
+            if len(seen) < 1024:
+                seen[origin] = allowed
+        return allowed
+
+    return is_allowed
+
 
 class SimpleCorsMiddleware:
+    """
+    CORS for the React frontend. Runs first, so preflights, health and
+    readiness checks are answered before the session (or anything else) is
+    loaded.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
         # One-time configuration and initialization.
+        self.is_allowed_origin = compile_origin_matcher()
+        self.health_paths = frozenset(getattr(settings, 'HEALTH_CHECK_PATHS', ('/health/',)))
+        self.readiness_paths = frozenset(getattr(settings, 'READINESS_CHECK_PATHS', ('/ready/',)))
 
     def __call__(self, request):
+        origin = request.headers.get("Origin")
+        allowed = bool(origin) and self.is_allowed_origin(origin)
+
         # Handle the preflight OPTIONS request
         if request.method == "OPTIONS":
             # Preflight requests don't need a body, just the right headers
             response = HttpResponse(status=204) # 204 No Content
-            # Allow the specific origin that's making the request
-            response["Access-Control-Allow-Origin"] = request.headers.get("Origin", "*")
-            # Allow credentials (cookies)
-            response["Access-Control-Allow-Credentials"] = "true"
-            # Specify allowed methods
-            response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-            # Allow the headers the client is asking for
-            response["Access-Control-Allow-Headers"] = request.headers.get("Access-Control-Request-Headers", "*")
-            # Cache the preflight response for 1 day
-            response["Access-Control-Max-Age"] = "86400"
+            if allowed:
+                self._add_cors_headers(response, origin)
+                # Specify allowed methods
+                response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+                # Allow the headers the client is asking for
+                response["Access-Control-Allow-Headers"] = request.headers.get("Access-Control-Request-Headers", "*")
+                # Cache the preflight response for 1 day
+                response["Access-Control-Max-Age"] = "86400"
+            return response
+
+        # Liveness check for the platform: no session, no database
+        if request.method == "GET" and request.path_info in self.health_paths:
+            return JsonResponse({'status': 'ok'})
+
+        # Readiness check: 503 until this process has finished its warm-up
+        if request.method == "GET" and request.path_info in self.readiness_paths:
+            state = get_warmup_state()
+            if is_ready():
+                return JsonResponse({'status': 'ready', 'warmup': state})
+            response = JsonResponse({'status': 'starting', 'warmup': state}, status=503)
+            response['Retry-After'] = '1'
             return response
 
         # For all other actual requests, process as usual
         response = self.get_response(request)
 
         # Add the CORS header to the actual response, too
-        origin = request.headers.get("Origin")
-        if origin and ("vercel.app" in origin or "localhost" in origin):
-            response["Access-Control-Allow-Origin"] = origin
-            response["Access-Control-Allow-Credentials"] = "true"
+        if allowed:
+            self._add_cors_headers(response, origin)
+
+        return response
+
+    @staticmethod
+    def _add_cors_headers(response, origin):
+        # Allow the specific origin with credentials (cookies)
+        response["Access-Control-Allow-Origin"] = origin
+        response["Access-Control-Allow-Credentials"] = "true"
+        # Let the frontend read when to retry a 409/429/503
+        response["Access-Control-Expose-Headers"] = "Retry-After"
+        patch_vary_headers(response, ("Origin",))
+
+
+class AdminOnlyMiddleware:
+    """
+    Runs the middleware listed in ADMIN_ONLY_MIDDLEWARE only for requests
+    under ADMIN_ONLY_PATH_PREFIXES (the Django admin). JSON API requests
+    skip them entirely.
+
+    Only middleware that works through __call__ / process_request /
+    process_response (no process_view or process_exception) belongs here.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixes = tuple(getattr(settings, 'ADMIN_ONLY_PATH_PREFIXES', ('/admin/',)))
+        handler = get_response
+        for path in reversed(getattr(settings, 'ADMIN_ONLY_MIDDLEWARE', [])):
+            handler = import_string(path)(handler)
+        self.admin_handler = handler
+
+    def __call__(self, request):
+        if request.path_info.startswith(self.prefixes):
+            return self.admin_handler(request)
+        return self.get_response(request)
+
+
+def _accepted_encodings(header):
+    """Codings from an Accept-Encoding header with a non-zero q value"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compress API responses of at least COMPRESSION_MIN_SIZE bytes with brotli
+    (when the brotli package is installed and the client accepts it) or gzip.
+    Streaming responses (Server-Sent Events) and already encoded responses
+    are left alone; strong ETags become weak, as with Django's GZipMiddleware.
+    """
+
+    COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+        try:
+            import brotli
+            self.brotli = brotli
+        except ImportError:
+            self.brotli = None
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (response.streaming or response.status_code != 200 or response.has_header('Content-Encoding')
+                or len(response.content) < self.min_size
+                or not response.get('Content-Type', '').startswith(self.COMPRESSIBLE_TYPES)):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        if self.brotli and 'br' in accepted:
+            encoding, compressed = 'br', self.brotli.compress(response.content, quality=self.brotli_quality)
+        elif 'gzip' in accepted:
+            encoding, compressed = 'gzip', gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+        else:
+            return response
+
+        if len(compressed) >= len(response.content):
+            return response
 
-        return response 
\ No newline at end of file
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,199 @@
+"""
+Model tiering for chat turns.
+
+Most turns (confirmations, simple lookups, single edits and rendering a
+function result) go to a small fast model; only ambiguous or multi-step
+requests go to the large model, and only while it stays within the per-turn
+cost budget and its recent p95 latency stays within the latency budget.
+A prompt too long for the fast model's context window goes to the large
+(long-context) model whatever the budgets say - falling back to the fast
+tier would only fail the call. Latency and token usage are recorded per tier.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+TIER_FAST = 'fast'
+TIER_LARGE = 'large'
+
+# Completion purposes
+PURPOSE_ROUTE = 'route'    # First call: understand the request, pick a function
+PURPOSE_RENDER = 'render'  # Second call: phrase the function result for the user
+
+EXPECTED_OUTPUT_TOKENS = 300
+LATENCY_WINDOW_SECONDS = 600
+
+_CONFIRMATION_RE = re.compile(
+    r"^\s*(yes|yeah|yep|ok|okay|sure|confirm\w*|cancel|no|nope|do it|delete it|go ahead)\b", re.IGNORECASE
+)
+_ACTION_RE = re.compile(r"\b(move|update|change|set|create|add|delete|remove|rename|mark)\b", re.IGNORECASE)
+_MULTI_STEP_RE = re.compile(r"\b(and then|then|after that|also|as well)\b|;", re.IGNORECASE)
+_AMBIGUOUS_RE = re.compile(r"\b(him|her|them|that one|the other|those|these|same|previous|last one)\b", re.IGNORECASE)
+
+# Per-tier usage: counters plus recent (timestamp, latency) samples for the p95
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_model_tiers():
+    """Configured models, prices (USD per 1K tokens) and context windows per tier"""
+    return {
+        TIER_FAST: {
+            'model': getattr(settings, 'CHAT_MODEL_FAST', 'gpt-3.5-turbo-1106'),
+            'input_cost': getattr(settings, 'CHAT_MODEL_FAST_INPUT_COST', 0.001),
+            'output_cost': getattr(settings, 'CHAT_MODEL_FAST_OUTPUT_COST', 0.002),
+            'context_tokens': getattr(settings, 'CHAT_MODEL_FAST_CONTEXT_TOKENS', 16385),
+        },
+        TIER_LARGE: {
+            'model': getattr(settings, 'CHAT_MODEL_LARGE', 'gpt-4-1106-preview'),
+            'input_cost': getattr(settings, 'CHAT_MODEL_LARGE_INPUT_COST', 0.01),
+            'output_cost': getattr(settings, 'CHAT_MODEL_LARGE_OUTPUT_COST', 0.03),
+            'context_tokens': getattr(settings, 'CHAT_MODEL_LARGE_CONTEXT_TOKENS', 128000),
+        },
+    }
+
+
+def classify_complexity(message, has_pending_deletions=False):
+    """
+    Classify a user message as simple or complex.
+
+    Returns:
+        str: TIER_LARGE for multi-step, ambiguous or very long requests,
+        TIER_FAST otherwise (confirmations, simple reads, single actions)
+    """
+    text = message or ''
+    words = text.split()
+
+    if has_pending_deletions and len(words) <= 8 and _CONFIRMATION_RE.match(text):
+        return TIER_FAST
+
+    actions = len(_ACTION_RE.findall(text))
+    if actions >= 2 or (actions and _MULTI_STEP_RE.search(text)):
+        return TIER_LARGE
+    if _AMBIGUOUS_RE.search(text) or len(words) > 60:
+        return TIER_LARGE
+    return TIER_FAST
+
+
+def estimate_cost(tier, prompt_tokens):
+    """Estimated USD cost of one completion on a tier"""
+    prices = get_model_tiers()[tier]
+    return prompt_tokens / 1000 * prices['input_cost'] + EXPECTED_OUTPUT_TOKENS / 1000 * prices['output_cost']
+
+
+def fits_context(tier, prompt_tokens):
+    """Whether a prompt plus the expected answer fits the tier's context window"""
+    return prompt_tokens + EXPECTED_OUTPUT_TOKENS <= get_model_tiers()[tier]['context_tokens']
+
+
+def choose_tier(purpose, message=None, prompt_tokens=0, has_pending_deletions=False):
+    """
+    Pick the model tier for one completion.
+
+    Args:
+        purpose (str): PURPOSE_ROUTE or PURPOSE_RENDER
+        message (str): User message (for PURPOSE_ROUTE)
+        prompt_tokens (int): Estimated prompt size, functions included
+        has_pending_deletions (bool): Whether a deletion awaits confirmation
+
+    Returns:
+        str: TIER_FAST or TIER_LARGE
+    """
+    if not getattr(settings, 'CHAT_MODEL_TIERING', True):
+        return TIER_LARGE
+    if not fits_context(TIER_FAST, prompt_tokens):
+        print(f"⚖️ {prompt_tokens} prompt tokens exceed the fast tier's context - using large tier")
+        return TIER_LARGE
+    if purpose == PURPOSE_RENDER:
+        return TIER_FAST
+
+    tier = classify_complexity(message, has_pending_deletions)
+    if tier == TIER_FAST:
+        return TIER_FAST
+
+    cost_budget = getattr(settings, 'CHAT_TURN_COST_BUDGET', 0.10)
+    if estimate_cost(TIER_LARGE, prompt_tokens) > cost_budget:
+        print(f"⚖️ Large model over cost budget ({prompt_tokens} prompt tokens) - using fast tier")
+        return TIER_FAST
+
+    latency_budget = getattr(settings, 'CHAT_LATENCY_BUDGET_SECONDS', 20)
+    p95 = get_latency_p95(TIER_LARGE)
+    if p95 is not None and p95 > latency_budget:
+        print(f"⚖️ Large model p95 latency {p95:.1f}s over budget - using fast tier")
+        return TIER_FAST
+
+    return TIER_LARGE
+
+
+def record_usage(tier, latency, usage=None):
+    """
+    Record latency (seconds) and token usage of one completion.
+
+    Args:
+        tier (str): Tier the completion ran on
+        latency (float): Wall-clock seconds
+        usage: OpenAI usage object (prompt_tokens, completion_tokens) or None
+    """
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    with _stats_lock:
+        stats = _stats.setdefault(tier, {
+            'calls': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'total_latency': 0.0,
+            'recent': deque(maxlen=100),
+        })
+        stats['calls'] += 1
+        stats['prompt_tokens'] += prompt_tokens
+        stats['completion_tokens'] += completion_tokens
+        stats['total_latency'] += latency
+        stats['recent'].append((time.time(), latency))
+    print(f"🤖 {tier} tier: {latency:.2f}s, {prompt_tokens} prompt + {completion_tokens} completion tokens")
+
+
+def get_latency_p95(tier):
+    """p95 latency of the tier over the recent window, or None without samples"""
+    cutoff = time.time() - LATENCY_WINDOW_SECONDS
+    with _stats_lock:
+        stats = _stats.get(tier)
+        samples = sorted(latency for ts, latency in stats['recent'] if ts >= cutoff) if stats else []
+    if not samples:
+        return None
+    return samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+
+
+def format_model_tier_stats(stats=None):
+    """One-line summary of get_model_tier_stats() for the logs"""
+    stats = get_model_tier_stats() if stats is None else stats
+    parts = []
+    for tier, tier_stats in sorted(stats.items()):
+        part = (
+            f"{tier} {tier_stats['calls']} calls, "
+            f"{tier_stats['prompt_tokens']}+{tier_stats['completion_tokens']} tokens"
+        )
+        if tier_stats['avg_latency'] is not None:
+            part += f", avg {tier_stats['avg_latency']:.2f}s"
+        if tier_stats['p95_latency'] is not None:
+            part += f", p95 {tier_stats['p95_latency']:.2f}s"
+        parts.append(part)
+    return '; '.join(parts) or 'no calls yet'
+
+
+def get_model_tier_stats():
+    """Per-tier calls, tokens, average and p95 latency for this process"""
+    result = {}
+    with _stats_lock:
+        tiers = {tier: dict(stats) for tier, stats in _stats.items()}
+    for tier, stats in tiers.items():
+        result[tier] = {
+            'calls': stats['calls'],
+            'prompt_tokens': stats['prompt_tokens'],
+            'completion_tokens': stats['completion_tokens'],
+            'avg_latency': stats['total_latency'] / stats['calls'] if stats['calls'] else None,
+            'p95_latency': get_latency_p95(tier),
+        }
+    return result
@@ -0,0 +1,87 @@
+from django.conf import settings
+import os
+import threading
+
+# Global variables to hold the shared client and the process it was created in
+openai_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+# Connection reuse counters, fed by httpcore trace events
+_stats = {'requests': 0, 'new_connections': 0, 'tls_handshakes': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _trace(event_name, info):
+    """httpcore trace callback: only fires connect/TLS events for fresh connections"""
+    if event_name == 'connection.connect_tcp.complete':
+        _count('new_connections')
+    elif event_name == 'connection.start_tls.complete':
+        _count('tls_handshakes')
+
+
+def _on_request(request):
+    _count('requests')
+    request.extensions['trace'] = _trace
+
+
+def get_openai_client():
+    """
+    Get the process-wide OpenAI client with lazy loading.
+
+    One client (and so one httpx connection pool) is shared by every
+    ChatService in the process, so TLS connections to the API are kept alive
+    and reused across messages. httpx clients are thread-safe; after a fork
+    (Celery prefork, gunicorn preload) the child builds its own client rather
+    than sharing the parent's sockets.
+    """
+    global openai_client, _client_pid
+
+    pid = os.getpid()
+    if openai_client is not None and _client_pid == pid:
+        return openai_client
+
+    with _client_lock:
+        if openai_client is not None and _client_pid == pid:
+            return openai_client
+
+        import httpx
+        from openai import OpenAI
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=getattr(settings, 'OPENAI_MAX_CONNECTIONS', 10),
+                max_keepalive_connections=getattr(settings, 'OPENAI_MAX_KEEPALIVE_CONNECTIONS', 5),
+                keepalive_expiry=getattr(settings, 'OPENAI_KEEPALIVE_EXPIRY', 120),
+            ),
+            timeout=httpx.Timeout(
+                getattr(settings, 'OPENAI_TIMEOUT', 60),
+                connect=getattr(settings, 'OPENAI_CONNECT_TIMEOUT', 5),
+            ),
+            http2=getattr(settings, 'OPENAI_HTTP2', False),
+            event_hooks={'request': [_on_request]},
+        )
+        # Retries are handled by call_policy so they respect the turn deadline
+        openai_client = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client, max_retries=0)
+        _client_pid = pid
+        print("✅ OpenAI client created (shared connection pool)")
+        return openai_client
+
+
+def get_openai_connection_stats():
+    """
+    Connection reuse counters for this process.
+
+    Returns:
+        Dict: requests, new_connections, tls_handshakes and reused
+        (requests served on an already open connection)
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['reused'] = max(stats['requests'] - stats['new_connections'], 0)
+    return stats
@@ -0,0 +1,54 @@
+"""
+Opaque keyset pagination cursors.
+
+A cursor is the sort key of the last row of a page, e.g. (timestamp, id) for
+messages, encoded as URL-safe base64 JSON so clients treat it as a token.
+"""
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values):
+    """Encode a row's sort key into an opaque cursor string"""
+    raw = json.dumps(list(values), default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): Cursor string from a previous page
+        size (int): Expected number of sort key values
+
+    Returns:
+        List: The sort key values
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a limit query parameter, clamped to 1..MAX_PAGE_SIZE"""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def quote_filter_value(value):
+    """Quote a value for use inside a PostgREST or=(...) filter"""
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
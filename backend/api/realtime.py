@@ -0,0 +1,132 @@
+"""
+Per-user lead change events pushed to open boards over Server-Sent Events.
+
+SupabaseService lead mutations call publish_lead_event(); every open
+GET /events/leads/ stream of the same user receives the event. With
+REALTIME_REDIS_URL configured events travel over Redis pub/sub, so they
+reach streams served by other processes (e.g. a chat task in a Celery
+worker updating a lead). Without it an in-process broker is used, which
+covers a single ASGI process.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+
+# Global variable to hold the sync Redis client used for publishing
+_redis_publisher = None
+
+# In-process subscribers: user_id -> set of (event loop, asyncio.Queue)
+_local_subscribers = {}
+_local_lock = threading.Lock()
+
+
+def _channel(user_id):
+    return f"crm:lead_events:{user_id}"
+
+
+def _redis_url():
+    return getattr(settings, 'REALTIME_REDIS_URL', '')
+
+
+def _get_redis_publisher():
+    """Get the Redis client used for publishing, created lazily"""
+    global _redis_publisher
+    if _redis_publisher is None:
+        import redis
+        _redis_publisher = redis.Redis.from_url(_redis_url())
+    return _redis_publisher
+
+
+def publish_lead_event(event_type, user_id, lead=None, lead_id=None):
+    """
+    Broadcast a lead change to the user's open event streams.
+
+    Never raises: a failed broadcast must not fail the mutation that caused it.
+
+    Args:
+        event_type (str): 'lead.created', 'lead.updated' or 'lead.deleted'
+        user_id (str): Owner of the lead
+        lead (Dict): Lead row after the change (created/updated)
+        lead_id (str): ID of the lead (defaults to lead['id'])
+    """
+    if not user_id:
+        return
+    event = {
+        'type': event_type,
+        'lead_id': lead_id or (lead or {}).get('id'),
+        'lead': lead,
+    }
+    try:
+        if _redis_url():
+            _get_redis_publisher().publish(_channel(user_id), json.dumps(event, default=str))
+        else:
+            _publish_local(user_id, event)
+    except Exception as e:
+        print(f"Error publishing lead event: {e}")
+
+
+def _publish_local(user_id, event):
+    with _local_lock:
+        subscribers = list(_local_subscribers.get(user_id, ()))
+    for loop, queue in subscribers:
+        # Mutations run in sync threads; hand the event over to the stream's loop
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+
+def subscribe_lead_events(user_id, heartbeat):
+    """
+    Async generator over the user's lead events; aclose() it to unsubscribe.
+
+    Yields None every `heartbeat` seconds without events so the caller can
+    keep the connection alive.
+    """
+    if _redis_url():
+        return _subscribe_redis(user_id, heartbeat)
+    return _subscribe_local(user_id, heartbeat)
+
+
+async def _subscribe_local(user_id, heartbeat):
+    subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+    with _local_lock:
+        _local_subscribers.setdefault(user_id, set()).add(subscriber)
+    try:
+        while True:
+            try:
+                yield await asyncio.wait_for(subscriber[1].get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        with _local_lock:
+            subscribers = _local_subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del _local_subscribers[user_id]
+
+
+async def _subscribe_redis(user_id, heartbeat):
+    import redis.asyncio as aioredis
+
+    client = aioredis.Redis.from_url(_redis_url())
+    pubsub = client.pubsub()
+    await pubsub.subscribe(_channel(user_id))
+    try:
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message and message.get('type') == 'message':
+                yield json.loads(message['data'])
+            else:
+                yield None
+    finally:
+        await pubsub.unsubscribe(_channel(user_id))
+        await pubsub.close()
+        await client.close()
+
+
+def format_sse(event=None, comment=None):
+    """Encode one Server-Sent Events frame"""
+    if comment is not None:
+        return f": {comment}\n\n"
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,330 @@
+"""
+Local semantic search over a user's leads.
+
+Leads are embedded into fixed-size vectors and kept in a per-user in-memory
+index, so descriptive questions ("the fintech guy from the conference") can
+be matched against names, companies and notes by cosine similarity instead of
+substrings. The default HashingEmbedder runs offline (hashed words and
+character trigrams); SEMANTIC_EMBEDDER can point at any class with the same
+interface, e.g. one calling an embeddings API.
+
+Vectors live in a NumPy matrix (one matrix product per batch of queries);
+numpy is in requirements.txt, and installs without it fall back to sparse
+Python dicts with the same results. An index is built
+on the first search for a user, then kept current incrementally: each search
+re-embeds only the leads whose text changed, and lead mutations made in this
+process update an existing index straight away (see _lead_changed).
+"""
+import heapq
+import math
+import re
+import threading
+import zlib
+from collections import OrderedDict, Counter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+LEAD_TEXT_FIELDS = ('name', 'company', 'email', 'source', 'status', 'notes')
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from guy guys he her him his i in is it lady me my of on or our '
+    'she that the their them they this to us was we who with you your one person people lead leads'.split()
+)
+
+_numpy = None
+_numpy_checked = False
+
+
+def get_numpy():
+    """NumPy if installed, else None (imported on first use, not at boot)"""
+    global _numpy, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = None
+        _numpy_checked = True
+    return _numpy
+
+
+def lead_text(lead):
+    """Text a lead is embedded from; the email contributes its address and domain"""
+    parts = []
+    for field in LEAD_TEXT_FIELDS:
+        value = lead.get(field)
+        if not value:
+            continue
+        value = str(value)
+        if field == 'email' and '@' in value:
+            value = value.replace('@', ' ')
+        parts.append(value)
+    return ' '.join(parts)
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: words and character trigrams hashed into `dim` signed
+    buckets, sublinear term frequencies, L2-normalised. Trigrams let related
+    word forms ("fintech", "fin-tech", "financial") share some weight.
+
+    Returns sparse vectors ({bucket: weight}); embedders may also return dense
+    sequences of `dim` floats.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim or getattr(settings, 'SEMANTIC_EMBEDDING_DIM', 2048)
+
+    def _features(self, text):
+        counts = Counter()
+        for word in _TOKEN_RE.findall(text.lower()):
+            if word in _STOPWORDS:
+                continue
+            counts['w:' + word] += 1.0
+            padded = f'#{word}#'
+            if len(word) >= 3:
+                for i in range(len(padded) - 2):
+                    counts['c:' + padded[i:i + 3]] += 0.25
+        return counts
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            vector = {}
+            for feature, count in self._features(text).items():
+                digest = zlib.crc32(feature.encode('utf-8'))
+                bucket = digest % self.dim
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vector[bucket] = vector.get(bucket, 0.0) + sign * (1.0 + math.log(count) if count >= 1 else count)
+            vectors.append(_normalized(vector))
+        return vectors
+
+
+def _normalized(vector):
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if not norm:
+        return {}
+    return {bucket: value / norm for bucket, value in vector.items() if value}
+
+
+def _as_sparse(vector):
+    if isinstance(vector, dict):
+        return _normalized(vector)
+    return _normalized({i: float(value) for i, value in enumerate(vector) if value})
+
+
+class VectorIndex:
+    """Cosine top-k index over normalised vectors keyed by id (not thread-safe)"""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.ids = []
+        self.positions = {}
+        self.np = get_numpy()
+        if self.np is not None:
+            self.matrix = self.np.zeros((16, dim), dtype=self.np.float32)
+        else:
+            self.rows = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row(self, vector):
+        sparse = _as_sparse(vector)
+        if self.np is None:
+            return sparse
+        row = self.np.zeros(self.dim, dtype=self.np.float32)
+        for bucket, value in sparse.items():
+            row[bucket] = value
+        return row
+
+    def upsert(self, ids, vectors):
+        for item_id, vector in zip(ids, vectors):
+            row = self._row(vector)
+            position = self.positions.get(item_id)
+            if position is None:
+                position = len(self.ids)
+                self.positions[item_id] = position
+                self.ids.append(item_id)
+                if self.np is not None and position >= len(self.matrix):
+                    grown = self.np.zeros((len(self.matrix) * 2, self.dim), dtype=self.np.float32)
+                    grown[:position] = self.matrix[:position]
+                    self.matrix = grown
+                elif self.np is None:
+                    self.rows.append(None)
+            if self.np is not None:
+                self.matrix[position] = row
+            else:
+                self.rows[position] = row
+
+    def remove(self, ids):
+        for item_id in ids:
+            position = self.positions.pop(item_id, None)
+            if position is None:
+                continue
+            # Move the last row into the hole so rows stay contiguous
+            last = len(self.ids) - 1
+            last_id = self.ids.pop()
+            if position != last:
+                self.ids[position] = last_id
+                self.positions[last_id] = position
+                if self.np is not None:
+                    self.matrix[position] = self.matrix[last]
+                else:
+                    self.rows[position] = self.rows[last]
+            if self.np is not None:
+                self.matrix[last] = 0
+            else:
+                self.rows.pop()
+
+    def search(self, vectors, k):
+        """
+        Top-k rows by cosine similarity for a batch of query vectors.
+
+        Returns:
+            List[List[Tuple[id, float]]]: Per query, (id, score) best first; rows
+            sharing nothing with the query (score <= 0) are left out
+        """
+        count = len(self.ids)
+        if not count or k <= 0:
+            return [[] for _ in vectors]
+        k = min(k, count)
+
+        if self.np is None:
+            results = []
+            for vector in vectors:
+                query = _as_sparse(vector)
+                scored = []
+                for position, row in enumerate(self.rows):
+                    small, large = (query, row) if len(query) <= len(row) else (row, query)
+                    score = sum(value * large.get(bucket, 0.0) for bucket, value in small.items())
+                    if score > 0:
+                        scored.append((score, position))
+                results.append([(self.ids[p], round(s, 4)) for s, p in heapq.nlargest(k, scored)])
+            return results
+
+        np = self.np
+        queries = np.stack([self._row(vector) for vector in vectors])
+        scores = queries @ self.matrix[:count].T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-query_scores[candidates])]
+            results.append([
+                (self.ids[p], round(float(query_scores[p]), 4)) for p in ranked if query_scores[p] > 0
+            ])
+        return results
+
+
+class LeadIndex:
+    """A user's leads and their vectors; re-embeds only leads whose text changed"""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.vectors = VectorIndex(embedder.dim)
+        self.texts = {}
+        self.leads = {}
+        self.lock = threading.Lock()
+
+    def _upsert(self, leads):
+        changed = [lead for lead in leads if self.texts.get(lead['id']) != lead_text(lead)]
+        for lead in leads:
+            self.leads[lead['id']] = lead
+        if changed:
+            texts = [lead_text(lead) for lead in changed]
+            self.vectors.upsert([lead['id'] for lead in changed], self.embedder.embed(texts))
+            for lead, text in zip(changed, texts):
+                self.texts[lead['id']] = text
+        return len(changed)
+
+    def _remove(self, lead_ids):
+        self.vectors.remove(lead_ids)
+        for lead_id in lead_ids:
+            self.texts.pop(lead_id, None)
+            self.leads.pop(lead_id, None)
+
+    def sync(self, leads):
+        """Bring the index in line with the user's full lead list; returns re-embedded count"""
+        with self.lock:
+            current = {lead['id'] for lead in leads if lead.get('id')}
+            self._remove([lead_id for lead_id in list(self.leads) if lead_id not in current])
+            return self._upsert([lead for lead in leads if lead.get('id')])
+
+    def apply(self, lead=None, lead_id=None):
+        """Apply one created/updated lead, or the deletion of lead_id"""
+        with self.lock:
+            if lead and lead.get('id'):
+                self._upsert([lead])
+            elif lead_id:
+                self._remove([lead_id])
+
+    def search(self, queries, k):
+        """Top-k leads per query, each a copy of the lead with a 'similarity' score"""
+        with self.lock:
+            hits = self.vectors.search(self.embedder.embed(queries), k)
+            return [[dict(self.leads[lead_id], similarity=score) for lead_id, score in query_hits]
+                    for query_hits in hits]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+_embedder = None
+
+
+def is_enabled():
+    return getattr(settings, 'SEMANTIC_SEARCH_ENABLED', True)
+
+
+def get_embedder():
+    """The configured embedder (SEMANTIC_EMBEDDER dotted path), created once per process"""
+    global _embedder
+    if _embedder is None:
+        path = getattr(settings, 'SEMANTIC_EMBEDDER', 'backend.api.semantic_search.HashingEmbedder')
+        _embedder = import_string(path)()
+    return _embedder
+
+
+def get_lead_index(user_id, create=True):
+    """The user's index, most recently used users kept up to SEMANTIC_INDEX_MAX_USERS"""
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            _indexes.move_to_end(user_id)
+        elif create:
+            index = _indexes[user_id] = LeadIndex(get_embedder())
+            while len(_indexes) > getattr(settings, 'SEMANTIC_INDEX_MAX_USERS', 50):
+                _indexes.popitem(last=False)
+        return index
+
+
+def search_leads(user_id, queries, leads, k=5):
+    """
+    Semantic top-k search over a user's leads.
+
+    Args:
+        user_id (str): Owner of the leads
+        queries (List[str]): Descriptions to search for, answered in one batch
+        leads (List[Dict]): The user's current leads (the index is synced to them)
+        k (int): Results per query
+
+    Returns:
+        List[List[Dict]]: Per query, matching leads best first with a 'similarity' (0..1)
+    """
+    index = get_lead_index(user_id)
+    index.sync(leads or [])
+    return index.search(queries, k)
+
+
+def lead_changed(user_id, lead=None, lead_id=None):
+    """Incrementally update the user's index in this process, if one was built"""
+    if not is_enabled() or not user_id:
+        return
+    index = get_lead_index(user_id, create=False)
+    if index is None:
+        return
+    try:
+        index.apply(lead=lead, lead_id=lead_id)
+    except Exception as e:
+        print(f"Error updating semantic index: {e}")
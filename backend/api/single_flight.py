@@ -0,0 +1,85 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+When several threads of a process (board requests, the chat thread) ask for
+the same Supabase read at the same moment, only the first one makes the HTTP
+call; the others wait for it and get a copy of its result. Nothing is kept
+once the call returns, so no staleness is added - and a write forgets the
+in-flight reads it affects, so readers arriving after a write always start a
+fresh call instead of joining one that began before it.
+"""
+import copy
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key (a tuple)"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key.
+
+        Args:
+            key (tuple): Identity of the read, e.g. ('leads', user_id)
+            fn (Callable[[], Any]): The read
+
+        Returns:
+            Any: fn's result (followers get a deep copy so callers never share objects)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['calls'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = fn()
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                waiters = call.waiters
+            # Snapshot before the leader's caller can mutate the result
+            if waiters and call.error is None:
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+    def forget(self, prefix):
+        """
+        Detach in-flight calls whose key starts with prefix, so callers arriving
+        after a write start a new read. Callers already waiting keep their call.
+        """
+        size = len(prefix)
+        with self._lock:
+            for key in [k for k in self._calls if k[:size] == prefix]:
+                del self._calls[key]
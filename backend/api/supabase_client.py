@@ -1,9 +1,25 @@
 from django.conf import settings
 import os
+from .data_version import bump_data_version, LEADS, CONVERSATIONS, MESSAGES
+from .realtime import publish_lead_event
+from .pagination import quote_filter_value
+from .single_flight import SingleFlight
+from .user_profiles import invalidate_user_profile
+from . import semantic_search
 
 # Global variable to hold the client
 supabase = None
 
+# Coalesces identical concurrent reads (board, chat thread) into one HTTP call
+reads = SingleFlight()
+
+# Users columns: profile lookups never fetch the password hash, login does
+USER_PROFILE_COLUMNS = 'id, email, first_name, last_name, is_admin, is_active'
+USER_AUTH_COLUMNS = USER_PROFILE_COLUMNS + ', password_hash'
+
+# Kanban columns, in board order
+LEAD_STATUSES = ['Interest', 'Meeting booked', 'Proposal sent', 'Closed win', 'Closed lost']
+
 def get_supabase_client():
     """Get Supabase client with lazy loading and error handling"""
     global supabase
@@ -40,6 +56,14 @@ def get_supabase_client():
         supabase = None
         return None
 
+def _lead_changed(event_type, user_id, lead=None, lead_id=None):
+    """Invalidate lead ETags, update this process's semantic index and notify the owner's open boards after a mutation"""
+    reads.forget(('leads', user_id))
+    reads.forget(('leads', None))
+    bump_data_version(LEADS, user_id)
+    semantic_search.lead_changed(user_id, lead=lead, lead_id=lead_id)
+    publish_lead_event(event_type, user_id, lead=lead, lead_id=lead_id)
+
 class SupabaseService:
     """Service class to handle Supabase operations for leads, conversations, and messages"""
     
@@ -51,15 +75,19 @@ class SupabaseService:
         if not client:
             print("Supabase client not available")
             return []
-        try:
-            query = client.table('leads').select('*').order('status').order('card_order')
-            if user_id:
-                query = query.eq('user_id', user_id)
-            response = query.execute()
-            return response.data
-        except Exception as e:
-            print(f"Error fetching leads: {e}")
-            return []
+        
+        def fetch():
+            try:
+                query = client.table('leads').select('*').order('status').order('card_order')
+                if user_id:
+                    query = query.eq('user_id', user_id)
+                response = query.execute()
+                return response.data
+            except Exception as e:
+                print(f"Error fetching leads: {e}")
+                return []
+        
+        return reads.do(('leads', user_id), fetch)
     
     @staticmethod
     def create_lead(lead_data, user_id=None):
@@ -72,11 +100,42 @@ class SupabaseService:
             if user_id:
                 lead_data['user_id'] = user_id
             response = client.table('leads').insert(lead_data).execute()
-            return response.data[0] if response.data else None
+            new_lead = response.data[0] if response.data else None
+            if new_lead:
+                _lead_changed('lead.created', new_lead.get('user_id') or user_id, lead=new_lead)
+            return new_lead
         except Exception as e:
             print(f"Error creating lead: {e}")
             return None
     
+    @staticmethod
+    def create_leads(leads_data, user_id=None):
+        """
+        Create many leads in one insert (imports). Open boards get a single
+        event and catch up through the change log instead of one event per lead.
+        Returns the created leads, or None if the insert failed.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        if not leads_data:
+            return []
+        try:
+            if user_id:
+                for lead_data in leads_data:
+                    lead_data['user_id'] = user_id
+            response = client.table('leads').insert(leads_data).execute()
+            new_leads = response.data or []
+            for new_lead in new_leads[:-1]:
+                semantic_search.lead_changed(new_lead.get('user_id') or user_id, lead=new_lead)
+            if new_leads:
+                _lead_changed('lead.created', new_leads[-1].get('user_id') or user_id, lead=new_leads[-1])
+            return new_leads
+        except Exception as e:
+            print(f"Error creating leads: {e}")
+            return None
+    
     @staticmethod
     def update_lead(lead_id, lead_data, user_id=None):
         """Update an existing lead in Supabase"""
@@ -89,7 +148,10 @@ class SupabaseService:
             if user_id:
                 query = query.eq('user_id', user_id)
             response = query.execute()
-            return response.data[0] if response.data else None
+            updated_lead = response.data[0] if response.data else None
+            if updated_lead:
+                _lead_changed('lead.updated', updated_lead.get('user_id') or user_id, lead=updated_lead)
+            return updated_lead
         except Exception as e:
             print(f"Error updating lead: {e}")
             return None
@@ -106,6 +168,8 @@ class SupabaseService:
             if user_id:
                 query = query.eq('user_id', user_id)
             response = query.execute()
+            deleted = response.data[0] if response.data else {}
+            _lead_changed('lead.deleted', deleted.get('user_id') or user_id, lead_id=lead_id)
             return True
         except Exception as e:
             print(f"Error deleting lead: {e}")
@@ -128,35 +192,235 @@ class SupabaseService:
             print(f"Error fetching lead: {e}")
             return None
     
-    # User operations
     @staticmethod
-    def get_user_by_email(email):
-        """Get user by email"""
+    def get_leads_by_ids(lead_ids, user_id=None):
+        """Get several leads by ID in one query"""
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return []
+        if not lead_ids:
+            return []
+        try:
+            query = client.table('leads').select('*').in_('id', list(lead_ids))
+            if user_id:
+                query = query.eq('user_id', user_id)
+            response = query.execute()
+            return response.data
+        except Exception as e:
+            print(f"Error fetching leads by id: {e}")
+            return []
+    
+    # Kanban board operations (see scripts/kanban_board.sql)
+    @staticmethod
+    def get_kanban_board(user_id, page_size):
+        """
+        Get the board in one RPC: for each of LEAD_STATUSES its lead count, value
+        sum and first page_size cards. Returns {'columns': [...]} or None.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        
+        def fetch():
+            try:
+                response = client.rpc('get_kanban_board', {
+                    'p_user_id': user_id,
+                    'p_statuses': LEAD_STATUSES,
+                    'p_page_size': page_size
+                }).execute()
+                return response.data
+            except Exception as e:
+                print(f"Error fetching kanban board: {e}")
+                return None
+        
+        return reads.do(('leads', user_id, 'board', page_size), fetch)
+    
+    @staticmethod
+    def get_kanban_column_page(user_id, status, limit, after=None):
+        """
+        Get the next cards of one column after the (card_order, id) of the last
+        loaded card. Returns {'cards': [...], 'has_more': bool} or None.
+        """
         client = get_supabase_client()
         if not client:
             print("Supabase client not available")
             return None
         try:
-            response = client.table('users').select('*').eq('email', email).execute()
-            return response.data[0] if response.data else None
+            after_order, after_id = after or (None, None)
+            # Fetch one extra row to know whether more cards follow
+            response = client.rpc('get_kanban_column', {
+                'p_user_id': user_id,
+                'p_status': status,
+                'p_after_order': after_order,
+                'p_after_id': after_id,
+                'p_limit': limit + 1
+            }).execute()
+            rows = response.data
+            return {'cards': rows[:limit], 'has_more': len(rows) > limit}
         except Exception as e:
-            print(f"Error fetching user: {e}")
+            print(f"Error fetching kanban column: {e}")
             return None
     
     @staticmethod
-    def get_user_by_id(user_id):
-        """Get user by ID"""
+    def move_lead(lead_id, to_status, before_id=None, after_id=None, user_id=None):
+        """
+        Move a card after after_id / before before_id (end of the column without
+        either) in one transaction, renumbering the affected columns (see
+        scripts/move_lead.sql). Returns {'lead': moved lead, 'reordered': [neighbours
+        whose card_order changed]}, or None if the lead was not found or the call failed.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            response = client.rpc('move_lead', {
+                'p_user_id': user_id,
+                'p_lead_id': lead_id,
+                'p_to_status': to_status,
+                'p_before_id': before_id,
+                'p_after_id': after_id
+            }).execute()
+            rows = response.data
+            if not rows:
+                return None
+            moved_lead = rows[0]
+            _lead_changed('lead.updated', moved_lead.get('user_id') or user_id, lead=moved_lead)
+            return {'lead': moved_lead, 'reordered': rows[1:]}
+        except Exception as e:
+            print(f"Error moving lead: {e}")
+            return None
+    
+    # Analytics (see scripts/pipeline_analytics.sql)
+    @staticmethod
+    def get_pipeline_aggregates(user_id, since=None):
+        """
+        Get per-status and per-source/month lead aggregates in one RPC.
+        since (datetime) limits the source/month breakdown to leads created after it.
+        Returns {'by_status': [...], 'by_source_month': [...]} or None.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            response = client.rpc('get_pipeline_analytics', {
+                'p_user_id': user_id,
+                'p_since': since.isoformat() if since else None
+            }).execute()
+            return response.data
+        except Exception as e:
+            print(f"Error fetching pipeline analytics: {e}")
+            return None
+    
+    # Full-text search (see scripts/full_text_search.sql)
+    @staticmethod
+    def search_crm(user_id, query, scope='all', limit=20, offset=0):
+        """
+        Ranked full-text search over a user's leads and/or conversation messages.
+        scope is 'all', 'leads' or 'messages'; query uses web search syntax.
+        Returns {'results': [...], 'has_more': bool} or None.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            # One extra row tells whether another page exists
+            response = client.rpc('search_crm', {
+                'p_user_id': user_id,
+                'p_query': query,
+                'p_scope': scope,
+                'p_limit': limit + 1,
+                'p_offset': offset
+            }).execute()
+            rows = response.data or []
+            return {'results': rows[:limit], 'has_more': len(rows) > limit}
+        except Exception as e:
+            print(f"Error searching leads and messages: {e}")
+            return None
+    
+    # Lead change log operations (see scripts/lead_change_log.sql)
+    @staticmethod
+    def get_lead_changes(user_id, since_txid, since_id, limit=500):
+        """
+        Get committed lead change log entries for a user after the cursor
+        (since_txid, since_id), oldest first. Entries of transactions that may
+        still be running are held back until they are settled.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            response = client.rpc('get_lead_changes', {
+                'p_user_id': user_id,
+                'p_since_txid': str(since_txid),
+                'p_since_id': since_id,
+                'p_limit': limit
+            }).execute()
+            return response.data or []
+        except Exception as e:
+            print(f"Error fetching lead changes: {e}")
+            return None
+    
+    @staticmethod
+    def get_lead_change_bounds():
+        """
+        Get the sync cursor bounds as integers: the visibility horizon (every
+        change not served yet belongs to a transaction at or after it) and the
+        oldest retained transaction (older cursors can no longer be served, None
+        when the log is empty)
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            bounds = client.rpc('get_lead_change_bounds', {}).execute().data
+            return {
+                'horizon': int(bounds['horizon']),
+                'oldest': int(bounds['oldest']) if bounds.get('oldest') else None,
+            }
+        except Exception as e:
+            print(f"Error fetching lead change bounds: {e}")
+            return None
+    
+    # User operations
+    @staticmethod
+    def get_user_by_email(email):
+        """Get user by email, including password_hash (for login only)"""
         client = get_supabase_client()
         if not client:
             print("Supabase client not available")
             return None
         try:
-            response = client.table('users').select('*').eq('id', user_id).execute()
+            response = client.table('users').select(USER_AUTH_COLUMNS).eq('email', email).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             print(f"Error fetching user: {e}")
             return None
     
+    @staticmethod
+    def get_user_by_id(user_id):
+        """Get user profile columns by ID (no password_hash); see user_profiles for the cached lookup"""
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        
+        def fetch():
+            try:
+                response = client.table('users').select(USER_PROFILE_COLUMNS).eq('id', user_id).execute()
+                return response.data[0] if response.data else None
+            except Exception as e:
+                print(f"Error fetching user: {e}")
+                return None
+        
+        return reads.do(('user', user_id), fetch)
+    
     @staticmethod
     def create_user(user_data):
         """Create a new user"""
@@ -171,6 +435,22 @@ class SupabaseService:
             print(f"Error creating user: {e}")
             return None
     
+    @staticmethod
+    def update_user(user_id, user_data):
+        """Update a user and drop their cached profile"""
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            response = client.table('users').update(user_data).eq('id', user_id).execute()
+            reads.forget(('user', user_id))
+            invalidate_user_profile(user_id)
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error updating user: {e}")
+            return None
+    
     # Conversation operations
     @staticmethod
     def get_user_conversations(user_id):
@@ -186,6 +466,32 @@ class SupabaseService:
             print(f"Error fetching conversations: {e}")
             return []
     
+    @staticmethod
+    def get_user_conversations_page(user_id, limit, before=None):
+        """
+        Get one page of a user's conversations with their summaries, newest first
+        by (updated_at, id) keyset. before=(updated_at, id) continues after the
+        last conversation of the previous page.
+        Returns {'conversations': [...], 'has_more': bool}.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            columns = 'id, title, created_at, updated_at, message_count, last_message_preview, last_message_at'
+            query = client.table('conversations').select(columns).eq('user_id', user_id)
+            if before:
+                updated_at, conversation_id = (quote_filter_value(v) for v in before)
+                query = query.or_(f"updated_at.lt.{updated_at},and(updated_at.eq.{updated_at},id.lt.{conversation_id})")
+            # Fetch one extra row to know whether another page exists
+            response = query.order('updated_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
+            rows = response.data
+            return {'conversations': rows[:limit], 'has_more': len(rows) > limit}
+        except Exception as e:
+            print(f"Error fetching conversations page: {e}")
+            return None
+    
     @staticmethod
     def create_conversation(user_id, title="New Conversation"):
         """Create a new conversation"""
@@ -199,6 +505,7 @@ class SupabaseService:
                 'title': title
             }
             response = client.table('conversations').insert(conversation_data).execute()
+            bump_data_version(CONVERSATIONS, user_id)
             return response.data[0] if response.data else None
         except Exception as e:
             print(f"Error creating conversation: {e}")
@@ -211,15 +518,19 @@ class SupabaseService:
         if not client:
             print("Supabase client not available")
             return None
-        try:
-            query = client.table('conversations').select('*').eq('id', conversation_id)
-            if user_id:
-                query = query.eq('user_id', user_id)
-            response = query.execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            print(f"Error fetching conversation: {e}")
-            return None
+        
+        def fetch():
+            try:
+                query = client.table('conversations').select('*').eq('id', conversation_id)
+                if user_id:
+                    query = query.eq('user_id', user_id)
+                response = query.execute()
+                return response.data[0] if response.data else None
+            except Exception as e:
+                print(f"Error fetching conversation: {e}")
+                return None
+        
+        return reads.do(('conversation', conversation_id, user_id), fetch)
     
     @staticmethod
     def update_conversation(conversation_id, conversation_data, user_id=None):
@@ -233,7 +544,11 @@ class SupabaseService:
             if user_id:
                 query = query.eq('user_id', user_id)
             response = query.execute()
-            return response.data[0] if response.data else None
+            updated_conversation = response.data[0] if response.data else None
+            reads.forget(('conversation', conversation_id))
+            if updated_conversation:
+                bump_data_version(CONVERSATIONS, updated_conversation.get('user_id') or user_id)
+            return updated_conversation
         except Exception as e:
             print(f"Error updating conversation: {e}")
             return None
@@ -250,6 +565,10 @@ class SupabaseService:
             if user_id:
                 query = query.eq('user_id', user_id)
             response = query.execute()
+            deleted = response.data[0] if response.data else {}
+            reads.forget(('conversation', conversation_id))
+            bump_data_version(CONVERSATIONS, deleted.get('user_id') or user_id)
+            bump_data_version(MESSAGES, conversation_id)
             return True
         except Exception as e:
             print(f"Error deleting conversation: {e}")
@@ -271,8 +590,40 @@ class SupabaseService:
             return []
     
     @staticmethod
-    def create_message(conversation_id, content, is_user, function_results=None):
-        """Create a new message in a conversation"""
+    def get_conversation_messages_page(conversation_id, limit, before=None, include_function_results=True):
+        """
+        Get one window of messages, newest first by (timestamp, id) keyset.
+        
+        before=(timestamp, id) continues below the oldest message of the previous
+        window. Returns {'messages': [...oldest first...], 'has_more': bool}.
+        """
+        client = get_supabase_client()
+        if not client:
+            print("Supabase client not available")
+            return None
+        try:
+            columns = '*' if include_function_results else 'id, conversation_id, content, is_user, timestamp'
+            query = client.table('messages').select(columns).eq('conversation_id', conversation_id)
+            if before:
+                timestamp, message_id = (quote_filter_value(v) for v in before)
+                query = query.or_(f"timestamp.lt.{timestamp},and(timestamp.eq.{timestamp},id.lt.{message_id})")
+            # Fetch one extra row to know whether an older window exists
+            response = query.order('timestamp', desc=True).order('id', desc=True).limit(limit + 1).execute()
+            rows = response.data
+            messages = rows[:limit]
+            messages.reverse()
+            return {'messages': messages, 'has_more': len(rows) > limit}
+        except Exception as e:
+            print(f"Error fetching messages page: {e}")
+            return None
+    
+    @staticmethod
+    def create_message(conversation_id, content, is_user, function_results=None, user_id=None):
+        """
+        Create a new message in a conversation
+        The conversation summary (count, preview) is maintained by a trigger, see
+        scripts/conversation_summaries.sql; user_id invalidates the owner's list ETag
+        """
         client = get_supabase_client()
         if not client:
             print("Supabase client not available")
@@ -285,6 +636,9 @@ class SupabaseService:
                 'function_results': function_results
             }
             response = client.table('messages').insert(message_data).execute()
+            reads.forget(('conversation', conversation_id))
+            bump_data_version(MESSAGES, conversation_id)
+            bump_data_version(CONVERSATIONS, user_id)
             return response.data[0] if response.data else None
         except Exception as e:
             print(f"Error creating message: {e}")
@@ -1,55 +1,118 @@
 from celery import shared_task
-from django.conf import settings
-import openai
-import json
-from .supabase_client import SupabaseService
-from .chat_service import ChatService
+from django.core.cache import cache
 
-# Initialize OpenAI client
-openai.api_key = settings.OPENAI_API_KEY
+# Make sure shared_task binds to the configured app (backend/__init__ loads it lazily)
+from backend.celery_app import app as celery_app
 
-@shared_task(bind=True)
+# Kept light on purpose: the OpenAI and Supabase stacks are imported inside
+# the task, so the worker parent and idle children stay small.
+
+TASK_RESULT_TIMEOUT = 300
+TASK_PHASE_TIMEOUT = 3600
+
+# Processing phases recorded per task, so a redelivered task knows what already happened
+PHASE_ROUTING = 'routing'      # Only model calls so far - safe to run again
+PHASE_EXECUTING = 'executing'  # A lead function ran - running again could repeat it
+
+
+@shared_task(bind=True, acks_late=True)
 def process_chat_message(self, message, session_key, **kwargs):
     """
     Background task to process chat messages with OpenAI
-    
+
+    Idempotent per task id, so acks-late redelivery is safe: a task that
+    already finished returns its stored result, and a task that was
+    interrupted after a lead function ran is reported as failed instead of
+    running the function twice. Upstream errors are not retried here: the
+    model calls already retry within the turn deadline (call_policy), and
+    process_message turns anything else into an error reply.
+
     Args:
         message (str): User's chat message
         session_key (str): Django session key for context storage
         **kwargs: Additional arguments including conversation_id and user_id
-    
+
     Returns:
         dict: Response containing AI message and any lead operations performed
     """
+    task_id = self.request.id
+    result_key = f"task_{task_id}"
+    phase_key = f"task_{task_id}_phase"
+
+    finished = cache.get(result_key)
+    if finished and finished.get('state') in ('SUCCESS', 'FAILURE'):
+        print(f"♻️ Task {task_id} already finished - returning stored result")
+        return finished.get('result')
+
+    if cache.get(phase_key) == PHASE_EXECUTING:
+        response = {
+            "ai_message": "Your last request was interrupted. Please check the board before trying again.",
+            "function_results": [],
+            "status": "error",
+            "error": "Task interrupted after a lead change"
+        }
+        cache.set(result_key, {'state': 'SUCCESS', 'result': response}, TASK_RESULT_TIMEOUT)
+        return response
+
     try:
+        from .supabase_client import SupabaseService
+        from .chat_service import ChatService
+        from .call_policy import task_abandoned_check
+
         # Extract parameters from kwargs
         conversation_id = kwargs.get('conversation_id')
         user_id = kwargs.get('user_id')
-        
+
         # Update task status
+        cache.set(phase_key, PHASE_ROUTING, TASK_PHASE_TIMEOUT)
         self.update_state(state='PROCESSING', meta={'status': 'Processing your message...'})
-        
+
         # Get current leads for context (filtered by user)
         leads = SupabaseService.get_all_leads(user_id=user_id)
-        
+
         # Initialize chat service
         chat_service = ChatService()
-        
+
         # Process the message with OpenAI
         response = chat_service.process_message(
-            message, 
-            session_key, 
-            leads, 
-            conversation_id=conversation_id, 
-            user_id=user_id
+            message,
+            session_key,
+            leads,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            should_cancel=task_abandoned_check(task_id),
+            on_function_call=lambda: cache.set(phase_key, PHASE_EXECUTING, TASK_PHASE_TIMEOUT)
         )
-        
+
+        cache.set(result_key, {'state': 'SUCCESS', 'result': response}, TASK_RESULT_TIMEOUT)
         return response
-        
+
     except Exception as exc:
         # Update task state with error
+        cache.set(result_key, {'state': 'FAILURE', 'error': str(exc)}, TASK_RESULT_TIMEOUT)
         self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'status': 'An error occurred while processing your message.'}
         )
-        raise exc 
\ No newline at end of file
+        raise exc
+
+
+@shared_task
+def scan_duplicate_leads(user_id):
+    """
+    Batch duplicate scan of one user's leads, queued after bulk imports (see
+    duplicates.schedule_duplicate_scan). The clusters are cached for
+    GET /leads/duplicates/.
+
+    Args:
+        user_id (str): Owner of the leads
+
+    Returns:
+        dict: Number of clusters and of leads in them
+    """
+    from .duplicates import get_duplicate_clusters
+
+    clusters = get_duplicate_clusters(user_id)
+    duplicates = sum(len(cluster['leads']) for cluster in clusters)
+    print(f"🔎 Duplicate scan for {user_id}: {len(clusters)} clusters, {duplicates} leads")
+    return {'clusters': len(clusters), 'leads': duplicates}
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import base64
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from . import duplicates
+from .chat_service import parse_currency_value, parse_currency_values
+from .idempotency import idempotent
+from .pagination import decode_cursor, encode_cursor
+from .single_flight import SingleFlight
+from .supabase_client import SupabaseService
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        cursor = encode_cursor('18446744073709551615', 'lead-1')
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor, 2), ['18446744073709551615', 'lead-1'])
+
+    def test_round_trip_timestamp_key(self):
+        cursor = encode_cursor('2024-06-01T12:00:00+00:00', 42)
+        self.assertEqual(decode_cursor(cursor, 2), ['2024-06-01T12:00:00+00:00', 42])
+
+    def test_rejects_wrong_size(self):
+        with self.assertRaises(ValueError):
+            decode_cursor(encode_cursor('1', 'a'), 3)
+
+    def test_rejects_garbage(self):
+        for cursor in ('!!!', 'not a cursor', encode_cursor('x')[:-2] + '@@', ''):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor, 1)
+
+    def test_rejects_json_that_is_not_a_list(self):
+        cursor = base64.urlsafe_b64encode(b'{"a": 1}').decode('ascii')
+        with self.assertRaises(ValueError):
+            decode_cursor(cursor, 1)
+
+
+class IdempotencyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.calls = 0
+        self.nested = None
+        self.status = 201
+
+        @api_view(['POST'])
+        @idempotent
+        def view(request):
+            self.calls += 1
+            if request.data.get('send_duplicate'):
+                # A duplicate that arrives while this request is still running
+                self.nested = view(self.request(request.data, key=request.headers['Idempotency-Key']))
+            return Response({'call': self.calls}, status=self.status)
+
+        self.view = view
+
+    def request(self, data, key='key-1', user_id='u1'):
+        request = self.factory.post('/api/leads/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        request.session = {'user_id': user_id}
+        return request
+
+    def test_replays_stored_response(self):
+        first = self.view(self.request({'name': 'Ann'}))
+        second = self.view(self.request({'name': 'Ann'}))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_keys_are_scoped_per_user(self):
+        self.view(self.request({'name': 'Ann'}, user_id='u1'))
+        self.view(self.request({'name': 'Ann'}, user_id='u2'))
+        self.assertEqual(self.calls, 2)
+
+    def test_reused_key_with_other_payload_is_422(self):
+        self.view(self.request({'name': 'Ann'}))
+        response = self.view(self.request({'name': 'Bob'}))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_duplicate_while_in_progress_is_409_at_once(self):
+        started = time.monotonic()
+        first = self.view(self.request({'send_duplicate': True}))
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.nested.status_code, 409)
+        self.assertEqual(self.nested['Retry-After'], '1')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_server_errors_are_not_stored(self):
+        self.status = 500
+        self.view(self.request({'name': 'Ann'}))
+        self.status = 201
+        response = self.view(self.request({'name': 'Ann'}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+    def test_requests_without_key_pass_through(self):
+        for _ in range(2):
+            request = self.factory.post('/api/leads/', {'name': 'Ann'}, format='json')
+            request.session = {'user_id': 'u1'}
+            self.view(request)
+        self.assertEqual(self.calls, 2)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def start_leader(self, flight, key):
+        """Start a call that blocks until the returned event is set"""
+        release = threading.Event()
+        results = []
+
+        def read():
+            release.wait(5)
+            return {'rows': [1, 2]}
+
+        thread = threading.Thread(target=lambda: results.append(flight.do(key, read)))
+        thread.start()
+        self.wait_for(lambda: key in flight._calls)
+        return release, thread, results
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'timed out')
+            time.sleep(0.005)
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        release, leader, results = self.start_leader(flight, ('leads', 'u1'))
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do(('leads', 'u1'), lambda: self.fail('ran twice'))))
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        self.wait_for(lambda: flight.stats['coalesced'] == 3)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(flight.stats['calls'], 1)
+        self.assertEqual(results, [{'rows': [1, 2]}] * 4)
+        # Followers get copies, not the leader's object
+        self.assertEqual(len({id(result) for result in results}), 4)
+
+    def test_errors_propagate_and_are_not_kept(self):
+        flight = SingleFlight()
+        with self.assertRaises(RuntimeError):
+            flight.do(('leads', 'u1'), mock.Mock(side_effect=RuntimeError('down')))
+        # Nothing is kept once a call returns
+        self.assertEqual(flight.do(('leads', 'u1'), lambda: 'fresh'), 'fresh')
+
+    def test_forget_detaches_calls_by_prefix(self):
+        flight = SingleFlight()
+        release, leader, _ = self.start_leader(flight, ('leads', 'u1'))
+        other_release, other, _ = self.start_leader(flight, ('messages', 'u1'))
+
+        flight.forget(('leads',))
+        self.assertNotIn(('leads', 'u1'), flight._calls)
+        self.assertIn(('messages', 'u1'), flight._calls)
+        # A read after the write starts its own call instead of joining the old one
+        self.assertEqual(flight.do(('leads', 'u1'), lambda: 'after write'), 'after write')
+
+        release.set()
+        other_release.set()
+        leader.join(5)
+        other.join(5)
+        self.assertEqual(flight.stats, {'calls': 3, 'coalesced': 0})
+
+
+class DuplicateTests(SimpleTestCase):
+    def reasons_by_ids(self, leads):
+        return {
+            frozenset(lead['id'] for lead in cluster['leads']): cluster['reasons']
+            for cluster in duplicates.find_duplicate_clusters(leads)
+        }
+
+    def test_near_duplicate_names(self):
+        clusters = self.reasons_by_ids([
+            {'id': 1, 'name': 'Jonathan Smith', 'company': 'Acme Inc'},
+            {'id': 2, 'name': 'Jonathon Smith', 'company': 'ACME'},
+            {'id': 3, 'name': 'Maria Garcia', 'company': 'Globex'},
+        ])
+        self.assertEqual(list(clusters), [frozenset([1, 2])])
+
+    def test_same_name_at_different_companies_is_not_a_duplicate(self):
+        clusters = self.reasons_by_ids([
+            {'id': 1, 'name': 'John Smith', 'company': 'Acme'},
+            {'id': 2, 'name': 'John Smith', 'company': 'Globex'},
+        ])
+        self.assertEqual(clusters, {})
+
+    def test_email_and_phone_clusters(self):
+        clusters = self.reasons_by_ids([
+            {'id': 1, 'name': 'J. Doe', 'email': 'John.Doe+crm@gmail.com'},
+            {'id': 2, 'name': 'Johnny', 'email': 'johndoe@googlemail.com'},
+            {'id': 3, 'name': 'Front desk', 'phone': '+44 20 7946 0000'},
+            {'id': 4, 'name': 'Reception', 'phone': '020 7946 0000'},
+            {'id': 5, 'name': 'Someone else', 'email': 'other@gmail.com', 'phone': '555 0100 999'},
+        ])
+        self.assertEqual(clusters, {frozenset([1, 2]): ['email'], frozenset([3, 4]): ['phone']})
+
+    def test_matches_are_merged_transitively(self):
+        clusters = self.reasons_by_ids([
+            {'id': 1, 'name': 'Ann Lee', 'email': 'ann@example.com'},
+            {'id': 2, 'name': 'A. Lee', 'email': 'ann@example.com', 'phone': '415 555 0199'},
+            {'id': 3, 'name': 'Lee household', 'phone': '(415) 555-0199'},
+        ])
+        self.assertEqual(clusters, {frozenset([1, 2, 3]): ['email', 'phone']})
+
+    def test_find_duplicates_skips_the_lead_itself(self):
+        leads = [{'id': 1, 'name': 'Ann Lee', 'email': 'ann@example.com'}]
+        self.assertEqual(len(duplicates.find_duplicates({'email': 'ANN@example.com'}, leads)), 1)
+        self.assertEqual(duplicates.find_duplicates({'email': 'ann@example.com'}, leads, exclude_id=1), [])
+        self.assertEqual(duplicates.find_duplicates({}, leads), [])
+
+    def test_parse_allow_duplicate(self):
+        self.assertTrue(duplicates.parse_allow_duplicate('true'))
+        self.assertFalse(duplicates.parse_allow_duplicate('false'))
+        self.assertFalse(duplicates.parse_allow_duplicate(None))
+        with self.assertRaises(ValueError):
+            duplicates.parse_allow_duplicate('yes please')
+
+    @override_settings(DATA_VERSIONS_ENABLED=False)
+    def test_scan_cache_without_data_versions(self):
+        cache.clear()
+        leads = [
+            {'id': 1, 'name': 'Ann Lee', 'email': 'ann@example.com'},
+            {'id': 2, 'name': 'Ann Lee', 'email': 'ann@example.com'},
+        ]
+        with mock.patch.object(SupabaseService, 'get_all_leads', side_effect=lambda user_id: [dict(lead) for lead in leads]), \
+                mock.patch.object(duplicates, 'find_duplicate_clusters', wraps=duplicates.find_duplicate_clusters) as scan:
+            first = duplicates.get_duplicate_clusters('u1')
+            self.assertEqual(duplicates.get_duplicate_clusters('u1'), first)
+            self.assertEqual(scan.call_count, 1)
+
+            leads[1]['email'] = 'someone@example.org'
+            leads[1]['name'] = 'Bob Stone'
+            self.assertEqual(duplicates.get_duplicate_clusters('u1'), [])
+            self.assertEqual(scan.call_count, 2)
+
+
+class CurrencyParsingTests(SimpleTestCase):
+    def test_formats(self):
+        cases = {
+            '500 euros': 500,
+            '$2500': 2500,
+            '1000 USD': 1000,
+            '€1500': 1500,
+            '£2000': 2000,
+            '1.5k': 1500,
+            '2M': 2000000,
+            '1,000.50': 1000.5,
+            '1.000,50': 1000.5,
+            '3 million': 3000000,
+            '5 euros mixed': 5,
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_currency_value(text), expected)
+
+    def test_numbers(self):
+        self.assertEqual(parse_currency_value(0), 0)
+        self.assertEqual(parse_currency_value(12.5), 12.5)
+        self.assertIsNone(parse_currency_value(float('inf')))
+
+    def test_unparseable(self):
+        for value in (None, '', 'abc'):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_currency_value(value))
+
+    def test_batch_matches_single_values(self):
+        values = ['1k', '€1500', '1k', 7, '', 'n/a', '2M']
+        self.assertEqual(parse_currency_values(values), [parse_currency_value(value) for value in values])
@@ -13,12 +13,33 @@ urlpatterns = [
     # Main leads endpoint - GET all leads (grouped by status) or POST new lead
     path('leads/', views.leads_list, name='leads_list'),
     
+    # Delta sync for the Kanban board - changes since a cursor (must precede leads/<id>/)
+    path('leads/changes/', views.lead_changes, name='lead_changes'),
+    
+    # Bulk import (must precede leads/<id>/)
+    path('leads/import/', views.import_leads, name='import_leads'),
+    
+    # Duplicate lead clusters (must precede leads/<id>/)
+    path('leads/duplicates/', views.duplicate_leads, name='duplicate_leads'),
+    
     # Individual lead operations - GET, PUT, DELETE by ID
     path('leads/<str:lead_id>/', views.lead_detail, name='lead_detail'),
     
     # Special endpoint for updating lead status (Kanban drag & drop)
     path('leads/<str:lead_id>/status/', views.update_lead_status, name='update_lead_status'),
     
+    # Atomic card move/reorder (Kanban drag & drop, see scripts/move_lead.sql)
+    path('leads/<str:lead_id>/move/', views.move_lead, name='move_lead'),
+    
+    # Pipeline analytics (see scripts/pipeline_analytics.sql)
+    path('analytics/pipeline/', views.pipeline_analytics, name='pipeline_analytics'),
+    
+    # Full-text search over lead notes and conversation messages (see scripts/full_text_search.sql)
+    path('search/', views.search, name='search'),
+    
+    # Realtime lead change events (Server-Sent Events, ASGI only)
+    path('events/leads/', views.lead_events, name='lead_events'),
+    
     # Conversation endpoints
     path('conversations/', views.conversations_list, name='conversations_list'),
     path('conversations/create/', views.create_conversation, name='create_conversation'),
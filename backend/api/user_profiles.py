@@ -0,0 +1,66 @@
+"""
+Cached profiles of authenticated users.
+
+current_user runs on every page load and permission checks need is_admin;
+both read the small profile below from the Django cache instead of asking
+Supabase each time. Login primes the entry, writes to a user invalidate it,
+and a short TTL bounds staleness for changes made outside the app.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _profile_key(user_id):
+    return f"user_profile:{user_id}"
+
+
+def to_profile(user_data):
+    """Public profile of a users row (never includes password_hash)"""
+    return {
+        'id': user_data['id'],
+        'email': user_data['email'],
+        'first_name': user_data.get('first_name') or '',
+        'last_name': user_data.get('last_name') or '',
+        'is_admin': bool(user_data.get('is_admin', False)),
+    }
+
+
+def get_user_profile(user_id):
+    """
+    Get a user's profile, from the cache when possible.
+
+    Returns:
+        Dict: Profile (id, email, first_name, last_name, is_admin), or None if the user does not exist
+    """
+    key = _profile_key(user_id)
+    try:
+        profile = cache.get(key)
+        if profile is not None:
+            return profile
+    except Exception as e:
+        print(f"Error reading user profile cache: {e}")
+
+    # SupabaseService invalidates profiles on user writes, so import it lazily
+    from .supabase_client import SupabaseService
+    user_data = SupabaseService.get_user_by_id(user_id)
+    if not user_data:
+        return None
+    profile = to_profile(user_data)
+    set_user_profile(profile)
+    return profile
+
+
+def set_user_profile(profile):
+    """Store a profile, e.g. right after login where the row was loaded anyway"""
+    try:
+        cache.set(_profile_key(profile['id']), profile, getattr(settings, 'USER_PROFILE_CACHE_TTL', 300))
+    except Exception as e:
+        print(f"Error caching user profile: {e}")
+
+
+def invalidate_user_profile(user_id):
+    """Drop a cached profile after the user row changed"""
+    try:
+        cache.delete(_profile_key(user_id))
+    except Exception as e:
+        print(f"Error invalidating user profile: {e}")
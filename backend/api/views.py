@@ -1,17 +1,31 @@
 from django.shortcuts import render
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.hashers import check_password
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .supabase_client import SupabaseService
-from .tasks import process_chat_message
-from .chat_service import ChatService
-from celery.result import AsyncResult
+from .supabase_client import SupabaseService, LEAD_STATUSES
+from . import data_version
+from . import realtime
+from .pagination import encode_cursor, decode_cursor, parse_page_size
+from .call_policy import mark_task_polled, task_abandoned_check
+from .idempotency import idempotent
+from .user_profiles import get_user_profile, set_user_profile, to_profile
+from .analytics import get_pipeline_analytics, MAX_MONTHS
+from .duplicates import find_duplicates, get_duplicate_clusters, parse_allow_duplicate, schedule_duplicate_scan
+from .conversation_memory import ConversationMemory
+from .login_security import (
+    LoginBusy, verify_password, get_client_ip, check_login_rate, record_login_failure, reset_login_failures
+)
+# The chat (OpenAI) and Celery stacks are imported inside the views that use
+# them, so a cold start serves /leads/ without loading either
 import json
+import time
 
 @api_view(['GET'])
 def test_api(request):
@@ -38,16 +52,37 @@ def login_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Rate limit per client IP and per email before doing any expensive work
+        retry_after = check_login_rate(get_client_ip(request), email)
+        if retry_after:
+            response = Response(
+                {'error': 'Too many login attempts. Please try again later.'}, 
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+        
         # Get user from Supabase
         user_data = SupabaseService.get_user_by_email(email)
-        if not user_data:
-            return Response(
-                {'error': 'Invalid credentials'}, 
-                status=status.HTTP_401_UNAUTHORIZED
+        
+        # Check password on the hashing pool; an upgraded hash is saved here, off the pool
+        try:
+            password_valid = verify_password(
+                password,
+                user_data,
+                on_rehash=lambda new_hash: SupabaseService.update_user(user_data['id'], {'password_hash': new_hash})
+            )
+        except LoginBusy:
+            response = Response(
+                {'error': 'Login is busy. Please try again in a moment.'}, 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
+            response['Retry-After'] = '2'
+            return response
         
-        # Check password
-        if check_password(password, user_data['password_hash']):
+        if password_valid:
+            reset_login_failures(email)
+            
             # Store user info in session
             request.session['user_id'] = user_data['id']
             request.session['user_email'] = user_data['email']
@@ -58,17 +93,16 @@ def login_view(request):
             print(f"Session ID: {request.session.session_key}")
             print(f"User ID stored in session: {request.session['user_id']}")
             
+            # The row is loaded anyway - prime the profile cache for current_user
+            profile = to_profile(user_data)
+            set_user_profile(profile)
+            
             return Response({
                 'success': True,
-                'user': {
-                    'id': user_data['id'],
-                    'email': user_data['email'],
-                    'first_name': user_data.get('first_name', ''),
-                    'last_name': user_data.get('last_name', ''),
-                    'is_admin': user_data.get('is_admin', False)
-                }
+                'user': profile
             })
         else:
+            record_login_failure(email)
             return Response(
                 {'error': 'Invalid credentials'}, 
                 status=status.HTTP_401_UNAUTHORIZED
@@ -103,17 +137,9 @@ def current_user(request):
         )
     
     try:
-        user_data = SupabaseService.get_user_by_id(user_id)
-        if user_data:
-            return Response({
-                'user': {
-                    'id': user_data['id'],
-                    'email': user_data['email'],
-                    'first_name': user_data.get('first_name', ''),
-                    'last_name': user_data.get('last_name', ''),
-                    'is_admin': user_data.get('is_admin', False)
-                }
-            })
+        profile = get_user_profile(user_id)
+        if profile:
+            return Response({'user': profile})
         else:
             return Response(
                 {'error': 'User not found'}, 
@@ -147,37 +173,109 @@ def require_authentication(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+def not_modified_response(etag):
+    """Empty 304 response for a conditional GET whose ETag still matches"""
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    return with_etag(response, etag)
+
+def with_etag(response, etag):
+    """Attach the ETag and force clients to revalidate instead of reusing blindly"""
+    if etag:
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def card_cursor(lead):
+    """Cursor continuing a Kanban column after this card ((card_order, id) keyset)"""
+    return encode_cursor(lead.get('card_order'), lead['id'])
+
 @api_view(['GET', 'POST'])
 @require_authentication
+@idempotent
 def leads_list(request):
     """
     List all leads or create a new lead (user-specific)
-    GET: Returns all leads grouped by status for Kanban board
+    GET: Returns all leads grouped by status for Kanban board (legacy)
+    GET ?limit=N: per-status counts, value sums and the first N cards of every column
+    GET ?status=<status>&after=<cursor>[&limit=N]: the next N cards of one column
     POST: Creates a new lead
     """
     user_id = request.session.get('user_id')
     
     if request.method == 'GET':
-        leads = SupabaseService.get_all_leads(user_id=user_id)
+        paginated = any(param in request.query_params for param in ('limit', 'status', 'after'))
+        column_status = request.query_params.get('status')
+        try:
+            limit = parse_page_size(request.query_params.get('limit'))
+            after = request.query_params.get('after')
+            after = decode_cursor(after, 2) if after else None
+        except ValueError:
+            return Response(
+                {'error': 'Invalid limit or after cursor'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if column_status is not None and column_status not in LEAD_STATUSES:
+            return Response(
+                {'error': f"Invalid status. Must be one of: {', '.join(LEAD_STATUSES)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Group leads by status for Kanban board
-        kanban_data = {
-            'Interest': [],
-            'Meeting booked': [],
-            'Proposal sent': [],
-            'Closed win': [],
-            'Closed lost': []
-        }
+        # Answer unchanged boards from the cached data version, before touching Supabase
+        version = data_version.get_data_version(data_version.LEADS, user_id)
+        etag = data_version.build_etag(version, user_id, request.get_full_path()) if version else None
+        if data_version.etag_matches(request, etag):
+            return not_modified_response(etag)
         
-        for lead in leads:
-            status_key = lead.get('status', 'Interest')
-            if status_key in kanban_data:
-                kanban_data[status_key].append(lead)
+        if not paginated:
+            leads = SupabaseService.get_all_leads(user_id=user_id)
+            
+            # Group leads by status for Kanban board
+            kanban_data = {status_key: [] for status_key in LEAD_STATUSES}
+            
+            for lead in leads:
+                status_key = lead.get('status', 'Interest')
+                if status_key in kanban_data:
+                    kanban_data[status_key].append(lead)
+            
+            return with_etag(Response(kanban_data), etag)
+        
+        # One column, continuing after the last loaded card
+        if column_status is not None:
+            page = SupabaseService.get_kanban_column_page(user_id, column_status, limit, after=after)
+            if page is None:
+                return Response(
+                    {'error': 'Failed to fetch leads'}, 
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            cards = page['cards']
+            return with_etag(Response({
+                'status': column_status,
+                'cards': cards,
+                'next_after': card_cursor(cards[-1]) if cards and page['has_more'] else None
+            }), etag)
         
-        return Response(kanban_data)
+        # Whole board: grouping and aggregates are done by the database (get_kanban_board)
+        board = SupabaseService.get_kanban_board(user_id, limit)
+        if board is None:
+            return Response(
+                {'error': 'Failed to fetch leads'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        columns = board['columns']
+        for column in columns:
+            cards = column['cards']
+            column['next_after'] = card_cursor(cards[-1]) if cards and column['count'] > len(cards) else None
+        return with_etag(Response({'columns': columns}), etag)
     
     elif request.method == 'POST':
         lead_data = request.data
+        try:
+            allow_duplicate = parse_allow_duplicate(lead_data.pop('allow_duplicate', False))
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Set default values if not provided
         if 'status' not in lead_data:
@@ -185,6 +283,15 @@ def leads_list(request):
         
         # Set card order to be last in the column
         leads = SupabaseService.get_all_leads(user_id=user_id)
+        
+        # Refuse likely duplicates unless the client confirmed them
+        if not allow_duplicate and getattr(settings, 'DUPLICATE_CHECK_ON_CREATE', True):
+            matches = find_duplicates(lead_data, leads)
+            if matches:
+                return Response(
+                    {'error': 'Possible duplicate lead', 'duplicates': matches}, 
+                    status=status.HTTP_409_CONFLICT
+                )
         same_status_leads = [l for l in leads if l.get('status') == lead_data['status']]
         lead_data['card_order'] = len(same_status_leads) + 1
         
@@ -198,8 +305,173 @@ def leads_list(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+# Bulk import limits and the lead fields an import may set
+MAX_IMPORT_LEADS = 1000
+IMPORT_LEAD_FIELDS = ('name', 'company', 'email', 'phone', 'value', 'notes', 'status', 'source')
+
+@api_view(['POST'])
+@require_authentication
+@idempotent
+def import_leads(request):
+    """
+    Bulk import leads (user-specific)
+    Body: {"leads": [{"name": ..., "value": "1.5k EUR", ...}, ...]}
+    The value column is parsed in one batch (parse_currency_values); rows with an
+    invalid status or value are skipped and reported, the rest go in one insert.
+    """
+    from .chat_service import parse_currency_values
+    
+    user_id = request.session.get('user_id')
+    rows = request.data.get('leads') if isinstance(request.data, dict) else None
+    
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        return Response(
+            {'error': 'leads must be a non-empty list of objects'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(rows) > MAX_IMPORT_LEADS:
+        return Response(
+            {'error': f'At most {MAX_IMPORT_LEADS} leads per import'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    values = parse_currency_values(row.get('value') for row in rows)
+    
+    # New cards go to the end of their column, in file order
+    column_sizes = {}
+    for lead in SupabaseService.get_all_leads(user_id=user_id):
+        column_sizes[lead.get('status')] = column_sizes.get(lead.get('status'), 0) + 1
+    
+    leads_data = []
+    errors = []
+    for index, (row, value) in enumerate(zip(rows, values)):
+        lead_data = {field: row[field] for field in IMPORT_LEAD_FIELDS if field in row}
+        lead_data['status'] = lead_data.get('status') or 'Interest'
+        if lead_data['status'] not in LEAD_STATUSES:
+            errors.append({'index': index, 'error': f"Invalid status '{lead_data['status']}'"})
+            continue
+        raw_value = row.get('value')
+        if value is None and raw_value is not None and str(raw_value).strip():
+            errors.append({'index': index, 'error': f"Invalid value '{raw_value}'"})
+            continue
+        lead_data['value'] = value
+        column_sizes[lead_data['status']] = column_sizes.get(lead_data['status'], 0) + 1
+        lead_data['card_order'] = column_sizes[lead_data['status']]
+        leads_data.append(lead_data)
+    
+    created = SupabaseService.create_leads(leads_data, user_id=user_id)
+    if created is None:
+        return Response(
+            {'error': 'Failed to import leads'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    # Imports are where duplicates pile up: rescan the board in the background
+    if created:
+        schedule_duplicate_scan(user_id)
+    
+    return Response({
+        'created': created,
+        'errors': errors
+    }, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@require_authentication
+def duplicate_leads(request):
+    """
+    Clusters of likely duplicate leads across the user's board
+    Cached per board state; bulk imports warm the cache with the scan_duplicate_leads batch task
+    """
+    user_id = request.session.get('user_id')
+    
+    version = data_version.get_data_version(data_version.LEADS, user_id)
+    etag = data_version.build_etag(version, user_id, request.get_full_path()) if version else None
+    if data_version.etag_matches(request, etag):
+        return not_modified_response(etag)
+    
+    clusters = get_duplicate_clusters(user_id)
+    return with_etag(Response({'clusters': clusters}), etag)
+
+# Largest number of change log entries per delta sync call
+MAX_LEAD_CHANGES = 1000
+
+@api_view(['GET'])
+@require_authentication
+def lead_changes(request):
+    """
+    Delta sync for the Kanban board (user-specific)
+    GET without since: returns only the current cursor - take it *before* loading /leads/
+    GET ?since=<cursor>: leads created/updated since the cursor plus tombstones for deleted ones
+    Cursors are opaque (transaction ID, change ID) pairs, see scripts/lead_change_log.sql
+    """
+    user_id = request.session.get('user_id')
+    
+    since = request.query_params.get('since')
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 500)), MAX_LEAD_CHANGES))
+        if since is not None:
+            since_txid, since_id = decode_cursor(since, 2)
+            since_txid, since_id = int(since_txid), int(since_id)
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'Invalid since cursor or limit'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        bounds = SupabaseService.get_lead_change_bounds()
+        if bounds is None:
+            return Response(
+                {'error': 'Failed to fetch lead changes'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        # No cursor yet, or the log was pruned past it: client must reload the full board
+        pruned = since is not None and bounds['oldest'] is not None and since_txid < bounds['oldest']
+        if since is None or pruned:
+            return Response({
+                'cursor': encode_cursor(str(bounds['horizon']), 0),
+                'upserted': [],
+                'deleted': [],
+                'has_more': False,
+                'reset': since is not None
+            })
+        
+        changes = SupabaseService.get_lead_changes(user_id, since_txid, since_id, limit=limit)
+        if changes is None:
+            return Response(
+                {'error': 'Failed to fetch lead changes'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        # Collapse the log to the last operation per lead
+        last_operation = {}
+        for change in changes:
+            last_operation[change['lead_id']] = change['operation']
+        
+        upsert_ids = [lead_id for lead_id, op in last_operation.items() if op == 'upsert']
+        upserted = SupabaseService.get_leads_by_ids(upsert_ids, user_id=user_id)
+        
+        # Leads logged as upserts but gone by now were deleted after the log read
+        found_ids = {lead['id'] for lead in upserted}
+        deleted = [lead_id for lead_id in last_operation if lead_id not in found_ids]
+        
+        return Response({
+            'cursor': encode_cursor(changes[-1]['txid'], changes[-1]['id']) if changes else since,
+            'upserted': upserted,
+            'deleted': deleted,
+            'has_more': len(changes) == limit,
+            'reset': False
+        })
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to fetch lead changes', 'details': str(e)}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @require_authentication
+@idempotent
 def lead_detail(request, lead_id):
     """
     Retrieve, update or delete a specific lead (user-specific)
@@ -237,45 +509,262 @@ def lead_detail(request, lead_id):
 
 @api_view(['PUT'])
 @require_authentication
+@idempotent
 def update_lead_status(request, lead_id):
     """
     Update lead status (for moving cards between Kanban columns) - user-specific
+    Legacy form of the move endpoint: card_order is the 1-based position in the
+    target column (end of the column when omitted). The move itself runs through
+    SupabaseService.move_lead, so the columns are renumbered atomically.
     """
     user_id = request.session.get('user_id')
     new_status = request.data.get('status')
-    new_order = request.data.get('card_order', 1)
+    new_order = request.data.get('card_order')
     
     if not new_status:
         return Response(
             {'error': 'Status is required'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
+    if new_status not in LEAD_STATUSES:
+        return Response(
+            {'error': f"Invalid status. Must be one of: {', '.join(LEAD_STATUSES)}"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        new_order = int(new_order) if new_order is not None else None
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'card_order must be an integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Update the lead with new status and order
-    lead_data = {
-        'status': new_status,
-        'card_order': new_order
-    }
+    # Translate the position into the neighbours move_lead places the card between
+    before_id = after_id = None
+    if new_order is not None:
+        page = SupabaseService.get_kanban_column_page(user_id, new_status, max(new_order, 1) + 1)
+        others = [card['id'] for card in (page or {}).get('cards', []) if card['id'] != lead_id]
+        if new_order <= 1:
+            before_id = others[0] if others else None
+        elif len(others) >= new_order - 1:
+            after_id = others[new_order - 2]
     
-    updated_lead = SupabaseService.update_lead(lead_id, lead_data, user_id=user_id)
+    result = SupabaseService.move_lead(lead_id, new_status, before_id=before_id, after_id=after_id, user_id=user_id)
     
-    if updated_lead:
-        return Response(updated_lead)
+    if result:
+        return Response(result['lead'])
     return Response(
         {'error': 'Failed to update lead status'}, 
         status=status.HTTP_400_BAD_REQUEST
     )
 
+@api_view(['PUT'])
+@require_authentication
+@idempotent
+def move_lead(request, lead_id):
+    """
+    Move a card on the Kanban board (drag & drop) - user-specific
+    Body: {"status": "...", "after_id": card above the drop point, "before_id": card below it}
+    Without after_id/before_id the card goes to the end of the column. The card and
+    every neighbour whose card_order changed are returned, all updated atomically.
+    """
+    user_id = request.session.get('user_id')
+    new_status = request.data.get('status')
+    before_id = request.data.get('before_id') or None
+    after_id = request.data.get('after_id') or None
+    
+    if new_status not in LEAD_STATUSES:
+        return Response(
+            {'error': f"Invalid status. Must be one of: {', '.join(LEAD_STATUSES)}"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if lead_id in (before_id, after_id):
+        return Response(
+            {'error': 'A lead cannot be placed next to itself'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    result = SupabaseService.move_lead(lead_id, new_status, before_id=before_id, after_id=after_id, user_id=user_id)
+    
+    if result:
+        return Response(result)
+    return Response(
+        {'error': 'Lead not found or move failed'}, 
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+# Analytics endpoints
+@api_view(['GET'])
+@require_authentication
+def pipeline_analytics(request):
+    """
+    Pipeline totals, conversion rates between statuses and value by source over time (user-specific)
+    GET ?months=N: months covered by the source breakdown (default 12)
+    """
+    user_id = request.session.get('user_id')
+    
+    try:
+        months = int(request.query_params.get('months', 12))
+        if not 1 <= months <= MAX_MONTHS:
+            raise ValueError()
+    except ValueError:
+        return Response(
+            {'error': f'months must be an integer between 1 and {MAX_MONTHS}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Same version token as the board: unchanged leads are answered with 304
+    version = data_version.get_data_version(data_version.LEADS, user_id)
+    etag = data_version.build_etag(version, user_id, request.get_full_path()) if version else None
+    if data_version.etag_matches(request, etag):
+        return not_modified_response(etag)
+    
+    analytics = get_pipeline_analytics(user_id, months=months)
+    if analytics is None:
+        return Response(
+            {'error': 'Failed to compute pipeline analytics'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return with_etag(Response(analytics), etag)
+
+# Search endpoints
+SEARCH_SCOPES = ('all', 'leads', 'messages')
+
+@api_view(['GET'])
+@require_authentication
+def search(request):
+    """
+    Ranked full-text search over the user's lead notes and conversation messages
+    GET ?q=<query>[&scope=all|leads|messages][&limit=N][&cursor=<cursor>]
+    q supports web search syntax: words, "quoted phrases", OR and -excluded words
+    """
+    user_id = request.session.get('user_id')
+    query = (request.query_params.get('q') or '').strip()
+    scope = request.query_params.get('scope', 'all')
+    
+    if not query:
+        return Response(
+            {'error': 'q is required'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if scope not in SEARCH_SCOPES:
+        return Response(
+            {'error': f"Invalid scope. Must be one of: {', '.join(SEARCH_SCOPES)}"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = parse_page_size(request.query_params.get('limit'), default=20)
+        cursor = request.query_params.get('cursor')
+        offset = decode_cursor(cursor, 1)[0] if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError()
+    except ValueError:
+        return Response(
+            {'error': 'Invalid limit or cursor'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    page = SupabaseService.search_crm(user_id, query, scope=scope, limit=limit, offset=offset)
+    if page is None:
+        return Response(
+            {'error': 'Search failed'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return Response({
+        'results': page['results'],
+        'has_more': page['has_more'],
+        'next_cursor': encode_cursor(offset + limit) if page['has_more'] else None
+    })
+
+# Realtime endpoints
+async def lead_events(request):
+    """
+    Server-Sent Events stream of the current user's lead changes (ASGI only)
+    Emits lead.created / lead.updated / lead.deleted; clients resync on each event
+    """
+    # Under WSGI every open stream would pin one of the few gunicorn threads
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Realtime events require the ASGI server'}, 
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    
+    user_id = await sync_to_async(request.session.get)('user_id')
+    if not user_id:
+        return JsonResponse(
+            {'error': 'Authentication required'}, 
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    response = StreamingHttpResponse(_lead_event_stream(user_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+    return response
+
+async def _lead_event_stream(user_id):
+    """Yield SSE frames until the stream reaches its maximum age"""
+    # Streams are recycled so sessions get re-checked and dead connections freed;
+    # EventSource reconnects on its own after the retry delay
+    deadline = time.monotonic() + settings.REALTIME_STREAM_MAX_AGE
+    events = realtime.subscribe_lead_events(user_id, heartbeat=settings.REALTIME_HEARTBEAT_SECONDS)
+    
+    yield 'retry: 3000\n\n'
+    try:
+        async for event in events:
+            if event is None:
+                yield realtime.format_sse(comment='ping')
+            else:
+                yield realtime.format_sse(event)
+            if time.monotonic() > deadline:
+                break
+    finally:
+        await events.aclose()
+
 # Conversation endpoints
 @api_view(['GET'])
 @require_authentication
 def conversations_list(request):
-    """Get all conversations for the current user"""
+    """
+    Get conversations for the current user
+    Without query params: all conversations (legacy)
+    ?limit=N[&before=<cursor>]: one page with message_count / last_message_preview summaries
+    """
     user_id = request.session.get('user_id')
     
+    paginated = 'limit' in request.query_params or 'before' in request.query_params
+    try:
+        limit = parse_page_size(request.query_params.get('limit'))
+        before = request.query_params.get('before')
+        before = decode_cursor(before, 2) if before else None
+    except ValueError:
+        return Response(
+            {'error': 'Invalid limit or before cursor'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     try:
-        conversations = SupabaseService.get_user_conversations(user_id)
-        return Response(conversations)
+        version = data_version.get_data_version(data_version.CONVERSATIONS, user_id)
+        etag = data_version.build_etag(version, user_id, request.get_full_path()) if version else None
+        if data_version.etag_matches(request, etag):
+            return not_modified_response(etag)
+        
+        if not paginated:
+            conversations = SupabaseService.get_user_conversations(user_id)
+            return with_etag(Response(conversations), etag)
+        
+        page = SupabaseService.get_user_conversations_page(user_id, limit, before=before)
+        if page is None:
+            return Response(
+                {'error': 'Failed to fetch conversations'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        last = page['conversations'][-1] if page['conversations'] else None
+        return with_etag(Response({
+            'conversations': page['conversations'],
+            'has_more': page['has_more'],
+            'next_before': encode_cursor(last['updated_at'], last['id']) if last and page['has_more'] else None
+        }), etag)
     except Exception as e:
         return Response(
             {'error': 'Failed to fetch conversations', 'details': str(e)}, 
@@ -349,6 +838,7 @@ def conversation_detail(request, conversation_id):
         try:
             success = SupabaseService.delete_conversation(conversation_id, user_id)
             if success:
+                ConversationMemory.clear(conversation_id=conversation_id)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             else:
                 return Response(
@@ -364,10 +854,33 @@ def conversation_detail(request, conversation_id):
 @api_view(['GET'])
 @require_authentication
 def conversation_messages(request, conversation_id):
-    """Get all messages for a specific conversation"""
+    """
+    Get messages for a specific conversation
+    Without query params: all messages, oldest first (legacy)
+    ?limit=N[&before=<cursor>][&include_function_results=false]: newest window of N messages
+    """
     user_id = request.session.get('user_id')
     
+    paginated = 'limit' in request.query_params or 'before' in request.query_params
+    try:
+        limit = parse_page_size(request.query_params.get('limit'))
+        before = request.query_params.get('before')
+        before = decode_cursor(before, 2) if before else None
+    except ValueError:
+        return Response(
+            {'error': 'Invalid limit or before cursor'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    include_function_results = request.query_params.get('include_function_results', 'true').lower() != 'false'
+    
     try:
+        # ETags only reach a client after the ownership check below, so a matching
+        # If-None-Match can be answered without any Supabase call
+        version = data_version.get_data_version(data_version.MESSAGES, conversation_id, create=False)
+        etag = data_version.build_etag(version, user_id, request.get_full_path()) if version else None
+        if data_version.etag_matches(request, etag):
+            return not_modified_response(etag)
+        
         # First verify user owns this conversation
         conversation = SupabaseService.get_conversation_by_id(conversation_id, user_id)
         if not conversation:
@@ -376,8 +889,28 @@ def conversation_messages(request, conversation_id):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        messages = SupabaseService.get_conversation_messages(conversation_id)
-        return Response(messages)
+        version = data_version.get_data_version(data_version.MESSAGES, conversation_id)
+        etag = data_version.build_etag(version, user_id, request.get_full_path()) if version else None
+        
+        if not paginated:
+            messages = SupabaseService.get_conversation_messages(conversation_id)
+            return with_etag(Response(messages), etag)
+        
+        page = SupabaseService.get_conversation_messages_page(
+            conversation_id, limit, before=before, include_function_results=include_function_results
+        )
+        if page is None:
+            return Response(
+                {'error': 'Failed to fetch messages'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        oldest = page['messages'][0] if page['messages'] else None
+        return with_etag(Response({
+            'messages': page['messages'],
+            'has_more': page['has_more'],
+            'next_before': encode_cursor(oldest['timestamp'], oldest['id']) if oldest and page['has_more'] else None
+        }), etag)
     except Exception as e:
         return Response(
             {'error': 'Failed to fetch messages', 'details': str(e)}, 
@@ -386,6 +919,7 @@ def conversation_messages(request, conversation_id):
 
 @api_view(['POST'])
 @require_authentication
+@idempotent
 def chat_message(request):
     """
     Initiate async chat message processing, returns task_id
@@ -427,12 +961,8 @@ def chat_message(request):
                 SupabaseService.update_conversation(conversation_id, {'title': new_title}, user_id)
         
         # Save user message to database
-        SupabaseService.create_message(conversation_id, message, is_user=True)
-        
-        # Force threading fallback since Celery workers keep getting killed
-        print(f"🔄 Skipping Celery (workers killed by Railway) - using threading...")
+        SupabaseService.create_message(conversation_id, message, is_user=True, user_id=user_id)
         
-        # Threading approach when Celery workers are killed by memory limits
         import threading
         import uuid
         from django.core.cache import cache
@@ -440,8 +970,31 @@ def chat_message(request):
         # Generate a task ID for polling
         task_id = str(uuid.uuid4())
         
+        # Offload to the chat queue when a Celery worker is deployed (see celery_app.py)
+        if getattr(settings, 'CHAT_USE_CELERY', False):
+            try:
+                from .tasks import process_chat_message
+                mark_task_polled(task_id)
+                process_chat_message.apply_async(
+                    args=[message, request.session.session_key or f'celery_{task_id}'],
+                    kwargs={'conversation_id': conversation_id, 'user_id': user_id},
+                    task_id=task_id
+                )
+                return Response({
+                    'task_id': task_id,
+                    'conversation_id': conversation_id,
+                    'status': 'processing',
+                    'message': 'Message received, processing in background...'
+                })
+            except Exception as e:
+                print(f"⚠️ Could not queue chat task ({e}) - using threading...")
+        
+        # Threading fallback when no Celery worker is available
+        
         # Set initial status
         cache.set(f"task_{task_id}", {'state': 'PROCESSING', 'status': 'Processing your message...'}, 300)
+        # Count task creation as the first poll; the turn is cancelled once polling stops
+        mark_task_polled(task_id)
         
         def process_in_thread():
             try:
@@ -460,7 +1013,8 @@ def chat_message(request):
                     session_key, 
                     leads, 
                     conversation_id=conversation_id, 
-                    user_id=user_id
+                    user_id=user_id,
+                    should_cancel=task_abandoned_check(task_id)
                 )
                 
                 # Store result in cache
@@ -502,6 +1056,9 @@ def chat_status(request, task_id):
     try:
         print(f"🔍 Checking task status for: {task_id}")
         
+        # Keep the turn alive while the client is still waiting for it
+        mark_task_polled(task_id)
+        
         # First try cache (for threading fallback)
         from django.core.cache import cache
         cached_result = cache.get(f"task_{task_id}")
@@ -511,7 +1068,8 @@ def chat_status(request, task_id):
             return Response(cached_result)
         
         # Fall back to Celery
-        task_result = AsyncResult(task_id)
+        from backend.celery_app import app as celery_app
+        task_result = celery_app.AsyncResult(task_id)
         print(f"📊 Task state: {task_result.state}")
         print(f"📋 Task info: {task_result.info}")
         
@@ -557,6 +1115,7 @@ def chat_status(request, task_id):
 def clear_chat(request):
     """
     Clear conversation context from session (legacy support)
+    Optional body: {"conversation_id": "..."} also clears that conversation's memory
     """
     try:
         # Get or create session
@@ -564,9 +1123,19 @@ def clear_chat(request):
             request.session.create()
         session_key = request.session.session_key
         
+        conversation_id = request.data.get('conversation_id')
+        if conversation_id and not SupabaseService.get_conversation_by_id(
+            conversation_id, request.session.get('user_id')
+        ):
+            return Response(
+                {'error': 'Conversation not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
         # Clear conversation context
+        from .chat_service import ChatService
         chat_service = ChatService()
-        chat_service.clear_conversation_context(session_key)
+        chat_service.clear_conversation_context(session_key, conversation_id)
         
         return Response({
             'status': 'success',
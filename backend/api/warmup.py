@@ -0,0 +1,92 @@
+"""
+Optional warm-up after boot.
+
+With WARMUP_ON_BOOT enabled, a background thread creates the Supabase and
+OpenAI clients, imports the chat stack and builds (and token-counts) the
+OpenAI function schemas right after the process starts, so the first real
+requests do not pay for it. Requests are served meanwhile; GET /ready/
+answers 503 until it has finished.
+
+Under gunicorn (gunicorn.conf.py) the app may be preloaded in the master
+process, where clients must not be created - forked workers would share
+their connections. The config sets WARMUP_AFTER_FORK, so the call in
+wsgi.py/asgi.py is skipped and each worker starts its own warm-up from the
+post_worker_init hook.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+STATE_IDLE = 'idle'
+STATE_WARMING = 'warming'
+STATE_READY = 'ready'
+
+_state = {'status': STATE_IDLE, 'started_at': None, 'seconds': None, 'errors': []}
+_lock = threading.Lock()
+
+
+def _step(name, fn):
+    try:
+        fn()
+    except Exception as e:
+        print(f"⚠️ Warm-up step '{name}' failed: {e}")
+        _state['errors'].append(f"{name}: {e}")
+
+
+def _create_supabase_client():
+    from .supabase_client import get_supabase_client
+    get_supabase_client()
+
+
+def _create_openai_client():
+    from .openai_client import get_openai_client
+    get_openai_client()
+
+
+def _build_function_schemas():
+    from .chat_service import ChatService
+    ChatService().get_openai_functions_tokens()
+
+
+def warm_up():
+    """Run every warm-up step in the calling thread"""
+    started = time.monotonic()
+    _step('supabase client', _create_supabase_client)
+    _step('openai client', _create_openai_client)
+    _step('function schemas', _build_function_schemas)
+    _state['seconds'] = round(time.monotonic() - started, 3)
+    _state['status'] = STATE_READY
+    print(f"🔥 Warm-up finished in {_state['seconds']}s")
+
+
+def start_warmup(after_fork=False):
+    """
+    Start the warm-up in a daemon thread once per process (no-op when
+    WARMUP_ON_BOOT is off). With WARMUP_AFTER_FORK set only the server's
+    worker hook (after_fork=True) starts it.
+    """
+    if not getattr(settings, 'WARMUP_ON_BOOT', False):
+        return
+    if os.environ.get('WARMUP_AFTER_FORK') and not after_fork:
+        return
+    with _lock:
+        if _state['status'] != STATE_IDLE:
+            return
+        _state['status'] = STATE_WARMING
+        _state['started_at'] = time.time()
+    thread = threading.Thread(target=warm_up, name='warmup', daemon=True)
+    thread.start()
+
+
+def get_warmup_state():
+    """Current warm-up status: idle (disabled or not started), warming or ready"""
+    return dict(_state, errors=list(_state['errors']))
+
+
+def is_ready():
+    """Whether this process may receive traffic: warm-up finished, or disabled"""
+    if not getattr(settings, 'WARMUP_ON_BOOT', False):
+        return True
+    return _state['status'] == STATE_READY
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Optional background warm-up of clients and chat schemas (WARMUP_ON_BOOT)
+from backend.api.warmup import start_warmup  # noqa: E402
+
+start_warmup()
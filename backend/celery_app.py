@@ -1,6 +1,6 @@
 import os
 from celery import Celery
-from django.conf import settings
+from kombu import Exchange, Queue
 
 # Set the default Django settings module for the 'celery' program
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
@@ -11,9 +11,25 @@ app = Celery('backend')
 # the configuration object to child processes.
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# Chat turns get their own queue; every other task goes to the default
+# 'celery' queue, so a worker must consume both (see Procfile):
+#   celery -A backend.celery_app worker -Q celery,chat
+# Task modules import the OpenAI and Supabase stacks lazily inside the task,
+# so a worker child only pays for them once it actually processes a message.
+CHAT_QUEUE = os.environ.get('CELERY_CHAT_QUEUE', 'chat')
+
+app.conf.task_default_queue = 'celery'
+app.conf.task_queues = (
+    Queue('celery', Exchange('celery'), routing_key='celery'),
+    Queue(CHAT_QUEUE, Exchange(CHAT_QUEUE), routing_key=CHAT_QUEUE),
+)
+app.conf.task_routes = {
+    'backend.api.tasks.process_chat_message': {'queue': CHAT_QUEUE, 'routing_key': CHAT_QUEUE},
+}
+
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
 @app.task(bind=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}') 
\ No newline at end of file
+    print(f'Request: {self.request!r}') 
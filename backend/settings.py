@@ -11,8 +11,10 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
-from decouple import config
+from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,17 +47,63 @@ INSTALLED_APPS = [
     'backend.api',
 ]
 
-MIDDLEWARE = [
-    'backend.api.middleware.SimpleCorsMiddleware',
-    'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+# API fast path: the JSON API only needs CORS, security headers, sessions and
+# CSRF; the admin-oriented middleware runs for /admin/ requests only (see
+# AdminOnlyMiddleware). Preflights and /health/ are answered by
+# SimpleCorsMiddleware before the session is touched. WhiteNoise stays global -
+# for non-static paths it is a single dict lookup.
+# Measure with: python scripts/benchmark_api.py middleware
+API_FAST_PATH = config('API_FAST_PATH', default=True, cast=bool)
+
+ADMIN_ONLY_MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+ADMIN_ONLY_PATH_PREFIXES = ['/admin/']
+
+if API_FAST_PATH:
+    MIDDLEWARE = [
+        'backend.api.middleware.SimpleCorsMiddleware',
+        'backend.api.middleware.CompressionMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'whitenoise.middleware.WhiteNoiseMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'backend.api.middleware.AdminOnlyMiddleware',
+    ]
+    # The admin's middleware checks only look at MIDDLEWARE; it is wrapped above
+    SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409']
+else:
+    MIDDLEWARE = [
+        'backend.api.middleware.SimpleCorsMiddleware',
+        'backend.api.middleware.CompressionMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'whitenoise.middleware.WhiteNoiseMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+
+# Create the Supabase/OpenAI clients and build the chat function schemas in a
+# background thread right after boot (see api/warmup.py)
+WARMUP_ON_BOOT = config('WARMUP_ON_BOOT', default=False, cast=bool)
+
+# Liveness endpoints answered by SimpleCorsMiddleware without touching the session
+HEALTH_CHECK_PATHS = ['/health/']
+
+# Readiness endpoints (same middleware): 503 until the warm-up has finished
+READINESS_CHECK_PATHS = ['/ready/']
+
+# Response compression (CompressionMiddleware): brotli when the brotli package
+# is installed and accepted by the client, gzip otherwise
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)  # Bytes
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
 
 ROOT_URLCONF = 'backend.urls'
 
@@ -107,6 +155,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The first hasher is used for new hashes; hashes made with any other listed
+# hasher (or another PBKDF2 iteration count) are upgraded on the next login.
+# Lower PASSWORD_PBKDF2_ITERATIONS or put ScryptPasswordHasher first to tune
+# the CPU cost of a login.
+PASSWORD_HASHERS = config('PASSWORD_HASHERS', cast=Csv(), default=','.join([
+    'backend.api.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]))
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=600000, cast=int)
+
+# Login throttling (see api/login_security.py)
+LOGIN_HASH_WORKERS = config('LOGIN_HASH_WORKERS', default=1, cast=int)  # Concurrent password checks
+LOGIN_HASH_QUEUE = config('LOGIN_HASH_QUEUE', default=4, cast=int)  # Waiting checks before 503
+LOGIN_HASH_TIMEOUT = config('LOGIN_HASH_TIMEOUT', default=10, cast=float)
+LOGIN_RATE_WINDOW_SECONDS = config('LOGIN_RATE_WINDOW_SECONDS', default=300, cast=int)
+LOGIN_RATE_LIMIT_PER_IP = config('LOGIN_RATE_LIMIT_PER_IP', default=20, cast=int)  # Attempts per window
+LOGIN_RATE_LIMIT_PER_EMAIL = config('LOGIN_RATE_LIMIT_PER_EMAIL', default=5, cast=int)  # Failures per window
+LOGIN_TRUSTED_PROXY_HOPS = config('LOGIN_TRUSTED_PROXY_HOPS', default=1, cast=int)  # Railway's proxy; 0 ignores X-Forwarded-For
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -139,40 +208,19 @@ SUPABASE_URL = config('SUPABASE_URL')
 SUPABASE_KEY = config('SUPABASE_KEY')
 
 # CORS settings for React frontend - Updated for production
-# All CORS logic is now handled by SimpleCorsMiddleware in backend/api/middleware.py
-# Keeping these commented out for reference, but they are no longer used.
-#
-# CORS_ALLOWED_ORIGINS = [
-#     "http://localhost:3000",  # React development server
-#     "http://127.0.0.1:3000",
-#     "https://lightweight-crm-indol.vercel.app",  # Main Vercel domain
-# ]
-#
-# # Allow any Vercel preview deployment (matches whatever hash they generate)
-# CORS_ALLOWED_ORIGIN_REGEXES = [
-#     r"^https://.+\.vercel\.app$",  # Loosen regex to ensure all vercel subdomains are matched
-# ]
-# 
-# # Fallback for proxies that might strip the Origin header
-# CORS_REPLACE_HTTPS_REFERER = True
-# 
-# # Explicitly allow headers your frontend might be sending
-# CORS_ALLOW_HEADERS = [
-#     "accept",
-#     "authorization",
-#     "content-type",
-#     "origin",
-#     "x-csrftoken",
-#     "x-requested-with",
-# ]
-# 
-# # Allow all origins during local development only.
-# # IMPORTANT: When using credentials (cookies) the wildcard "*" cannot be used.
-# # Therefore keep this disabled in production so that the middleware reflects the
-# # requesting Origin when it matches the allowed list/regex above.
-# CORS_ALLOW_ALL_ORIGINS = False
-# 
-# CORS_ALLOW_CREDENTIALS = True
+# Enforced by SimpleCorsMiddleware in backend/api/middleware.py, which compiles
+# these once at startup (same setting names as django-cors-headers).
+CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', cast=Csv(), default=','.join([
+    "http://localhost:3000",  # React development server
+    "http://127.0.0.1:3000",
+    "https://lightweight-crm-indol.vercel.app",  # Main Vercel domain
+]))
+
+# Vercel preview deployments and any local dev port
+CORS_ALLOWED_ORIGIN_REGEXES = [
+    r"^https://[a-z0-9-]+(\.[a-z0-9-]+)*\.vercel\.app$",
+    r"^https?://(localhost|127\.0\.0\.1)(:\d+)?$",
+]
 
 # CSRF settings for cross-origin requests  
 CSRF_TRUSTED_ORIGINS = [
@@ -185,18 +233,68 @@ CSRF_COOKIE_SAMESITE = 'None'
 CSRF_COOKIE_HTTPONLY = False  # Frontend needs to read CSRF token
 
 # Django REST Framework settings
+# orjson renderer/parser when orjson is installed (see api/renderers.py),
+# the stock JSON ones otherwise. Compare with: python scripts/benchmark_api.py json
+API_FAST_JSON = config('API_FAST_JSON', default=True, cast=bool) and importlib.util.find_spec('orjson') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'backend.api.renderers.ORJSONRenderer' if API_FAST_JSON else 'rest_framework.renderers.JSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'backend.api.renderers.ORJSONParser' if API_FAST_JSON else 'rest_framework.parsers.JSONParser',
     ],
 }
 
 # OpenAI Configuration
 OPENAI_API_KEY = config('OPENAI_API_KEY')
 
+# Shared OpenAI HTTP connection pool (one per process, see api/openai_client.py)
+OPENAI_MAX_CONNECTIONS = config('OPENAI_MAX_CONNECTIONS', default=10, cast=int)
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = config('OPENAI_MAX_KEEPALIVE_CONNECTIONS', default=5, cast=int)
+OPENAI_KEEPALIVE_EXPIRY = config('OPENAI_KEEPALIVE_EXPIRY', default=120, cast=float)
+OPENAI_TIMEOUT = config('OPENAI_TIMEOUT', default=60, cast=float)
+OPENAI_CONNECT_TIMEOUT = config('OPENAI_CONNECT_TIMEOUT', default=5, cast=float)
+OPENAI_HTTP2 = config('OPENAI_HTTP2', default=False, cast=bool)
+
+# Chat model tiering (see api/model_router.py)
+# Simple turns and result rendering use the fast model; ambiguous multi-step
+# requests use the large model while within the cost and latency budgets.
+# Prompts that don't fit the fast model's context window always use the large one.
+CHAT_MODEL_TIERING = config('CHAT_MODEL_TIERING', default=True, cast=bool)
+CHAT_MODEL_FAST = config('CHAT_MODEL_FAST', default='gpt-3.5-turbo-1106')
+CHAT_MODEL_LARGE = config('CHAT_MODEL_LARGE', default='gpt-4-1106-preview')
+CHAT_MODEL_FAST_INPUT_COST = config('CHAT_MODEL_FAST_INPUT_COST', default=0.001, cast=float)  # USD per 1K tokens
+CHAT_MODEL_FAST_OUTPUT_COST = config('CHAT_MODEL_FAST_OUTPUT_COST', default=0.002, cast=float)
+CHAT_MODEL_LARGE_INPUT_COST = config('CHAT_MODEL_LARGE_INPUT_COST', default=0.01, cast=float)
+CHAT_MODEL_LARGE_OUTPUT_COST = config('CHAT_MODEL_LARGE_OUTPUT_COST', default=0.03, cast=float)
+CHAT_MODEL_FAST_CONTEXT_TOKENS = config('CHAT_MODEL_FAST_CONTEXT_TOKENS', default=16385, cast=int)
+CHAT_MODEL_LARGE_CONTEXT_TOKENS = config('CHAT_MODEL_LARGE_CONTEXT_TOKENS', default=128000, cast=int)
+CHAT_TURN_COST_BUDGET = config('CHAT_TURN_COST_BUDGET', default=0.10, cast=float)  # USD per routed call
+CHAT_LATENCY_BUDGET_SECONDS = config('CHAT_LATENCY_BUDGET_SECONDS', default=20, cast=float)  # Large tier p95
+
+# Chat memory: recent turns within the token budget are sent verbatim,
+# older ones are folded into a rolling summary in the background
+CHAT_MEMORY_TOKEN_BUDGET = config('CHAT_MEMORY_TOKEN_BUDGET', default=2000, cast=int)
+CHAT_MEMORY_REHYDRATE_MESSAGES = config('CHAT_MEMORY_REHYDRATE_MESSAGES', default=20, cast=int)
+CHAT_MEMORY_SUMMARY_MODEL = config('CHAT_MEMORY_SUMMARY_MODEL', default=CHAT_MODEL_FAST)
+# Leads listed in the chat system prompt (id, name, company, status, value only)
+CHAT_LEAD_INDEX_MAX_LEADS = config('CHAT_LEAD_INDEX_MAX_LEADS', default=200, cast=int)
+
+# Chat call policy (see api/call_policy.py): every model call of a turn shares
+# one deadline; 429/5xx and timeouts are retried with backoff, slow calls can
+# be hedged after the tier's p95, and a turn is cancelled once the client
+# stops polling for it
+CHAT_TURN_DEADLINE_SECONDS = config('CHAT_TURN_DEADLINE_SECONDS', default=60, cast=float)
+CHAT_CALL_TIMEOUT_SECONDS = config('CHAT_CALL_TIMEOUT_SECONDS', default=30, cast=float)  # Per attempt
+CHAT_MAX_RETRIES = config('CHAT_MAX_RETRIES', default=2, cast=int)
+CHAT_RETRY_BACKOFF_SECONDS = config('CHAT_RETRY_BACKOFF_SECONDS', default=0.5, cast=float)
+CHAT_HEDGING = config('CHAT_HEDGING', default=False, cast=bool)
+CHAT_HEDGE_AFTER_SECONDS = config('CHAT_HEDGE_AFTER_SECONDS', default=10, cast=float)  # Until a p95 is known
+CHAT_HEDGE_MIN_SECONDS = config('CHAT_HEDGE_MIN_SECONDS', default=2, cast=float)
+CHAT_ABANDON_AFTER_SECONDS = config('CHAT_ABANDON_AFTER_SECONDS', default=30, cast=float)
+CHAT_CALL_POOL_SIZE = config('CHAT_CALL_POOL_SIZE', default=8, cast=int)
+
 # Celery Configuration - Updated for Railway Redis
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
@@ -205,8 +303,90 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
-CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
-CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes
+# Chat turns are bounded by CHAT_TURN_DEADLINE_SECONDS, so the limits only catch runaways
+CELERY_TASK_TIME_LIMIT = config('CELERY_TASK_TIME_LIMIT', default=180, cast=int)
+CELERY_TASK_SOFT_TIME_LIMIT = config('CELERY_TASK_SOFT_TIME_LIMIT', default=150, cast=int)
+CELERY_RESULT_EXPIRES = 3600
+
+# Memory-limited workers (see backend/celery_app.py for the chat queue)
+# Take one task at a time, ack it only after it ran (a worker killed mid-task
+# gets it redelivered) and recycle children before they grow past the limit
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_WORKER_CONCURRENCY = config('CELERY_WORKER_CONCURRENCY', default=2, cast=int)
+CELERY_WORKER_MAX_TASKS_PER_CHILD = config('CELERY_WORKER_MAX_TASKS_PER_CHILD', default=50, cast=int)
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = config('CELERY_WORKER_MAX_MEMORY_PER_CHILD', default=200000, cast=int)  # KiB
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': CELERY_TASK_TIME_LIMIT * 2}
+
+# Process chat turns on the Celery chat queue (CELERY_CHAT_QUEUE, default 'chat')
+# instead of a thread in the web process.
+# Needs a worker consuming CELERY_CHAT_QUEUE (see Procfile) and CACHE_REDIS_URL
+# shared with it so task status, cancellation and the redelivery phase markers
+# are visible to both and survive a worker restart (checked below).
+CHAT_USE_CELERY = config('CHAT_USE_CELERY', default=False, cast=bool)
+
+# Cache Configuration
+# Holds chat task results and the per-user data versions behind ETags.
+# Point CACHE_REDIS_URL at the shared Redis when running more than one
+# process so every worker sees the same versions; otherwise stay in-process.
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+if CHAT_USE_CELERY and not CACHE_REDIS_URL:
+    raise ImproperlyConfigured(
+        'CHAT_USE_CELERY needs CACHE_REDIS_URL: task results and phase markers '
+        'must be shared by the web and worker processes and outlive restarts'
+    )
+
+# Data version tokens (ETags/304s, cached analytics and duplicate scans, see
+# api/data_version.py) are only trustworthy when every process that mutates
+# data bumps the same token - i.e. with the shared Redis cache. A deployment
+# that really is a single process may opt in without it.
+DATA_VERSIONS_ENABLED = config('DATA_VERSIONS_ENABLED', default=bool(CACHE_REDIS_URL), cast=bool)
+
+# Cached user profiles for current_user and permission checks (see api/user_profiles.py)
+USER_PROFILE_CACHE_TTL = config('USER_PROFILE_CACHE_TTL', default=300, cast=int)
+
+# Cached pipeline analytics (see api/analytics.py); lead mutations invalidate them
+ANALYTICS_CACHE_TTL = config('ANALYTICS_CACHE_TTL', default=600, cast=int)
+
+# Semantic lead search for the chat assistant (see api/semantic_search.py)
+# Per-user in-memory vector indexes in a NumPy matrix (sparse dicts if numpy is missing)
+SEMANTIC_SEARCH_ENABLED = config('SEMANTIC_SEARCH_ENABLED', default=True, cast=bool)
+SEMANTIC_EMBEDDER = config('SEMANTIC_EMBEDDER', default='backend.api.semantic_search.HashingEmbedder')
+SEMANTIC_EMBEDDING_DIM = config('SEMANTIC_EMBEDDING_DIM', default=2048, cast=int)  # HashingEmbedder buckets
+SEMANTIC_INDEX_MAX_USERS = config('SEMANTIC_INDEX_MAX_USERS', default=50, cast=int)  # Indexes kept per process
+
+# Duplicate leads (see api/duplicates.py): new leads from the API and the chat
+# are refused while they look like an existing one, unless allow_duplicate is set
+DUPLICATE_CHECK_ON_CREATE = config('DUPLICATE_CHECK_ON_CREATE', default=True, cast=bool)
+DUPLICATE_SCAN_CACHE_TTL = config('DUPLICATE_SCAN_CACHE_TTL', default=3600, cast=int)  # GET /leads/duplicates/
+# Run the post-import duplicate scan on the Celery worker instead of a web thread
+DUPLICATE_SCAN_USE_CELERY = config('DUPLICATE_SCAN_USE_CELERY', default=CHAT_USE_CELERY, cast=bool)
+
+# Idempotency-Key store for chat messages and lead mutations (see api/idempotency.py)
+# Lives in the cache above, so set CACHE_REDIS_URL to dedupe across processes
+IDEMPOTENCY_TTL_SECONDS = config('IDEMPOTENCY_TTL_SECONDS', default=86400, cast=int)
+
+# Realtime lead events (GET /events/leads/)
+# Redis pub/sub lets events from any process (web or Celery) reach every stream;
+# without it events are delivered within the serving process only.
+REALTIME_REDIS_URL = config('REALTIME_REDIS_URL', default=CACHE_REDIS_URL)
+REALTIME_HEARTBEAT_SECONDS = config('REALTIME_HEARTBEAT_SECONDS', default=15, cast=int)
+REALTIME_STREAM_MAX_AGE = config('REALTIME_STREAM_MAX_AGE', default=300, cast=int)
 
 # Session Configuration for Chat Context
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
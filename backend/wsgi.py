@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Optional background warm-up of clients and chat schemas (WARMUP_ON_BOOT)
+from backend.api.warmup import start_warmup  # noqa: E402
+
+start_warmup()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 import KanbanBoard from './components/KanbanBoard';
 import LeadForm from './components/LeadForm';
@@ -6,10 +6,51 @@ import Header from './components/Header';
 import ChatWidget from './components/ChatWidget';
 import Login from './components/Login';
 import { AuthProvider, useAuth } from './components/AuthContext';
+import { idempotentFetch } from './idempotentFetch';
 
 // Base API URL for the Django backend
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
+// Cards loaded per Kanban column (more are fetched on demand)
+const BOARD_PAGE_SIZE = 50;
+
+// Delta sync polling when realtime events are unavailable (e.g. a WSGI server)
+const SYNC_POLL_INTERVAL_MS = 15000;
+const REALTIME_MAX_FAILURES = 3;
+
+// Split a GET /leads/?limit=N response into cards per status and column stats
+const splitBoard = (columns) => {
+  const board = {};
+  const stats = {};
+  columns.forEach(column => {
+    board[column.status] = column.cards;
+    stats[column.status] = {
+      count: column.count,
+      totalValue: column.total_value,
+      nextAfter: column.next_after
+    };
+  });
+  return { board, stats };
+};
+
+// Merge a delta sync response into the grouped board state
+const applyLeadChanges = (board, upserted, deleted) => {
+  const removedIds = new Set([...deleted, ...upserted.map(lead => lead.id)]);
+  const nextBoard = {};
+  Object.keys(board).forEach(status => {
+    nextBoard[status] = board[status].filter(lead => !removedIds.has(lead.id));
+  });
+  upserted.forEach(lead => {
+    if (nextBoard[lead.status]) {
+      nextBoard[lead.status].push(lead);
+    }
+  });
+  Object.keys(nextBoard).forEach(status => {
+    nextBoard[status].sort((a, b) => (a.card_order || 0) - (b.card_order || 0));
+  });
+  return nextBoard;
+};
+
 // Main app component with authentication
 const MainApp = () => {
   const [leads, setLeads] = useState({
@@ -19,10 +60,14 @@ const MainApp = () => {
     'Closed win': [],
     'Closed lost': []
   });
+  // Per-column lead count, value sum and cursor for more cards (from the server)
+  const [columnStats, setColumnStats] = useState({});
   const [showAddForm, setShowAddForm] = useState(false);
   const [defaultStatus, setDefaultStatus] = useState('Interest');
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  // Delta sync cursor for GET /leads/changes/ (null until the first full load)
+  const syncCursor = useRef(null);
   // Theme state for day/night mode
   const [isDarkMode, setIsDarkMode] = useState(() => {
     // Check localStorage for saved theme preference
@@ -42,11 +87,10 @@ const MainApp = () => {
     document.documentElement.setAttribute('data-theme', isDarkMode ? 'dark' : 'light');
   }, [isDarkMode]);
 
-  // Fetch leads from Django backend
-  const fetchLeads = async () => {
+  // Fetch the current delta sync cursor (must be taken before loading the full board)
+  const fetchSyncCursor = async () => {
     try {
-      setLoading(true);
-      const response = await fetch(`${API_BASE_URL}/leads/`, {
+      const response = await fetch(`${API_BASE_URL}/leads/changes/`, {
         method: 'GET',
         credentials: 'include',
       });
@@ -54,20 +98,64 @@ const MainApp = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       const data = await response.json();
-      setLeads(data);
-      setError(null);
+      return data.cursor;
     } catch (err) {
-      console.error('Error fetching leads:', err);
-      setError('Failed to fetch leads. Please check if the backend is running.');
-    } finally {
-      setLoading(false);
+      console.error('Error fetching sync cursor:', err);
+      return null;
     }
   };
 
-  // Silent fetch leads for background updates (no loading state)
-  const silentFetchLeads = async () => {
+  // Load counts, value sums and the first page of every column in one request
+  const loadBoard = async () => {
+    const response = await fetch(`${API_BASE_URL}/leads/?limit=${BOARD_PAGE_SIZE}`, {
+      method: 'GET',
+      credentials: 'include',
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    const { board, stats } = splitBoard(data.columns);
+    setLeads(board);
+    setColumnStats(stats);
+  };
+
+  // Refresh only the column counts and value sums (one card per column)
+  const refreshColumnStats = async () => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/leads/?limit=1`, {
+        method: 'GET',
+        credentials: 'include',
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const data = await response.json();
+      setColumnStats(prev => {
+        const next = { ...prev };
+        data.columns.forEach(column => {
+          next[column.status] = {
+            ...(prev[column.status] || {}),
+            count: column.count,
+            totalValue: column.total_value
+          };
+        });
+        return next;
+      });
+    } catch (err) {
+      console.error('Error refreshing column stats:', err);
+    }
+  };
+
+  // Append the next cards of one column
+  const loadMoreLeads = async (status) => {
+    const nextAfter = columnStats[status] && columnStats[status].nextAfter;
+    if (!nextAfter) {
+      return;
+    }
     try {
-      const response = await fetch(`${API_BASE_URL}/leads/`, {
+      const params = new URLSearchParams({ status, limit: BOARD_PAGE_SIZE, after: nextAfter });
+      const response = await fetch(`${API_BASE_URL}/leads/?${params}`, {
         method: 'GET',
         credentials: 'include',
       });
@@ -75,7 +163,40 @@ const MainApp = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       const data = await response.json();
-      setLeads(data);
+      setLeads(board => {
+        const loaded = board[status] || [];
+        const loadedIds = new Set(loaded.map(lead => lead.id));
+        return { ...board, [status]: [...loaded, ...data.cards.filter(lead => !loadedIds.has(lead.id))] };
+      });
+      setColumnStats(prev => ({ ...prev, [status]: { ...prev[status], nextAfter: data.next_after } }));
+    } catch (err) {
+      console.error('Error loading more leads:', err);
+      setError('Failed to load more leads. Please try again.');
+    }
+  };
+
+  // Fetch leads from Django backend
+  const fetchLeads = async () => {
+    try {
+      setLoading(true);
+      const cursor = await fetchSyncCursor();
+      await loadBoard();
+      syncCursor.current = cursor;
+      setError(null);
+    } catch (err) {
+      console.error('Error fetching leads:', err);
+      setError('Failed to fetch leads. Please check if the backend is running.');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Silent fetch leads for background updates (no loading state)
+  const silentFetchLeads = async () => {
+    try {
+      const cursor = await fetchSyncCursor();
+      await loadBoard();
+      syncCursor.current = cursor;
       setError(null);
     } catch (err) {
       console.error('Error silently fetching leads:', err);
@@ -83,10 +204,48 @@ const MainApp = () => {
     }
   };
 
+  // Pull only the leads changed since the last sync and merge them into the board
+  const syncLeads = async () => {
+    if (syncCursor.current === null) {
+      await silentFetchLeads();
+      return;
+    }
+    try {
+      let hasMore = true;
+      let changed = false;
+      while (hasMore) {
+        const response = await fetch(`${API_BASE_URL}/leads/changes/?since=${syncCursor.current}`, {
+          method: 'GET',
+          credentials: 'include',
+        });
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        if (data.reset) {
+          // Cursor no longer servable - fall back to a full reload
+          await silentFetchLeads();
+          return;
+        }
+        setLeads(board => applyLeadChanges(board, data.upserted, data.deleted));
+        syncCursor.current = data.cursor;
+        hasMore = data.has_more;
+        changed = changed || data.upserted.length > 0 || data.deleted.length > 0;
+      }
+      if (changed) {
+        await refreshColumnStats();
+      }
+      setError(null);
+    } catch (err) {
+      console.error('Error syncing leads:', err);
+      await silentFetchLeads();
+    }
+  };
+
   // Add new lead
   const addLead = async (leadData) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/leads/`, {
+      let response = await idempotentFetch(`${API_BASE_URL}/leads/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -95,12 +254,33 @@ const MainApp = () => {
         body: JSON.stringify(leadData),
       });
       
+      // 409 with duplicates: the lead looks like an existing one
+      if (response.status === 409) {
+        const conflict = await response.json();
+        if (conflict.duplicates) {
+          const existing = conflict.duplicates
+            .map(({ lead }) => [lead.name, lead.company].filter(Boolean).join(', '))
+            .join('\n');
+          if (!window.confirm(`This lead looks like a duplicate of:\n${existing}\n\nCreate it anyway?`)) {
+            return;
+          }
+          response = await idempotentFetch(`${API_BASE_URL}/leads/`, {
+            method: 'POST',
+            headers: {
+              'Content-Type': 'application/json',
+            },
+            credentials: 'include',
+            body: JSON.stringify({ ...leadData, allow_duplicate: true }),
+          });
+        }
+      }
+      
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       
-      // Refresh leads after adding
-      await fetchLeads();
+      // Sync changed leads after adding
+      await syncLeads();
       setShowAddForm(false);
     } catch (err) {
       console.error('Error adding lead:', err);
@@ -114,10 +294,10 @@ const MainApp = () => {
     setShowAddForm(true);
   };
 
-  // Update lead status (for drag & drop)
-  const updateLeadStatus = async (leadId, newStatus, newOrder) => {
+  // Move a card (drag & drop): status and position change atomically on the server
+  const moveLead = async (leadId, newStatus, { beforeId, afterId }) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/leads/${leadId}/status/`, {
+      const response = await idempotentFetch(`${API_BASE_URL}/leads/${leadId}/move/`, {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
@@ -125,7 +305,8 @@ const MainApp = () => {
         credentials: 'include',
         body: JSON.stringify({
           status: newStatus,
-          card_order: newOrder
+          before_id: beforeId,
+          after_id: afterId
         }),
       });
       
@@ -133,11 +314,13 @@ const MainApp = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       
-      // Refresh leads after updating
-      await fetchLeads();
+      // Show the new order right away, then advance the sync cursor
+      const data = await response.json();
+      setLeads(board => applyLeadChanges(board, [data.lead, ...data.reordered], []));
+      await syncLeads();
     } catch (err) {
-      console.error('Error updating lead status:', err);
-      setError('Failed to update lead status. Please try again.');
+      console.error('Error moving lead:', err);
+      setError('Failed to move lead. Please try again.');
     }
   };
 
@@ -157,8 +340,8 @@ const MainApp = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       
-      // Refresh leads after updating
-      await fetchLeads();
+      // Sync changed leads after updating
+      await syncLeads();
     } catch (err) {
       console.error('Error updating lead:', err);
       setError('Failed to update lead. Please try again.');
@@ -178,8 +361,8 @@ const MainApp = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       
-      // Refresh leads after deleting
-      await fetchLeads();
+      // Sync changed leads after deleting
+      await syncLeads();
     } catch (err) {
       console.error('Error deleting lead:', err);
       setError('Failed to delete lead. Please try again.');
@@ -190,6 +373,53 @@ const MainApp = () => {
     fetchLeads();
   }, []);
 
+  // Realtime lead changes (e.g. made by the chat assistant or in another tab)
+  useEffect(() => {
+    let events = null;
+    let pollTimer = null;
+    let failures = 0;
+    // No stream (the server answers 501 under WSGI): poll the delta sync instead
+    const startPolling = () => {
+      if (events) {
+        events.close();
+        events = null;
+      }
+      if (!pollTimer) {
+        pollTimer = setInterval(() => syncLeads(), SYNC_POLL_INTERVAL_MS);
+      }
+    };
+    
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+    } else {
+      events = new EventSource(`${API_BASE_URL}/events/leads/`, { withCredentials: true });
+      const handleLeadEvent = () => syncLeads();
+      ['lead.created', 'lead.updated', 'lead.deleted'].forEach(type => {
+        events.addEventListener(type, handleLeadEvent);
+      });
+      // (Re)connected: catch up on anything missed while disconnected
+      events.onopen = () => {
+        failures = 0;
+        handleLeadEvent();
+      };
+      // An error status closes the stream for good; otherwise give up after repeated failed reconnects
+      events.onerror = () => {
+        failures += 1;
+        if (events.readyState === EventSource.CLOSED || failures >= REALTIME_MAX_FAILURES) {
+          startPolling();
+        }
+      };
+    }
+    return () => {
+      if (events) {
+        events.close();
+      }
+      if (pollTimer) {
+        clearInterval(pollTimer);
+      }
+    };
+  }, []);
+
   if (loading) {
     return (
       <div className="App">
@@ -217,7 +447,9 @@ const MainApp = () => {
       <main className="main-content">
         <KanbanBoard 
           leads={leads}
-          onUpdateLeadStatus={updateLeadStatus}
+          columnStats={columnStats}
+          onLoadMore={loadMoreLeads}
+          onMoveLead={moveLead}
           onDeleteLead={deleteLead}
           onUpdateLead={updateLead}
           onAddLead={handleAddLead}
@@ -232,7 +464,7 @@ const MainApp = () => {
         />
       )}
       
-      <ChatWidget onLeadsUpdated={silentFetchLeads} />
+      <ChatWidget onLeadsUpdated={syncLeads} />
     </div>
   );
 };
@@ -3,13 +3,19 @@ import ChatButton from './ChatButton';
 import ChatMessage from './ChatMessage';
 import ConversationList from './ConversationList';
 import './ChatWidget.css';
+import { idempotentFetch } from '../idempotentFetch';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
+// Messages fetched per window when opening a conversation
+const MESSAGE_PAGE_SIZE = 50;
+
 const ChatWidget = ({ onLeadsUpdated }) => {
   const [isOpen, setIsOpen] = useState(false);
   const [isCollapsed, setIsCollapsed] = useState(false);
   const [messages, setMessages] = useState([]);
+  // Cursor for the next older window of the open conversation (null when none)
+  const [olderCursor, setOlderCursor] = useState(null);
   const [inputValue, setInputValue] = useState('');
   const [isLoading, setIsLoading] = useState(false);
 
@@ -140,7 +146,7 @@ const ChatWidget = ({ onLeadsUpdated }) => {
 
     try {
       // Send message to backend
-      const response = await fetch(`${API_BASE_URL}/chat/`, {
+      const response = await idempotentFetch(`${API_BASE_URL}/chat/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -188,26 +194,40 @@ const ChatWidget = ({ onLeadsUpdated }) => {
     }
   };
 
-  // Load messages for a specific conversation
-  const loadConversationMessages = async (conversationId) => {
+  // Load the newest window of messages for a conversation, or the window before a cursor
+  const loadConversationMessages = async (conversationId, before = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/conversations/${conversationId}/messages/`, {
+      const params = new URLSearchParams({
+        limit: MESSAGE_PAGE_SIZE,
+        include_function_results: 'false',
+      });
+      if (before) {
+        params.set('before', before);
+      }
+      const response = await fetch(`${API_BASE_URL}/conversations/${conversationId}/messages/?${params}`, {
         method: 'GET',
         credentials: 'include',
       });
 
       if (response.ok) {
-        const messages = await response.json();
+        const data = await response.json();
         // Transform backend messages to frontend format
-        const formattedMessages = messages.map(msg => ({
+        const formattedMessages = data.messages.map(msg => ({
           id: msg.id,
           message: msg.content,
-          isUser: msg.role === 'user',
-          timestamp: msg.created_at,
+          isUser: msg.is_user,
+          timestamp: msg.timestamp,
           isConfirmationRequest: false,
-          functionResults: msg.function_results ? JSON.parse(msg.function_results) : null
+          functionResults: typeof msg.function_results === 'string'
+            ? JSON.parse(msg.function_results)
+            : (msg.function_results || null)
         }));
-        setMessages(formattedMessages);
+        if (before) {
+          setMessages(prev => [...formattedMessages, ...prev]);
+        } else {
+          setMessages(formattedMessages);
+        }
+        setOlderCursor(data.next_before);
       } else {
         console.error('Failed to load conversation messages');
       }
@@ -221,6 +241,7 @@ const ChatWidget = ({ onLeadsUpdated }) => {
     if (conversationId === currentConversationId) return;
     
     setCurrentConversationId(conversationId);
+    setOlderCursor(null);
     if (conversationId) {
       loadConversationMessages(conversationId);
     } else {
@@ -255,6 +276,7 @@ const ChatWidget = ({ onLeadsUpdated }) => {
         // Switch to the new conversation
         setCurrentConversationId(newConversation.id);
         setMessages([]);
+        setOlderCursor(null);
         
         // Stop any ongoing polling
         if (pollingIntervalRef.current) {
@@ -269,6 +291,7 @@ const ChatWidget = ({ onLeadsUpdated }) => {
         // Fallback to old behavior
         setCurrentConversationId(null);
         setMessages([]);
+        setOlderCursor(null);
         if (pollingIntervalRef.current) {
           clearInterval(pollingIntervalRef.current);
         }
@@ -279,6 +302,7 @@ const ChatWidget = ({ onLeadsUpdated }) => {
       // Fallback to old behavior
       setCurrentConversationId(null);
       setMessages([]);
+      setOlderCursor(null);
       if (pollingIntervalRef.current) {
         clearInterval(pollingIntervalRef.current);
       }
@@ -294,10 +318,12 @@ const ChatWidget = ({ onLeadsUpdated }) => {
           'Content-Type': 'application/json',
         },
         credentials: 'include',
+        body: JSON.stringify({ conversation_id: currentConversationId }),
       });
 
       if (response.ok) {
         setMessages([]);
+        setOlderCursor(null);
         // Stop any ongoing polling
         if (pollingIntervalRef.current) {
           clearInterval(pollingIntervalRef.current);
@@ -341,7 +367,7 @@ const ChatWidget = ({ onLeadsUpdated }) => {
     setIsLoading(true);
 
     // Send to backend
-    fetch(`${API_BASE_URL}/chat/`, {
+    idempotentFetch(`${API_BASE_URL}/chat/`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -468,6 +494,15 @@ const ChatWidget = ({ onLeadsUpdated }) => {
                   </div>
                 )}
                 
+                {olderCursor && currentConversationId && (
+                  <button
+                    className="load-earlier-button"
+                    onClick={() => loadConversationMessages(currentConversationId, olderCursor)}
+                  >
+                    Load earlier messages
+                  </button>
+                )}
+                
                 {messages.map((msg) => (
                   <ChatMessage
                     key={msg.id}
@@ -77,8 +77,14 @@ const ConversationItem = ({
             <div className="conversation-title">
               {conversation.title}
             </div>
+            {conversation.last_message_preview && (
+              <div className="conversation-preview">
+                {conversation.last_message_preview}
+              </div>
+            )}
             <div className="conversation-date">
               {formatDate(conversation.updated_at)}
+              {conversation.message_count > 0 && ` · ${conversation.message_count} messages`}
             </div>
           </>
         )}
@@ -3,6 +3,9 @@ import ConversationItem from './ConversationItem';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
+// Conversations fetched per page in the sidebar
+const CONVERSATION_PAGE_SIZE = 30;
+
 const ConversationList = ({ 
   selectedConversationId, 
   onSelectConversation, 
@@ -12,6 +15,8 @@ const ConversationList = ({
   const [conversations, setConversations] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  // Cursor for the next page of conversations (null when everything is loaded)
+  const [nextCursor, setNextCursor] = useState(null);
 
   // Load conversations
   useEffect(() => {
@@ -23,14 +28,15 @@ const ConversationList = ({
       setLoading(true);
       setError(null);
       
-      const response = await fetch(`${API_BASE_URL}/conversations/`, {
+      const response = await fetch(`${API_BASE_URL}/conversations/?limit=${CONVERSATION_PAGE_SIZE}`, {
         method: 'GET',
         credentials: 'include',
       });
 
       if (response.ok) {
         const data = await response.json();
-        setConversations(data);
+        setConversations(data.conversations);
+        setNextCursor(data.next_before);
       } else if (response.status === 401) {
         setError('Authentication required');
       } else {
@@ -44,6 +50,30 @@ const ConversationList = ({
     }
   };
 
+  // Append the next page of conversations
+  const loadMoreConversations = async () => {
+    try {
+      const params = new URLSearchParams({ limit: CONVERSATION_PAGE_SIZE, before: nextCursor });
+      const response = await fetch(`${API_BASE_URL}/conversations/?${params}`, {
+        method: 'GET',
+        credentials: 'include',
+      });
+
+      if (response.ok) {
+        const data = await response.json();
+        setConversations(prev => {
+          const loadedIds = new Set(prev.map(conv => conv.id));
+          return [...prev, ...data.conversations.filter(conv => !loadedIds.has(conv.id))];
+        });
+        setNextCursor(data.next_before);
+      } else {
+        console.error('Failed to load more conversations');
+      }
+    } catch (error) {
+      console.error('Error loading more conversations:', error);
+    }
+  };
+
   const handleDeleteConversation = async (conversationId) => {
     try {
       const response = await fetch(`${API_BASE_URL}/conversations/${conversationId}/`, {
@@ -82,7 +112,7 @@ const ConversationList = ({
         const updatedConversation = await response.json();
         setConversations(prev => 
           prev.map(conv => 
-            conv.id === conversationId ? updatedConversation : conv
+            conv.id === conversationId ? { ...conv, ...updatedConversation } : conv
           )
         );
       } else {
@@ -173,6 +203,11 @@ const ConversationList = ({
                 onUpdate={(updates) => handleUpdateConversation(conversation.id, updates)}
               />
             ))}
+            {nextCursor && (
+              <button className="load-more-conversations-btn" onClick={loadMoreConversations}>
+                Load more
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -3,7 +3,7 @@ import './KanbanBoard.css';
 import LeadCard from './LeadCard';
 import LeadDetailsModal from './LeadDetailsModal';
 
-const KanbanBoard = ({ leads, onUpdateLeadStatus, onDeleteLead, onUpdateLead, onAddLead }) => {
+const KanbanBoard = ({ leads, columnStats = {}, onLoadMore, onMoveLead, onDeleteLead, onUpdateLead, onAddLead }) => {
   const [selectedLead, setSelectedLead] = useState(null);
 
   const statusColumns = [
@@ -14,6 +14,13 @@ const KanbanBoard = ({ leads, onUpdateLeadStatus, onDeleteLead, onUpdateLead, on
     { key: 'Closed lost', title: 'Closed Lost', color: '#fd79a8' }
   ];
 
+  // Column totals come from the server, so they include cards not loaded yet
+  const formatTotal = (amount) => new Intl.NumberFormat('en-US', {
+    style: 'currency',
+    currency: 'USD',
+    maximumFractionDigits: 0
+  }).format(amount || 0);
+
   const handleDragStart = (e, leadId, currentStatus) => {
     e.dataTransfer.setData('text/plain', JSON.stringify({
       leadId,
@@ -30,10 +37,26 @@ const KanbanBoard = ({ leads, onUpdateLeadStatus, onDeleteLead, onUpdateLead, on
     const data = JSON.parse(e.dataTransfer.getData('text/plain'));
     
     if (data.currentStatus !== newStatus) {
-      // Calculate new order (place at end of column)
-      const newOrder = (leads[newStatus] || []).length + 1;
-      onUpdateLeadStatus(data.leadId, newStatus, newOrder);
+      // Dropped on the column itself: place at end of column
+      onMoveLead(data.leadId, newStatus, { beforeId: null, afterId: null });
+    }
+  };
+
+  // Dropped on a card: place the dragged card just above it
+  const handleCardDrop = (e, newStatus, targetLead) => {
+    e.preventDefault();
+    e.stopPropagation();
+    const data = JSON.parse(e.dataTransfer.getData('text/plain'));
+    if (data.leadId === targetLead.id) {
+      return;
     }
+    const columnLeads = (leads[newStatus] || []).filter(lead => lead.id !== data.leadId);
+    const targetIndex = columnLeads.findIndex(lead => lead.id === targetLead.id);
+    const cardAbove = targetIndex > 0 ? columnLeads[targetIndex - 1] : null;
+    onMoveLead(data.leadId, newStatus, {
+      beforeId: targetLead.id,
+      afterId: cardAbove ? cardAbove.id : null
+    });
   };
 
   const handleLeadDoubleClick = (lead) => {
@@ -76,9 +99,16 @@ const KanbanBoard = ({ leads, onUpdateLeadStatus, onDeleteLead, onUpdateLead, on
                 style={{ borderTopColor: column.color }}
               >
                 <h3 className="column-title">{column.title}</h3>
-                <span className="column-count">
-                  {(leads[column.key] || []).length}
-                </span>
+                <div className="column-header-actions">
+                  {columnStats[column.key] && (
+                    <span className="column-total">
+                      {formatTotal(columnStats[column.key].totalValue)}
+                    </span>
+                  )}
+                  <span className="column-count">
+                    {columnStats[column.key] ? columnStats[column.key].count : (leads[column.key] || []).length}
+                  </span>
+                </div>
               </div>
               
               <div className="column-content">
@@ -87,12 +117,22 @@ const KanbanBoard = ({ leads, onUpdateLeadStatus, onDeleteLead, onUpdateLead, on
                     key={lead.id}
                     lead={lead}
                     onDragStart={(e) => handleDragStart(e, lead.id, column.key)}
+                    onDrop={(e) => handleCardDrop(e, column.key, lead)}
                     onDelete={() => onDeleteLead(lead.id)}
                     onDoubleClick={handleLeadDoubleClick}
                     statusColor={column.color}
                   />
                 ))}
                 
+                {columnStats[column.key] && columnStats[column.key].nextAfter && (
+                  <button
+                    className="load-more-leads-btn"
+                    onClick={() => onLoadMore(column.key)}
+                  >
+                    Show more
+                  </button>
+                )}
+                
                 {(leads[column.key] || []).length === 0 && (
                   <div className="empty-column">
                     <p>No leads in this stage</p>
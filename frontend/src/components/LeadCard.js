@@ -1,7 +1,7 @@
 import React from 'react';
 import './LeadCard.css';
 
-const LeadCard = ({ lead, onDragStart, onDelete, onDoubleClick, statusColor }) => {
+const LeadCard = ({ lead, onDragStart, onDrop, onDelete, onDoubleClick, statusColor }) => {
   const getInitials = (name) => {
     if (!name) return '?';
     return name
@@ -17,6 +17,7 @@ const LeadCard = ({ lead, onDragStart, onDelete, onDoubleClick, statusColor }) =
       className="lead-card"
       draggable
       onDragStart={onDragStart}
+      onDrop={onDrop}
       onDoubleClick={() => onDoubleClick(lead)}
       style={{ borderLeftColor: statusColor }}
       title="Double-click to view details"
@@ -0,0 +1,46 @@
+// POST helper for requests that must not run twice (chat messages, new leads).
+// Every attempt carries the same Idempotency-Key, so when a response is lost on a
+// flaky network the retry replays the server's stored result instead of repeating it.
+
+const newIdempotencyKey = () =>
+  (window.crypto && window.crypto.randomUUID)
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+const wait = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// The server answers a duplicate of a running request at once with 409 + Retry-After,
+// so keep asking for about as long as a chat turn may take (60s deadline)
+const MAX_IN_PROGRESS_POLLS = 60;
+
+export const idempotentFetch = async (url, options = {}, retries = 2) => {
+  const key = newIdempotencyKey();
+  const requestOptions = {
+    ...options,
+    headers: { ...(options.headers || {}), 'Idempotency-Key': key },
+  };
+
+  let polls = 0;
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await fetch(url, requestOptions);
+      // 409 with Retry-After: the first attempt is still running on the server - ask again
+      // (other 409s are final: duplicates, see addLead, or a failed original)
+      const retryAfter = Number(response.headers.get('Retry-After'));
+      if (response.status === 409 && retryAfter > 0 && polls < MAX_IN_PROGRESS_POLLS) {
+        const conflict = await response.clone().json().catch(() => ({}));
+        if (!conflict.duplicates) {
+          polls++;
+          attempt--; // Polling is not a failed attempt
+          await wait(retryAfter * 1000);
+          continue;
+        }
+      }
+      return response;
+    } catch (err) {
+      // Network error: the request may or may not have reached the server
+      if (attempt >= retries) throw err;
+      await wait(500 * 2 ** attempt);
+    }
+  }
+};
@@ -0,0 +1,153 @@
+"""
+Gunicorn production profile.
+
+Loaded automatically when gunicorn starts in this directory (or explicitly
+with `gunicorn -c gunicorn.conf.py`). Every value can be overridden from the
+environment or .env:
+
+    GUNICORN_WORKER_CLASS        gthread (default, WSGI) or uvicorn (ASGI, needed
+                                 for the /events/leads/ Server-Sent Events stream;
+                                 serves one API request per worker at a time)
+    WEB_CONCURRENCY              Worker processes (default: derived, see below)
+    CACHE_REDIS_URL              Shared cache; required for more than one worker
+    GUNICORN_THREADS             Threads per gthread worker (default 4)
+    GUNICORN_WORKER_MEMORY_MB    Memory budgeted per worker (default 160)
+    GUNICORN_RESERVED_MEMORY_MB  Memory kept for the master and other processes
+                                 in the container, e.g. a Celery worker (default 64)
+    GUNICORN_MAX_REQUESTS        Recycle a worker after this many requests (default 1000)
+    GUNICORN_PRELOAD             Import the app once in the master (default True)
+    GUNICORN_TIMEOUT             Worker timeout in seconds (default 60)
+
+Chat task status, ETag versions, idempotency keys and login rate limits live
+in the Django cache, which is per process unless CACHE_REDIS_URL is set. So
+without it there is a single worker (its threads share the cache), and asking
+for more with WEB_CONCURRENCY is refused. With it, the default worker count
+is 2 x CPUs + 1, capped by the memory limit: CPUs and memory are read from
+the container's cgroup limits when there are any, otherwise from the host.
+"""
+import math
+import os
+
+# Gunicorn reads every module-level name as a setting, and `config` is one
+from decouple import config as env
+
+# cgroup v1 reports "no limit" as a huge number
+_UNLIMITED = 1 << 60
+
+# Same variable settings.py uses to switch the Django cache to Redis
+SHARED_CACHE = bool(env('CACHE_REDIS_URL', default=''))
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """CPUs available to this container (cgroup quota, then CPU affinity)"""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = _read('/sys/fs/cgroup/cpu.max')
+    if cpu_max and not cpu_max.startswith('max'):
+        quota, period = cpu_max.split()
+        return max(1, math.ceil(int(quota) / int(period)))
+    # cgroup v1
+    quota = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota) > 0:
+        return max(1, math.ceil(int(quota) / int(period)))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_limit_mb():
+    """Memory available to this container in MiB (cgroup limit, then physical memory)"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read(path)
+        if value and value.isdigit() and int(value) < _UNLIMITED:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers():
+    if not SHARED_CACHE:
+        return 1
+    by_cpu = 2 * cpu_limit() + 1
+    memory = memory_limit_mb()
+    if memory is None:
+        return by_cpu
+    per_worker = env('GUNICORN_WORKER_MEMORY_MB', default=160, cast=int)
+    reserved = env('GUNICORN_RESERVED_MEMORY_MB', default=64, cast=int)
+    by_memory = (memory - reserved) // per_worker
+    return max(1, min(by_cpu, by_memory))
+
+
+# Server socket
+bind = f"0.0.0.0:{env('PORT', default='8000')}"
+
+# Worker processes
+# Trade-off of uvicorn: the SSE stream is async and costs no thread, but Django
+# runs every sync view (all of the API) through sync_to_async with
+# thread_sensitive=True, i.e. on one thread per worker. Each uvicorn worker
+# therefore handles one API request at a time, where a gthread worker handles
+# GUNICORN_THREADS, and a slow Supabase/OpenAI call holds up everything queued
+# behind it. Give uvicorn more workers (which needs CACHE_REDIS_URL), or keep
+# the API on gthread and run a second gunicorn with GUNICORN_WORKER_CLASS=uvicorn
+# that only receives /events/leads/ (routed by path at the proxy).
+WORKER_CLASSES = {
+    'gthread': ('gthread', 'backend.wsgi:application'),
+    'uvicorn': ('uvicorn.workers.UvicornWorker', 'backend.asgi:application'),
+}
+_worker_choice = env('GUNICORN_WORKER_CLASS', default='gthread')
+if _worker_choice not in WORKER_CLASSES:
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, got {_worker_choice!r}")
+worker_class, wsgi_app = WORKER_CLASSES[_worker_choice]
+
+workers = env('WEB_CONCURRENCY', default=0, cast=int) or default_workers()
+if workers > 1 and not SHARED_CACHE:
+    raise ValueError(
+        f"WEB_CONCURRENCY={workers} needs CACHE_REDIS_URL: with the per-process cache, chat status polls, "
+        "ETags, idempotency keys and login limits would not be shared between workers"
+    )
+# Only used by gthread (see the uvicorn trade-off above); requests mostly wait
+# on Supabase/OpenAI, so a few threads per worker keep the CPU busy without more processes
+threads = env('GUNICORN_THREADS', default=4, cast=int)
+
+# Recycle workers to bound memory growth; the jitter keeps them from restarting together
+max_requests = env('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = env('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+
+# Import Django once in the master so workers start fast and share memory pages
+preload_app = env('GUNICORN_PRELOAD', default=True, cast=bool)
+
+timeout = env('GUNICORN_TIMEOUT', default=60, cast=int)
+graceful_timeout = 30
+keepalive = 5
+
+# Logging
+accesslog = '-'
+errorlog = '-'
+
+# The app may be imported in the master (preload_app), where the Supabase and
+# OpenAI clients must not be created; each worker warms up after it loaded the
+# app instead (see backend/api/warmup.py)
+os.environ['WARMUP_AFTER_FORK'] = 'true'
+
+
+def post_worker_init(worker):
+    from backend.api.warmup import start_warmup
+    start_warmup(after_fork=True)
+
+
+def when_ready(server):
+    server.log.info(
+        f"🚀 {_worker_choice}: {workers} workers x {threads if _worker_choice == 'gthread' else 1} threads "
+        f"(CPUs {cpu_limit()}, memory {memory_limit_mb()} MiB), preload={preload_app}, max_requests={max_requests}"
+    )
@@ -0,0 +1,454 @@
+"""
+Micro-benchmarks for the API request path.
+
+Runs requests straight through Django's WSGI handler (no network, no
+Supabase), so the numbers isolate framework overhead. The move benchmark is
+the exception: it needs a real Supabase project with scripts/move_lead.sql
+applied (export SUPABASE_URL and SUPABASE_KEY).
+
+Usage (from the project root):
+    python scripts/benchmark_api.py middleware [--requests 2000]
+    python scripts/benchmark_api.py json [--leads 500] [--messages 200]
+    python scripts/benchmark_api.py imports [--budget-ms 800]
+    python scripts/benchmark_api.py move --user-id <uuid> [--cards 300] [--moves 50]
+"""
+import argparse
+import contextlib
+import gzip
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+for name, value in (('SUPABASE_URL', 'https://placeholder.supabase.co'),
+                    ('SUPABASE_KEY', 'placeholder-key'),
+                    ('OPENAI_API_KEY', 'benchmark')):
+    os.environ.setdefault(name, value)
+
+import warnings  # noqa: E402
+
+import django  # noqa: E402
+
+django.setup()
+warnings.filterwarnings('ignore', message='No directory at')
+
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from django.http import HttpResponse  # noqa: E402
+
+
+class LegacyCorsMiddleware:
+    """SimpleCorsMiddleware as it was before the fast path (substring origin checks)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method == "OPTIONS":
+            response = HttpResponse(status=204)
+            response["Access-Control-Allow-Origin"] = request.headers.get("Origin", "*")
+            response["Access-Control-Allow-Credentials"] = "true"
+            response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+            response["Access-Control-Allow-Headers"] = request.headers.get("Access-Control-Request-Headers", "*")
+            response["Access-Control-Max-Age"] = "86400"
+            return response
+        response = self.get_response(request)
+        origin = request.headers.get("Origin")
+        if origin and ("vercel.app" in origin or "localhost" in origin):
+            response["Access-Control-Allow-Origin"] = origin
+            response["Access-Control-Allow-Credentials"] = "true"
+        return response
+
+
+# The middleware stack before the API fast path, for comparison
+LEGACY_MIDDLEWARE = [
+    '__main__.LegacyCorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ORIGIN = 'https://lightweight-crm-indol.vercel.app'
+
+# Views print debug output; results go to the real stdout while it is silenced
+REAL_STDOUT = sys.stdout
+
+
+def report(line=''):
+    print(line, file=REAL_STDOUT, flush=True)
+
+
+def make_environ(method, path, headers=None):
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '8000',
+        'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(b''),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+
+def time_requests(handler, method, path, headers, count):
+    """Mean microseconds per request through the handler"""
+    def start_response(status, response_headers, exc_info=None):
+        pass
+
+    for _ in range(min(count, 100)):  # Warm up
+        handler(make_environ(method, path, headers), start_response)
+    started = time.perf_counter()
+    for _ in range(count):
+        response = handler(make_environ(method, path, headers), start_response)
+        for _ in response:
+            pass
+        response.close()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def bench_middleware(args):
+    from django.conf import settings
+
+    cases = [
+        ('GET /test/', 'GET', '/test/', {'Origin': ORIGIN}),
+        ('OPTIONS preflight', 'OPTIONS', '/leads/', {
+            'Origin': ORIGIN,
+            'Access-Control-Request-Method': 'POST',
+            'Access-Control-Request-Headers': 'content-type',
+        }),
+        ('GET /health/', 'GET', '/health/', {}),  # 404 through the full stack before
+        ('GET /leads/ (401)', 'GET', '/leads/', {'Origin': ORIGIN}),
+    ]
+    stacks = [('legacy', LEGACY_MIDDLEWARE), ('current', list(settings.MIDDLEWARE))]
+
+    report(f"{'request':<22}" + ''.join(f"{name:>12}" for name, _ in stacks) + '   (µs/request)')
+    for label, method, path, headers in cases:
+        row = f"{label:<22}"
+        for _, middleware in stacks:
+            with override_settings(MIDDLEWARE=middleware, DEBUG=False):
+                handler = WSGIHandler()
+                row += f"{time_requests(handler, method, path, headers, args.requests):>12.1f}"
+        report(row)
+
+
+def make_leads(count):
+    """Lead board rows shaped like the leads table (see docs, Lead Data Structure)"""
+    rng = random.Random(42)
+    statuses = ['Interest', 'Meeting booked', 'Proposal sent', 'Closed win', 'Closed lost']
+    sources = ['Website', 'Referral', 'Social Media', 'Cold Call', 'Email Campaign', 'Trade Show', 'Other']
+    first = ['John', 'Sarah', 'Miguel', 'Aiko', 'Fatima', 'Lars', 'Priya', 'Tom', 'Elena', 'Kwame']
+    last = ['Smith', 'Johnson', 'García', 'Tanaka', 'Khan', 'Nilsson', 'Patel', 'Brown', 'Rossi', 'Mensah']
+    companies = ['Tech Corp', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises']
+    now = datetime(2024, 1, 15, tzinfo=timezone.utc)
+    leads = []
+    for i in range(count):
+        name = f"{rng.choice(first)} {rng.choice(last)}"
+        company = rng.choice(companies)
+        created = now - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+        leads.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'name': name,
+            'company': company,
+            'email': f"{name.split()[0].lower()}.{i}@{company.split()[0].lower()}.com",
+            'phone': f"+1-555-{rng.randint(1000, 9999)}",
+            'value': round(rng.uniform(500, 250000), 2),
+            'notes': rng.choice(['', 'Interested in enterprise solution', 'Follow up after the demo next week. '
+                                 'Budget approved for Q3, needs security review.']),
+            'status': rng.choice(statuses),
+            'source': rng.choice(sources),
+            'card_order': i % 40,
+            'user_id': '6f1c1e0a-3b9e-4c1e-9a51-0d1b2c3d4e5f',
+            'created_at': created.isoformat(),
+            'updated_at': (created + timedelta(hours=rng.randint(0, 500))).isoformat(),
+        })
+    return leads
+
+
+def make_messages(count, leads):
+    """Conversation history alternating user turns and assistant turns with function results"""
+    rng = random.Random(7)
+    started = datetime(2024, 1, 15, 9, tzinfo=timezone.utc)
+    messages = []
+    for i in range(count):
+        is_user = i % 2 == 0
+        lead = rng.choice(leads)
+        function_results = None
+        if not is_user and rng.random() < 0.5:
+            matches = rng.sample(leads, min(5, len(leads)))
+            function_results = [{
+                'function': 'search_leads',
+                'arguments': {'query': lead['company']},
+                'result': {'success': True, 'leads': matches, 'message': f"Found {len(matches)} matching leads"},
+            }]
+        messages.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'conversation_id': 'b0c1d2e3-f405-4607-8809-0a1b2c3d4e5f',
+            'content': (f"Move {lead['name']} to {lead['status']}" if is_user
+                        else f"I've updated {lead['name']} at {lead['company']}. Anything else?"),
+            'is_user': is_user,
+            'function_results': function_results,
+            'timestamp': (started + timedelta(seconds=30 * i)).isoformat(),
+        })
+    return messages
+
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_json(args):
+    from django.conf import settings
+    from rest_framework.renderers import JSONRenderer
+
+    renderers = [('stdlib JSONRenderer', JSONRenderer())]
+    try:
+        from backend.api.renderers import ORJSONRenderer
+        renderers.append(('ORJSONRenderer', ORJSONRenderer()))
+    except ImportError:
+        report('orjson is not installed - only the stock renderer is measured')
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    leads = make_leads(args.leads)
+    payloads = [
+        (f'leads_list ({args.leads} leads)', leads),
+        (f'conversation_messages ({args.messages} msgs)', {
+            'messages': make_messages(args.messages, leads), 'has_more': False, 'next_before': None,
+        }),
+    ]
+
+    for label, data in payloads:
+        report(label)
+        body = None
+        for name, renderer in renderers:
+            elapsed, body = _best_of(lambda: renderer.render(data), args.repeat)
+            report(f"  render  {name:<22}{elapsed * 1e3:>9.2f} ms{len(body):>12,} bytes")
+
+        encoders = [('gzip', lambda: gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0))]
+        if brotli:
+            encoders.append(('brotli', lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)))
+        else:
+            report('  (brotli is not installed - gzip only)')
+        for name, encode in encoders:
+            elapsed, compressed = _best_of(encode, args.repeat)
+            report(f"  encode  {name:<22}{elapsed * 1e3:>9.2f} ms{len(compressed):>12,} bytes"
+                   f"  ({len(compressed) / len(body):.0%} of raw)")
+        report()
+
+
+# Modules a cold start should not load before the first /leads/ request
+LAZY_STACKS = ['openai', 'celery', 'kombu', 'supabase', 'tiktoken', 'numpy']
+
+BOOT_SNIPPET = 'import django; django.setup(); import backend.urls'
+
+
+def _import_profile():
+    """Run a fresh interpreter with -X importtime; returns {module: (cumulative_us, depth)}"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SNIPPET],
+        cwd=BASE_DIR, env=dict(os.environ), capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(cumulative), depth)
+    return modules
+
+
+def bench_imports(args):
+    profiles = [_import_profile() for _ in range(args.runs)]
+    totals = [sum(us for us, depth in p.values() if depth == 0) / 1000 for p in profiles]
+    total = statistics.median(totals)
+    latest = profiles[-1]
+
+    report(f"Boot imports ({BOOT_SNIPPET}): median {total:.0f} ms over {args.runs} runs, budget {args.budget_ms} ms")
+    report()
+    report("Slowest top-level imports:")
+    top_level = sorted(((us, name) for name, (us, depth) in latest.items() if depth == 0), reverse=True)
+    for us, name in top_level[:args.top]:
+        report(f"  {us / 1000:>8.1f} ms  {name}")
+    report()
+    report("Heavy stacks loaded at boot:")
+    for name in LAZY_STACKS:
+        loaded = name in latest
+        report(f"  {name:<10} {'LOADED (%.1f ms)' % (latest[name][0] / 1000) if loaded else 'not loaded'}")
+
+    if total > args.budget_ms:
+        report()
+        report(f"Import time {total:.0f} ms is over the {args.budget_ms} ms budget")
+        sys.exit(1)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _column_orders(client, user_id, status):
+    response = (client.table('leads').select('id, card_order').eq('user_id', user_id).eq('status', status)
+                .order('card_order').order('id').execute())
+    return response.data
+
+
+def _client_side_move(client, user_id, lead_id, to_status, after_id):
+    """A correct move without the RPC: renumber the column with one update per changed card"""
+    column = [row for row in _column_orders(client, user_id, to_status) if row['id'] != lead_id]
+    position = next((i + 1 for i, row in enumerate(column) if row['id'] == after_id), 0)
+    column.insert(position, {'id': lead_id, 'card_order': None})
+    requests = 1
+    for order, row in enumerate(column, start=1):
+        if row['card_order'] != order or row['id'] == lead_id:
+            client.table('leads').update({'status': to_status, 'card_order': order}).eq('id', row['id']).execute()
+            requests += 1
+    return requests
+
+
+def bench_move(args):
+    from backend.api.supabase_client import SupabaseService, get_supabase_client
+
+    if 'placeholder' in os.environ['SUPABASE_URL']:
+        report("The move benchmark needs a Supabase project: export SUPABASE_URL and SUPABASE_KEY")
+        sys.exit(2)
+    client = get_supabase_client()
+    if not client:
+        report("Could not create the Supabase client")
+        sys.exit(2)
+
+    # Two private columns, so the user's real board is not touched
+    run = uuid.uuid4().hex[:8]
+    columns = [f'Benchmark {run} A', f'Benchmark {run} B']
+    try:
+        for status in columns:
+            rows = [{'name': f'Benchmark card {i}', 'status': status, 'card_order': i, 'user_id': args.user_id}
+                    for i in range(1, args.cards + 1)]
+            for start in range(0, len(rows), 500):
+                client.table('leads').insert(rows[start:start + 500]).execute()
+        report(f"{args.cards} cards in each of 2 columns")
+
+        ids = {status: [row['id'] for row in _column_orders(client, args.user_id, status)] for status in columns}
+        random.seed(42)
+
+        def apply_locally(from_status, to_status, lead_id, after_id):
+            ids[from_status].remove(lead_id)
+            position = ids[to_status].index(after_id) + 1 if after_id else 0
+            ids[to_status].insert(position, lead_id)
+
+        rpc_ms, neighbours = [], []
+        for _ in range(args.moves):
+            from_status, to_status = random.choice(columns), random.choice(columns)
+            lead_id = random.choice(ids[from_status])
+            target = [lead for lead in ids[to_status] if lead != lead_id]
+            after_id = random.choice(target + [None])
+            # No card above: drop onto the top card (without either id the card goes to the end)
+            before_id = target[0] if after_id is None and target else None
+            started = time.perf_counter()
+            result = SupabaseService.move_lead(lead_id, to_status, before_id=before_id, after_id=after_id,
+                                               user_id=args.user_id)
+            rpc_ms.append((time.perf_counter() - started) * 1000)
+            if not result:
+                report("move_lead failed - is scripts/move_lead.sql applied?")
+                sys.exit(1)
+            neighbours.append(len(result['reordered']))
+            apply_locally(from_status, to_status, lead_id, after_id)
+
+        # Same-column reorders only, so the source column needs no second renumbering
+        client_ms, client_requests = [], []
+        for _ in range(args.client_side_moves):
+            status = random.choice(columns)
+            lead_id = random.choice(ids[status])
+            after_id = random.choice([lead for lead in ids[status] if lead != lead_id] + [None])
+            started = time.perf_counter()
+            client_requests.append(_client_side_move(client, args.user_id, lead_id, status, after_id))
+            client_ms.append((time.perf_counter() - started) * 1000)
+            apply_locally(status, status, lead_id, after_id)
+
+        report()
+        report(f"{'':<28}{'p50 ms':>10}{'p95 ms':>10}{'requests':>10}")
+        report(f"{'move_lead RPC':<28}{_percentile(rpc_ms, 0.5):>10.1f}{_percentile(rpc_ms, 0.95):>10.1f}{1:>10}")
+        if client_ms:
+            report(f"{'client-side renumbering':<28}{_percentile(client_ms, 0.5):>10.1f}"
+                   f"{_percentile(client_ms, 0.95):>10.1f}{statistics.median(client_requests):>10.0f}")
+        report(f"Neighbours renumbered per move: median {statistics.median(neighbours):.0f}, max {max(neighbours)}")
+
+        # Every column must be numbered 1..n in the order the moves produced
+        for status in columns:
+            rows = _column_orders(client, args.user_id, status)
+            orders_ok = [row['card_order'] for row in rows] == list(range(1, len(rows) + 1))
+            sequence_ok = [row['id'] for row in rows] == ids[status]
+            report(f"{status}: {len(rows)} cards, dense orders {'OK' if orders_ok else 'BROKEN'}, "
+                   f"sequence {'OK' if sequence_ok else 'BROKEN'}")
+    finally:
+        for status in columns:
+            client.table('leads').delete().eq('user_id', args.user_id).eq('status', status).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    middleware = subparsers.add_parser('middleware', help='Per-request middleware overhead, legacy vs current stack')
+    middleware.add_argument('--requests', type=int, default=2000)
+    middleware.set_defaults(func=bench_middleware)
+
+    json_bench = subparsers.add_parser('json', help='Serialization time and bytes on the wire for large payloads')
+    json_bench.add_argument('--leads', type=int, default=500)
+    json_bench.add_argument('--messages', type=int, default=200)
+    json_bench.add_argument('--repeat', type=int, default=20)
+    json_bench.set_defaults(func=bench_json)
+
+    imports = subparsers.add_parser('imports', help='-X importtime report for booting Django with all URLs')
+    imports.add_argument('--budget-ms', type=int, default=800)
+    imports.add_argument('--runs', type=int, default=5)
+    imports.add_argument('--top', type=int, default=12)
+    imports.set_defaults(func=bench_imports)
+
+    move = subparsers.add_parser('move', help='Drag & drop latency of move_lead against a Supabase project')
+    move.add_argument('--user-id', required=True, help='Existing users.id owning the temporary benchmark cards')
+    move.add_argument('--cards', type=int, default=300, help='Cards per column')
+    move.add_argument('--moves', type=int, default=50)
+    move.add_argument('--client-side-moves', type=int, default=5)
+    move.set_defaults(func=bench_move)
+
+    args = parser.parse_args()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        args.func(args)
+
+
+if __name__ == '__main__':
+    main()
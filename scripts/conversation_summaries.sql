@@ -0,0 +1,49 @@
+-- Conversation Summaries for the Chat Sidebar
+-- Execute in your Supabase SQL editor after supabase_table_setup.sql
+-- Lets GET /conversations/?limit=N list conversations with one bounded query
+
+-- 1. Denormalised summary columns
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_preview TEXT;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP;
+
+-- 2. Index for cursor pagination on (updated_at, id), newest first
+CREATE INDEX IF NOT EXISTS idx_conversations_user_keyset ON conversations(user_id, updated_at DESC, id DESC);
+
+-- 3. Keep the summary current whenever SupabaseService.create_message inserts a message
+-- The increment happens in the same transaction as the insert, so concurrent
+-- messages can never lose a count; the updated_at trigger on conversations
+-- also moves the conversation to the top of the list
+CREATE OR REPLACE FUNCTION update_conversation_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE conversations
+    SET message_count = message_count + 1,
+        last_message_preview = LEFT(NEW.content, 120),
+        last_message_at = NEW.timestamp
+    WHERE id = NEW.conversation_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS update_conversation_summary ON messages;
+CREATE TRIGGER update_conversation_summary AFTER INSERT ON messages
+    FOR EACH ROW EXECUTE FUNCTION update_conversation_summary();
+
+-- 4. Backfill existing conversations
+UPDATE conversations c
+SET message_count = s.message_count,
+    last_message_preview = s.last_message_preview,
+    last_message_at = s.last_message_at
+FROM (
+    SELECT DISTINCT ON (conversation_id)
+        conversation_id,
+        COUNT(*) OVER (PARTITION BY conversation_id) AS message_count,
+        LEFT(content, 120) AS last_message_preview,
+        timestamp AS last_message_at
+    FROM messages
+    ORDER BY conversation_id, timestamp DESC, id DESC
+) s
+WHERE c.id = s.conversation_id;
+
+SELECT '✅ Conversation summaries ready' as status;
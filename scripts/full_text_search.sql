@@ -0,0 +1,90 @@
+-- Full-Text Search over Leads and Conversation Messages
+-- Execute in your Supabase SQL editor after supabase_table_setup.sql
+-- (plain PostgreSQL 12+, see full_text_search_check.sql to try it on a local database)
+-- Backs GET /search/?q=... and the chat assistant's full_text_search function
+
+-- 1. Search documents as immutable functions, indexed by expression
+-- No stored tsvector column: it would ride along in every select('*') read,
+-- board payload, realtime event and chat prompt. The search below calls the
+-- same functions, so the planner uses the expression indexes.
+-- Name and company weigh most, then email, then the free-text notes
+ALTER TABLE leads DROP COLUMN IF EXISTS search_vector;
+ALTER TABLE messages DROP COLUMN IF EXISTS search_vector;
+
+CREATE OR REPLACE FUNCTION lead_search_vector(p_name TEXT, p_company TEXT, p_email TEXT, p_notes TEXT)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english'::regconfig, coalesce(p_name, '')), 'A') ||
+           setweight(to_tsvector('english'::regconfig, coalesce(p_company, '')), 'A') ||
+           setweight(to_tsvector('english'::regconfig, coalesce(p_email, '')), 'B') ||
+           setweight(to_tsvector('english'::regconfig, coalesce(p_notes, '')), 'C');
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION message_search_vector(p_content TEXT)
+RETURNS tsvector AS $$
+    SELECT to_tsvector('english'::regconfig, coalesce(p_content, ''));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- 2. GIN expression indexes for @@ matches
+CREATE INDEX IF NOT EXISTS idx_leads_search ON leads
+    USING GIN (lead_search_vector(name, company, email, notes));
+CREATE INDEX IF NOT EXISTS idx_messages_search ON messages
+    USING GIN (message_search_vector(content));
+
+-- 3. Ranked search over a user's leads and/or conversation messages
+-- p_query uses web search syntax: words, "quoted phrases", OR, -excluded
+-- p_scope: 'all', 'leads' or 'messages'. Snippets are only built for the returned page.
+CREATE OR REPLACE FUNCTION search_crm(
+    p_user_id UUID,
+    p_query TEXT,
+    p_scope TEXT DEFAULT 'all',
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    kind TEXT,
+    id UUID,
+    conversation_id UUID,
+    title TEXT,
+    status TEXT,
+    snippet TEXT,
+    rank REAL,
+    created_at TIMESTAMP
+) AS $$
+    WITH query AS (
+        SELECT websearch_to_tsquery('english', p_query) AS q
+    ),
+    matches AS (
+        SELECT 'lead'::TEXT AS kind, l.id, NULL::UUID AS conversation_id,
+               l.name::TEXT AS title, l.status::TEXT AS status,
+               concat_ws(' - ', l.company, l.email, l.notes) AS body,
+               ts_rank(lead_search_vector(l.name, l.company, l.email, l.notes), query.q) AS rank, l.created_at::TIMESTAMP AS created_at
+        FROM leads l, query
+        WHERE p_scope IN ('all', 'leads')
+          AND l.user_id = p_user_id
+          AND lead_search_vector(l.name, l.company, l.email, l.notes) @@ query.q
+        UNION ALL
+        SELECT 'message'::TEXT, m.id, m.conversation_id,
+               c.title::TEXT, NULL::TEXT,
+               m.content,
+               ts_rank(message_search_vector(m.content), query.q), m.timestamp::TIMESTAMP
+        FROM messages m
+        JOIN conversations c ON c.id = m.conversation_id, query
+        WHERE p_scope IN ('all', 'messages')
+          AND c.user_id = p_user_id
+          AND message_search_vector(m.content) @@ query.q
+    ),
+    page AS (
+        SELECT *
+        FROM matches
+        ORDER BY rank DESC, created_at DESC, id
+        LIMIT p_limit OFFSET p_offset
+    )
+    SELECT page.kind, page.id, page.conversation_id, page.title, page.status,
+           ts_headline('english', coalesce(page.body, ''), query.q,
+                       'MaxFragments=2, MaxWords=20, MinWords=5, StartSel=**, StopSel=**'),
+           page.rank, page.created_at
+    FROM page, query
+    ORDER BY page.rank DESC, page.created_at DESC, page.id;
+$$ LANGUAGE sql STABLE;
+
+SELECT '✅ Full-text search ready' as status;
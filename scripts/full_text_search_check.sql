@@ -0,0 +1,134 @@
+-- Full-Text Search Check
+-- Runs full_text_search.sql against sample data inside a transaction and rolls
+-- everything back. Works on a local PostgreSQL 13+ (tables missing there are
+-- created with the columns the search needs):
+--     createdb crm_fts && psql -v ON_ERROR_STOP=1 -d crm_fts -f scripts/full_text_search_check.sql
+-- A failed check aborts with an error; success ends with "Full-text search checks passed".
+
+BEGIN;
+
+-- Minimal schema for a database without the Supabase tables
+CREATE TABLE IF NOT EXISTS users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email VARCHAR(255) UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leads (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name VARCHAR(255),
+    company VARCHAR(255),
+    email VARCHAR(255),
+    phone VARCHAR(50),
+    value NUMERIC,
+    notes TEXT,
+    status VARCHAR(50) DEFAULT 'Interest',
+    source VARCHAR(50),
+    card_order INTEGER,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    title VARCHAR(255) NOT NULL DEFAULT 'New Conversation',
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    is_user BOOLEAN NOT NULL,
+    function_results JSONB,
+    timestamp TIMESTAMP DEFAULT NOW()
+);
+
+\ir full_text_search.sql
+
+DO $$
+DECLARE
+    owner UUID;
+    other UUID;
+    conversation UUID;
+    hits INTEGER;
+    first_kind TEXT;
+    first_title TEXT;
+    first_snippet TEXT;
+BEGIN
+    INSERT INTO users (email) VALUES ('fts-owner@example.test') RETURNING id INTO owner;
+    INSERT INTO users (email) VALUES ('fts-other@example.test') RETURNING id INTO other;
+
+    INSERT INTO leads (name, company, email, notes, status, user_id) VALUES
+        ('Ada Lovelace', 'Analytical Engines', 'ada@engines.test', 'Wants a renewal quote for the warehouse robots', 'Interest', owner),
+        ('Charles Babbage', 'Difference Ltd', 'charles@difference.test', 'Budget approved in March', 'Proposal sent', owner),
+        ('Grace Hopper', 'Compilers Inc', 'grace@compilers.test', 'Asked about warehouse automation pricing', 'Meeting booked', owner),
+        ('Hidden Lead', 'Other Tenant', 'hidden@other.test', 'warehouse robots for somebody else', 'Interest', other);
+
+    INSERT INTO conversations (user_id, title) VALUES (owner, 'Pricing follow-ups') RETURNING id INTO conversation;
+    INSERT INTO messages (conversation_id, content, is_user) VALUES
+        (conversation, 'Remind me to send the robots brochure to Ada next week', true),
+        (conversation, 'Noted - brochure reminder for Ada Lovelace.', false);
+
+    -- Notes are searchable, stemmed ("robot" finds "robots"), and scoped to the owner
+    SELECT COUNT(*) INTO hits FROM search_crm(owner, 'robot', 'leads');
+    IF hits <> 1 THEN
+        RAISE EXCEPTION 'expected 1 lead for "robot", got %', hits;
+    END IF;
+
+    -- Messages are searchable and carry their conversation title
+    SELECT COUNT(*) INTO hits FROM search_crm(owner, 'brochure', 'messages');
+    IF hits <> 2 THEN
+        RAISE EXCEPTION 'expected 2 messages for "brochure", got %', hits;
+    END IF;
+    SELECT title INTO first_title FROM search_crm(owner, 'brochure', 'messages') LIMIT 1;
+    IF first_title <> 'Pricing follow-ups' THEN
+        RAISE EXCEPTION 'expected the conversation title, got %', first_title;
+    END IF;
+
+    -- A name match (weight A) outranks mentions in notes and messages
+    SELECT kind, title INTO first_kind, first_title FROM search_crm(owner, 'Ada') LIMIT 1;
+    IF first_kind <> 'lead' OR first_title <> 'Ada Lovelace' THEN
+        RAISE EXCEPTION 'expected lead Ada Lovelace first, got % %', first_kind, first_title;
+    END IF;
+
+    -- Web search syntax: phrases and exclusions
+    SELECT COUNT(*) INTO hits FROM search_crm(owner, '"warehouse automation"', 'leads');
+    IF hits <> 1 THEN
+        RAISE EXCEPTION 'expected 1 lead for the phrase, got %', hits;
+    END IF;
+    SELECT COUNT(*) INTO hits FROM search_crm(owner, 'warehouse -robots', 'leads');
+    IF hits <> 1 THEN
+        RAISE EXCEPTION 'expected 1 lead for "warehouse -robots", got %', hits;
+    END IF;
+
+    -- Pagination and highlighted snippets
+    SELECT COUNT(*) INTO hits FROM search_crm(owner, 'warehouse OR brochure', 'all', 2, 0);
+    IF hits <> 2 THEN
+        RAISE EXCEPTION 'expected a page of 2, got %', hits;
+    END IF;
+    SELECT COUNT(*) INTO hits FROM search_crm(owner, 'warehouse OR brochure', 'all', 2, 2);
+    IF hits <> 2 THEN
+        RAISE EXCEPTION 'expected a second page of 2, got %', hits;
+    END IF;
+    SELECT snippet INTO first_snippet FROM search_crm(owner, 'budget', 'leads') LIMIT 1;
+    IF first_snippet NOT LIKE '%**Budget**%' THEN
+        RAISE EXCEPTION 'expected a highlighted snippet, got %', first_snippet;
+    END IF;
+
+    -- The indexed expressions follow updates
+    UPDATE leads SET notes = 'Now interested in drones' WHERE name = 'Charles Babbage' AND user_id = owner;
+    SELECT COUNT(*) INTO hits FROM search_crm(owner, 'drone', 'leads');
+    IF hits <> 1 THEN
+        RAISE EXCEPTION 'expected the updated notes to match, got %', hits;
+    END IF;
+
+    -- The search vector never becomes part of the rows the API reads
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name IN ('leads', 'messages') AND column_name = 'search_vector') THEN
+        RAISE EXCEPTION 'leads/messages must not carry a search_vector column';
+    END IF;
+
+    RAISE NOTICE '✅ Full-text search checks passed';
+END $$;
+
+ROLLBACK;
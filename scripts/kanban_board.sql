@@ -0,0 +1,65 @@
+-- Kanban Board RPC
+-- Execute in your Supabase SQL editor after supabase_table_setup.sql
+-- Backs GET /leads/?limit=N (whole board) and GET /leads/?status=...&after=<cursor> (more cards of a column)
+
+-- 1. Index serving the per-column pages and the per-status aggregates
+CREATE INDEX IF NOT EXISTS idx_leads_user_status_order ON leads(user_id, status, card_order, id);
+
+-- 2. Board: per-status count, value sum and the first page of cards, in column order
+-- Cards are ordered by (card_order, id); leads without a card_order come last
+CREATE OR REPLACE FUNCTION get_kanban_board(p_user_id UUID, p_statuses TEXT[], p_page_size INTEGER DEFAULT 50)
+RETURNS JSONB AS $$
+    WITH columns AS (
+        SELECT status, position
+        FROM unnest(p_statuses) WITH ORDINALITY AS s(status, position)
+    ),
+    totals AS (
+        SELECT status, COUNT(*) AS count, COALESCE(SUM(value), 0) AS total_value
+        FROM leads
+        WHERE user_id = p_user_id AND status = ANY(p_statuses)
+        GROUP BY status
+    )
+    SELECT jsonb_build_object('columns', COALESCE(jsonb_agg(jsonb_build_object(
+        'status', c.status,
+        'count', COALESCE(t.count, 0),
+        'total_value', COALESCE(t.total_value, 0),
+        'cards', COALESCE(cards.items, '[]'::jsonb)
+    ) ORDER BY c.position), '[]'::jsonb))
+    FROM columns c
+    LEFT JOIN totals t ON t.status = c.status
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(to_jsonb(page) ORDER BY page.card_order NULLS LAST, page.id) AS items
+        FROM (
+            SELECT *
+            FROM leads l
+            WHERE l.user_id = p_user_id AND l.status = c.status
+            ORDER BY l.card_order NULLS LAST, l.id
+            LIMIT p_page_size
+        ) page
+    ) cards ON true;
+$$ LANGUAGE sql STABLE;
+
+-- 3. Next cards of one column after the (card_order, id) of the last loaded card
+-- p_after_order NULL with p_after_id set continues among the leads without a card_order
+CREATE OR REPLACE FUNCTION get_kanban_column(
+    p_user_id UUID,
+    p_status TEXT,
+    p_after_order INTEGER DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50
+)
+RETURNS SETOF leads AS $$
+    SELECT *
+    FROM leads l
+    WHERE l.user_id = p_user_id
+      AND l.status = p_status
+      AND (
+          p_after_id IS NULL
+          OR (p_after_order IS NOT NULL AND (l.card_order IS NULL OR (l.card_order, l.id) > (p_after_order, p_after_id)))
+          OR (p_after_order IS NULL AND l.card_order IS NULL AND l.id > p_after_id)
+      )
+    ORDER BY l.card_order NULLS LAST, l.id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+SELECT '✅ Kanban board functions ready' as status;
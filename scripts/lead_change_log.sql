@@ -0,0 +1,90 @@
+-- Lead Change Log for Kanban Delta Sync
+-- Execute in your Supabase SQL editor after supabase_table_setup.sql
+-- Backs GET /leads/changes/?since=<cursor>
+-- Needs PostgreSQL 13+ (xid8 / pg_current_xact_id)
+
+-- 1. Append-only change log
+-- The sync cursor is (txid, id), not id alone: BIGSERIAL ids are handed out
+-- when a row is inserted, not when its transaction commits, so a slow
+-- transaction can commit id 5 after id 6 was already served - a plain id
+-- cursor would skip it for good. Rows are only served once their transaction
+-- is older than every running one (pg_snapshot_xmin), and every row that can
+-- still appear later belongs to a transaction at or after that horizon.
+CREATE TABLE IF NOT EXISTS lead_changes (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID,
+    lead_id UUID NOT NULL,
+    operation VARCHAR(10) NOT NULL CHECK (operation IN ('upsert', 'delete')),
+    changed_at TIMESTAMP DEFAULT NOW()
+);
+ALTER TABLE lead_changes ADD COLUMN IF NOT EXISTS txid XID8 NOT NULL DEFAULT pg_current_xact_id();
+
+-- 2. Index for "changes of this user after cursor X" lookups
+DROP INDEX IF EXISTS idx_lead_changes_user_cursor;
+CREATE INDEX IF NOT EXISTS idx_lead_changes_user_txid ON lead_changes(user_id, txid, id);
+
+-- 3. Trigger function writing one row per lead mutation
+-- Runs in the same transaction as the write, so the log can never miss a change
+CREATE OR REPLACE FUNCTION log_lead_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO lead_changes (user_id, lead_id, operation)
+        VALUES (OLD.user_id, OLD.id, 'delete');
+        RETURN OLD;
+    END IF;
+
+    -- A lead handed over to another user is a deletion for the previous owner
+    IF TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+        INSERT INTO lead_changes (user_id, lead_id, operation)
+        VALUES (OLD.user_id, OLD.id, 'delete');
+    END IF;
+
+    INSERT INTO lead_changes (user_id, lead_id, operation)
+    VALUES (NEW.user_id, NEW.id, 'upsert');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 4. Attach the trigger to the leads table
+DROP TRIGGER IF EXISTS log_lead_changes ON leads;
+CREATE TRIGGER log_lead_changes AFTER INSERT OR UPDATE OR DELETE ON leads
+    FOR EACH ROW EXECUTE FUNCTION log_lead_change();
+
+-- 5. Same data isolation approach as the other application tables
+ALTER TABLE lead_changes DISABLE ROW LEVEL SECURITY;
+
+-- 6. Committed changes of a user after the cursor (p_since_txid, p_since_id),
+-- oldest first. xid8 values travel as text (they can exceed 2^53).
+CREATE OR REPLACE FUNCTION get_lead_changes(
+    p_user_id UUID,
+    p_since_txid TEXT,
+    p_since_id BIGINT,
+    p_limit INTEGER DEFAULT 500
+)
+RETURNS TABLE (id BIGINT, txid TEXT, lead_id UUID, operation VARCHAR) AS $$
+    SELECT c.id, c.txid::text, c.lead_id, c.operation
+    FROM lead_changes c
+    WHERE c.user_id = p_user_id
+      AND (c.txid, c.id) > (p_since_txid::xid8, p_since_id)
+      AND c.txid < pg_snapshot_xmin(pg_current_snapshot())
+    ORDER BY c.txid, c.id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- 7. Sync cursor bounds: the visibility horizon (a fresh cursor starts there)
+-- and the oldest retained transaction (older cursors can no longer be served)
+CREATE OR REPLACE FUNCTION get_lead_change_bounds()
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'horizon', pg_snapshot_xmin(pg_current_snapshot())::text,
+        'oldest', (SELECT txid::text FROM lead_changes ORDER BY txid LIMIT 1)
+    );
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- 8. Optional retention (schedule with pg_cron or run manually)
+-- Clients holding a cursor older than the oldest retained row get "reset": true
+-- and reload the full board.
+-- DELETE FROM lead_changes WHERE changed_at < NOW() - INTERVAL '30 days';
+
+SELECT '✅ Lead change log ready' as status;
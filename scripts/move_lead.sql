@@ -0,0 +1,88 @@
+-- Atomic Kanban Card Move
+-- Execute in your Supabase SQL editor after kanban_board.sql
+-- Backs PUT /leads/{id}/move/ (drag & drop) and the chat assistant's status changes
+
+-- move_lead places a card after p_after_id (the card above the drop point) or,
+-- failing that, before p_before_id (the card below it); with neither, or when
+-- both are no longer in the target column, it goes to the end of the column.
+-- The target column - and the source column when the status changes - are
+-- renumbered 1..n in the same transaction, so orders never drift or collide.
+-- Returns the moved card first, then every neighbour whose card_order changed;
+-- no rows when the lead does not exist for this user.
+CREATE OR REPLACE FUNCTION move_lead(
+    p_user_id UUID,
+    p_lead_id UUID,
+    p_to_status TEXT,
+    p_before_id UUID DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS SETOF leads AS $$
+DECLARE
+    v_from_status TEXT;
+BEGIN
+    -- One move per user at a time: concurrent drags queue instead of
+    -- interleaving their renumbering
+    PERFORM pg_advisory_xact_lock(hashtext('move_lead:' || p_user_id::text));
+
+    SELECT status INTO v_from_status
+    FROM leads
+    WHERE id = p_lead_id AND user_id = p_user_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    -- Target column: existing cards get even keys, the moved card the odd key
+    -- of its slot, then everything is renumbered by key
+    RETURN QUERY
+    WITH ranked AS (
+        SELECT id, row_number() OVER (ORDER BY card_order NULLS LAST, id) AS rank
+        FROM leads
+        WHERE user_id = p_user_id AND status = p_to_status AND id <> p_lead_id
+    ),
+    slot AS (
+        SELECT COALESCE(
+            (SELECT rank * 2 + 1 FROM ranked WHERE id = p_after_id),
+            (SELECT rank * 2 - 1 FROM ranked WHERE id = p_before_id),
+            (SELECT COUNT(*) * 2 + 1 FROM ranked)
+        ) AS key
+    ),
+    numbered AS (
+        SELECT id, row_number() OVER (ORDER BY key)::INTEGER AS new_order
+        FROM (
+            SELECT id, rank * 2 AS key FROM ranked
+            UNION ALL
+            SELECT p_lead_id, key FROM slot
+        ) keyed
+    ),
+    updated AS (
+        UPDATE leads l
+        SET card_order = n.new_order, status = p_to_status
+        FROM numbered n
+        WHERE l.id = n.id
+          AND (l.id = p_lead_id OR l.card_order IS DISTINCT FROM n.new_order)
+        RETURNING l.*
+    )
+    SELECT * FROM updated u ORDER BY (u.id = p_lead_id) DESC, u.card_order;
+
+    -- Source column: close the gap the card left behind
+    IF v_from_status IS DISTINCT FROM p_to_status THEN
+        RETURN QUERY
+        WITH numbered AS (
+            SELECT id, row_number() OVER (ORDER BY card_order NULLS LAST, id)::INTEGER AS new_order
+            FROM leads
+            WHERE user_id = p_user_id AND status = v_from_status
+        ),
+        updated AS (
+            UPDATE leads l
+            SET card_order = n.new_order
+            FROM numbered n
+            WHERE l.id = n.id AND l.card_order IS DISTINCT FROM n.new_order
+            RETURNING l.*
+        )
+        SELECT * FROM updated u ORDER BY u.card_order;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT '✅ move_lead ready' as status;
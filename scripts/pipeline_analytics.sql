@@ -0,0 +1,55 @@
+-- Pipeline Analytics RPC
+-- Execute in your Supabase SQL editor after supabase_table_setup.sql
+-- Backs GET /analytics/pipeline/ and the chat assistant's get_pipeline_analytics function
+
+-- 1. Index for the per-user aggregates over time
+CREATE INDEX IF NOT EXISTS idx_leads_user_created_at ON leads(user_id, created_at);
+
+-- 2. Aggregates computed in the database, so only a few rows leave it:
+--    by_status:       lead count, value sum and average per status (all time)
+--    by_source_month: leads created per source and month since p_since, with their
+--                     value and the value of those already won
+CREATE OR REPLACE FUNCTION get_pipeline_analytics(p_user_id UUID, p_since TIMESTAMP DEFAULT NULL)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'by_status', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'status', status,
+                'count', count,
+                'total_value', total_value,
+                'average_value', average_value
+            )), '[]'::jsonb)
+            FROM (
+                SELECT status,
+                       COUNT(*) AS count,
+                       COALESCE(SUM(value), 0) AS total_value,
+                       COALESCE(ROUND(AVG(value)::NUMERIC, 2), 0) AS average_value
+                FROM leads
+                WHERE user_id = p_user_id
+                GROUP BY status
+            ) statuses
+        ),
+        'by_source_month', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'source', source,
+                'month', to_char(month, 'YYYY-MM'),
+                'count', count,
+                'total_value', total_value,
+                'won_value', won_value
+            ) ORDER BY month, source), '[]'::jsonb)
+            FROM (
+                SELECT COALESCE(NULLIF(source, ''), 'Unknown') AS source,
+                       date_trunc('month', created_at) AS month,
+                       COUNT(*) AS count,
+                       COALESCE(SUM(value), 0) AS total_value,
+                       COALESCE(SUM(value) FILTER (WHERE status = 'Closed win'), 0) AS won_value
+                FROM leads
+                WHERE user_id = p_user_id
+                  AND (p_since IS NULL OR created_at >= p_since)
+                GROUP BY 1, 2
+            ) sources
+        )
+    );
+$$ LANGUAGE sql STABLE;
+
+SELECT '✅ Pipeline analytics ready' as status;
@@ -43,6 +43,8 @@ CREATE INDEX IF NOT EXISTS idx_conversations_created_at ON conversations(created
 CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_leads_user_id ON leads(user_id);
+-- Keyset pagination of conversation messages: newest windows by (timestamp, id)
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_keyset ON messages(conversation_id, timestamp DESC, id DESC);
 
 -- 6. Create default admin user
 -- First, temporarily disable RLS to allow user creation
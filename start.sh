@@ -3,8 +3,6 @@
 # Run migrations
 python manage.py migrate
 
-# Start Celery worker in background
-celery -A backend worker --loglevel=info --detach
-
-# Start Django
-exec gunicorn backend.wsgi:application --bind 0.0.0.0:$PORT 
\ No newline at end of file
+# Start Django (workers, threads and worker class come from gunicorn.conf.py)
+# The Celery worker for CHAT_USE_CELERY runs as its own process (see Procfile)
+exec gunicorn --config gunicorn.conf.py